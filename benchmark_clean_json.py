@@ -0,0 +1,306 @@
+import gc
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import subprocess
+import tracemalloc
+from clean_json import (remove_key_value_pairs, replace_color_with_hex, round_floats, shorten_keys, replace_keys,
+                        move_children_to_last, round_numbers, process_json, process_json_multipass)
+from node_arrays import infer_type
+
+#This file benchmarks the clean_json pipeline on synthetic Figma trees of growing size
+
+
+# Constants
+TEMPLATE_FILE = "test/data.json"
+DEFAULT_NODE_COUNTS = (1000, 10000, 100000)
+DEFAULT_DEPTH = 8
+DEFAULT_FAN_OUT = 8
+DEFAULT_REPEAT = 3
+# Generated trees can hold this many times the requested node count, randomness aside
+CAPACITY_MARGIN = 1.5
+CONTAINER_TYPES = ("FRAME", "GROUP", "INSTANCE", "COMPONENT")
+# The passes of process_json_multipass, in order
+PASSES = (
+    ("remove_key_value_pairs", lambda data, config: remove_key_value_pairs(data, config)),
+    ("replace_color_with_hex", lambda data, config: replace_color_with_hex(data)),
+    ("round_floats", lambda data, config: round_floats(data)),
+    ("shorten_keys", lambda data, config: shorten_keys(data)),
+    ("replace_keys", lambda data, config: replace_keys(data, {"absoluteBoundingBox": "size"})),
+    ("move_children_to_last", lambda data, config: move_children_to_last(data)),
+    ("round_numbers", lambda data, config: round_numbers(data)),
+)
+PIPELINES = (
+    ("process_json", process_json),
+    ("process_json_multipass", process_json_multipass),
+)
+
+
+def hex_to_rgba(value):
+    """Inverse of clean_json.rgba_to_hex, with the float noise of real Figma colors."""
+    channels = [int(value[i:i + 2], 16) / 255 for i in range(1, len(value), 2)]
+    if len(channels) == 3:
+        channels.append(1.0)
+    return dict(zip("rgba", channels))
+
+
+def load_templates(path=TEMPLATE_FILE):
+    """
+    Collects the node shapes of a cleaned design, grouped by (inferred) type.
+
+    Returns:
+        dict: type -> list of nodes without their children
+    """
+    with open(path, "r") as f:
+        data = json.load(f)
+    templates = {}
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, dict):
+            if "size" in value:
+                node_type = infer_type(value)
+                templates.setdefault(node_type, []).append({key: item for key, item in value.items() if key != "children"})
+            stack.extend(value.values())
+        elif isinstance(value, list):
+            stack.extend(value)
+    return templates
+
+
+def raw_node(template, node_type, node_id, x, y, width, height, rng):
+    """
+    Turns a cleaned template back into a node as the Figma API returns it, with the
+    keys and default values that the cleaning passes remove.
+    """
+    node = {"id": node_id, "name": template.get("name", node_type.title()), "type": node_type, "visible": True,
+            "scrollBehavior": "SCROLLS", "blendMode": "PASS_THROUGH" if node_type in CONTAINER_TYPES else "NORMAL"}
+    for key, value in template.items():
+        if key == "size":
+            continue
+        if key in ("fillColor", "strokeColor") and isinstance(value, str):
+            paint = {"blendMode": "NORMAL", "type": "SOLID", "color": hex_to_rgba(value)}
+            node["fills" if key == "fillColor" else "strokes"] = [paint]
+        elif key == "backgroundColor" and isinstance(value, str):
+            node["background"] = [{"blendMode": "NORMAL", "type": "SOLID", "color": hex_to_rgba(value)}]
+            node["backgroundColor"] = hex_to_rgba(value)
+        elif key == "style" and isinstance(value, dict):
+            node["style"] = dict(value, lineHeightPx=value.get("lineHeightPx", 20) + rng.random() / 10)
+        else:
+            node[key] = value
+    box = {"x": x + rng.random() / 100, "y": y + rng.random() / 100, "width": float(width), "height": float(height)}
+    node.update({
+        "absoluteBoundingBox": box,
+        "absoluteRenderBounds": dict(box),
+        "constraints": {"vertical": "TOP", "horizontal": "LEFT"},
+        "effects": [],
+        "interactions": [],
+        "strokeWeight": 1.0,
+        "strokeAlign": "INSIDE",
+        "opacity": 1.0,
+    })
+    if node_type == "TEXT":
+        node.update({"characterStyleOverrides": [], "styleOverrideTable": {}, "lineTypes": ["NONE"],
+                     "lineIndentations": [0]})
+    return node
+
+
+def container_probability(node_count, depth, fan_out):
+    """
+    Returns the share of non-leaf nodes that makes a tree of that depth and fan-out hold
+    node_count nodes with some room to spare, at least one half.
+    """
+    def capacity(probability):
+        return 1 + fan_out * sum((fan_out * probability) ** level for level in range(depth))
+
+    low, high = 0.5, 1.0
+    if capacity(low) >= node_count * CAPACITY_MARGIN:
+        return low
+    for _ in range(30):
+        middle = (low + high) / 2
+        low, high = (low, middle) if capacity(middle) >= node_count * CAPACITY_MARGIN else (middle, high)
+    return high
+
+
+def generate_tree(node_count, depth=DEFAULT_DEPTH, fan_out=DEFAULT_FAN_OUT, seed=0, templates=None):
+    """
+    Generates a synthetic /files/{key}/nodes response with node_count nodes.
+
+    Nodes are drawn from the shapes of test/data.json. The tree is filled breadth
+    first: every container gets between 1 and fan_out children, then containers are
+    topped up to fan_out until node_count is reached. Nodes at the given depth are
+    leaves, above it at least half of the nodes are containers.
+
+    Raises:
+    - ValueError: If a tree of that depth and fan-out cannot hold node_count nodes.
+    """
+    if node_count < 1:
+        raise ValueError("node_count must be at least 1")
+    capacity = sum(fan_out ** level for level in range(depth + 1))
+    if capacity < node_count:
+        raise ValueError(f"A tree of depth {depth} and fan-out {fan_out} holds at most {capacity} nodes")
+    rng = random.Random(seed)
+    probability = container_probability(node_count, depth, fan_out)
+    templates = templates or load_templates()
+    leaf_templates = [(node_type, template) for node_type, items in templates.items()
+                      if node_type not in CONTAINER_TYPES for template in items]
+    container_templates = [template for node_type in CONTAINER_TYPES for template in templates.get(node_type, [])]
+
+    root = raw_node(rng.choice(container_templates), "FRAME", "1:0", 0, 0, 1440, 1024, rng)
+    root["children"] = []
+    created = 1
+    # Containers in breadth first order, so every level fills up before the next one
+    queue = [(root, 0)]
+    position = 0
+    while created < node_count:
+        if position == len(queue):
+            # Every container has had its first children, top them up to fan_out
+            queue = [(node, node_depth) for node, node_depth in queue if len(node["children"]) < fan_out]
+            if not queue:
+                raise ValueError(f"Too many leaves to reach {node_count} nodes, increase depth or fan-out")
+            position = 0
+        parent, parent_depth = queue[position]
+        position += 1
+        box = parent["absoluteBoundingBox"]
+        width = max(box["width"] / fan_out, 1)
+        height = max(box["height"] / fan_out, 1)
+        for _ in range(min(rng.randint(1, fan_out - len(parent["children"])), node_count - created)):
+            x = box["x"] + len(parent["children"]) * width
+            y = box["y"] + rng.randint(0, 3) * height / 4
+            node_id = f"{parent_depth + 1}:{created}"
+            if parent_depth + 1 < depth and rng.random() < probability:
+                child = raw_node(rng.choice(container_templates), rng.choice(("FRAME", "GROUP", "INSTANCE")),
+                                 node_id, x, y, width, height, rng)
+                child["children"] = []
+                queue.append((child, parent_depth + 1))
+            else:
+                node_type, template = rng.choice(leaf_templates)
+                child = raw_node(template, node_type, node_id, x, y, width, height, rng)
+            parent["children"].append(child)
+            created += 1
+    return {"name": "Synthetic", "nodes": {"1:0": {"document": root}}}
+
+
+def measure(function, data, *args, repeat=DEFAULT_REPEAT):
+    """
+    Runs a function on data repeat times, then once more under tracemalloc.
+
+    Some passes rewrite their input in place, so every run gets its own copy of
+    data, parsed back from JSON before the clock or the tracing starts.
+
+    Returns:
+        (result, seconds, peak_bytes): seconds is the best run, peak_bytes the peak
+        memory allocated during the traced run
+    """
+    serialized = json.dumps(data)
+    best = None
+    result = None
+    for _ in range(repeat):
+        run_data = json.loads(serialized)
+        gc.collect()
+        start = time.perf_counter()
+        result = function(run_data, *args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result, run_data
+    run_data = json.loads(serialized)
+    gc.collect()
+    tracemalloc.start()
+    result = function(run_data, *args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, best, peak
+
+
+def benchmark(data, config, repeat=DEFAULT_REPEAT):
+    """
+    Times every pass of process_json_multipass on the output of the previous one, and the whole pipelines.
+
+    Returns:
+        dict: {"passes": {name: {"seconds", "peak_bytes"}}, "pipelines": {name: {...}}}
+    """
+    passes = {}
+    current = data
+    for name, function in PASSES:
+        current, seconds, peak = measure(function, current, config, repeat=repeat)
+        passes[name] = {"seconds": seconds, "peak_bytes": peak}
+
+    pipelines = {}
+    for name, function in PIPELINES:
+        _, seconds, peak = measure(function, data, config, repeat=repeat)
+        pipelines[name] = {"seconds": seconds, "peak_bytes": peak}
+    return {"passes": passes, "pipelines": pipelines}
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(node_counts=DEFAULT_NODE_COUNTS, depth=DEFAULT_DEPTH, fan_out=DEFAULT_FAN_OUT, seed=0,
+                   repeat=DEFAULT_REPEAT, config=None):
+    """Benchmarks every node count and returns the report, ready to be written as JSON."""
+    if config is None:
+        from config_initial import config
+    templates = load_templates()
+    results = []
+    for node_count in node_counts:
+        data = generate_tree(node_count, depth, fan_out, seed, templates)
+        print(f"Benchmarking {node_count} nodes")
+        result = {"nodes": node_count, "depth": depth, "fan_out": fan_out, "seed": seed}
+        result.update(benchmark(data, config, repeat))
+        results.append(result)
+        del data
+    return {
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def compare_reports(baseline, report):
+    """Prints the time and memory ratios of a report against a baseline report, >1 means slower or larger."""
+    baseline_results = {(result["nodes"], result["depth"], result["fan_out"]): result for result in baseline["results"]}
+    for result in report["results"]:
+        previous = baseline_results.get((result["nodes"], result["depth"], result["fan_out"]))
+        if previous is None:
+            continue
+        print(f"{result['nodes']} nodes, {baseline.get('commit')} -> {report.get('commit')}")
+        for group in ("passes", "pipelines"):
+            for name, measurement in result[group].items():
+                old = previous[group].get(name)
+                if not old:
+                    continue
+                print(f"  {name}: time x{measurement['seconds'] / old['seconds']:.2f}, "
+                      f"memory x{measurement['peak_bytes'] / max(old['peak_bytes'], 1):.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the clean_json pipeline on synthetic Figma trees")
+    parser.add_argument("--nodes", type=int, nargs="+", default=list(DEFAULT_NODE_COUNTS))
+    parser.add_argument("--depth", type=int, default=DEFAULT_DEPTH)
+    parser.add_argument("--fan-out", type=int, default=DEFAULT_FAN_OUT)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--output", default="benchmark_clean_json.json")
+    parser.add_argument("--compare", help="A previous report to compare the results with")
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(max(sys.getrecursionlimit(), args.depth * 10))
+    report = run_benchmarks(args.nodes, args.depth, args.fan_out, args.seed, args.repeat)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for result in report["results"]:
+        print(f"{result['nodes']} nodes:")
+        for group in ("passes", "pipelines"):
+            for name, measurement in result[group].items():
+                print(f"  {name}: {measurement['seconds'] * 1000:.1f} ms, {measurement['peak_bytes'] / 1e6:.1f} MB peak")
+    if args.compare:
+        with open(args.compare, "r") as f:
+            compare_reports(json.load(f), report)
@@ -1,4 +1,13 @@
+import os
+import copy
 import json
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from node_index import NodeIndex
+
+# Responses with fewer top level frames than this are cleaned in a single process
+PARALLEL_MIN_PIECES = 2
+PARALLEL_CHUNKS_PER_WORKER = 4
 
 
 def shorten_keys(json_data):
@@ -80,62 +89,124 @@ def replace_color_with_hex(data):
         # Return scalar values as is
         return data
     
-def remove_key_value_pairs(data, config):
-    keys_to_remove = config.get("keys_to_remove", [])
-    key_value_pairs_to_remove = config.get("key_value_pairs_to_remove", [])
+def freeze(value):
+    """Converts a JSON value into an equal, hashable value (dicts become frozensets, lists tuples)."""
+    if isinstance(value, dict):
+        return frozenset((key, freeze(item)) for key, item in value.items())
+    elif isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
 
-    if isinstance(data, dict):
-        cleaned_data = {}
-        for key, value in data.items():
-            # Check if the key is in the keys_to_remove list
-            if key in keys_to_remove:
-                #print(f"Removing key: {key}")
-                continue
-            
-            if any({key: value} == pair for pair in key_value_pairs_to_remove):
-                #print(f"Removing key-value pair: {key}: {value}")
+class CompiledConfig:
+    """
+    The removal rules of a cleaning config compiled into hashed lookup tables.
+
+    - keys_to_remove: a frozenset of keys, removed whatever their value.
+    - values_to_remove: a dict from key to the set of frozen values to remove, from
+      key_value_pairs_to_remove. Only single key pairs can ever match a key/value pair,
+      others are ignored.
+    - key_prefixes_to_remove: optional, keys starting with any of these prefixes are removed.
+
+    It is not a config dict: code reading the raw config keys must be given the config itself.
+
+    Checking a pair costs a set lookup on its key. The value is only frozen when the key
+    has value rules and, for lists and dicts, when its length matches one of them.
+    """
+
+    def __init__(self, config):
+        self.keys_to_remove = frozenset(config.get("keys_to_remove", []))
+        self.key_prefixes_to_remove = tuple(config.get("key_prefixes_to_remove", []))
+        self.values_to_remove = {}
+        self.container_lengths = {}
+        for pair in config.get("key_value_pairs_to_remove", []):
+            if len(pair) != 1:
                 continue
-            
-            # Recursively clean nested structures
-            cleaned_data[key] = remove_key_value_pairs(value, config)
-        return cleaned_data
+            (key, value), = pair.items()
+            self.values_to_remove.setdefault(key, set()).add(freeze(value))
+            if isinstance(value, (dict, list)):
+                self.container_lengths.setdefault(key, set()).add(len(value))
 
-    elif isinstance(data, list):
-        # Process each item in the list
-        return [remove_key_value_pairs(item, config) for item in data]
+    def should_remove(self, key, value):
+        if key in self.keys_to_remove:
+            return True
+        # Prefix rules only look at the key, they apply to keys with value rules too
+        if self.key_prefixes_to_remove and key.startswith(self.key_prefixes_to_remove):
+            return True
+        values = self.values_to_remove.get(key)
+        if values is None:
+            return False
+        if isinstance(value, (dict, list)) and len(value) not in self.container_lengths.get(key, ()):
+            return False
+        return freeze(value) in values
 
-    else:
-        # Return scalar values as is
-        return data
+def compile_config(config):
+    """Compiles a cleaning config, configs that are already compiled are returned as is."""
+    if isinstance(config, CompiledConfig):
+        return config
+    return CompiledConfig(config)
+
+def remove_key_value_pairs(data, config):
+    compiled_config = compile_config(config)
+
+    def remove_pairs(data):
+        if isinstance(data, dict):
+            cleaned_data = {}
+            for key, value in data.items():
+                # Check if the key or the key-value pair is to be removed
+                if compiled_config.should_remove(key, value):
+                    continue
+
+                # Recursively clean nested structures
+                cleaned_data[key] = remove_pairs(value)
+            return cleaned_data
+
+        elif isinstance(data, list):
+            # Process each item in the list
+            return [remove_pairs(item) for item in data]
+
+        else:
+            # Return scalar values as is
+            return data
+
+    return remove_pairs(data)
     
 
 
-def remove_children_by_ids(json_data, target_ids):
+def remove_children_by_ids(json_data, target_ids, in_place=False):
     """
-    Recursively removes children from nodes with specified IDs in a JSON structure.
+    Removes the children of the nodes with the specified IDs.
     
     Args:
         json_data (dict/list): The JSON data structure to process
         target_ids (list): List of IDs whose children should be removed
+        in_place (bool): Prune json_data itself instead of a copy
         
     Returns:
-        The modified JSON structure with children removed from specified nodes
+        The JSON structure with children removed from the specified nodes. Unless in_place,
+        json_data is left untouched: the pruned nodes and their ancestors are copied, the
+        unchanged subtrees are shared with json_data.
     """
-    if isinstance(json_data, dict):
-        # If current node's ID is in target_ids, remove 'children'
-        if 'id' in json_data and json_data['id'] in target_ids:
-            #print(f"Removing children for node: {json_data['id']}")
-            return {key: value for key, value in json_data.items() if key != 'children'}
-        
-        # Otherwise, process children recursively
-        return {key: remove_children_by_ids(value, target_ids) for key, value in json_data.items()}
-    
-    elif isinstance(json_data, list):
-        # Process each item in the list
-        return [remove_children_by_ids(item, target_ids) for item in json_data]
-    
-    # Return primitive values as is
-    return json_data
+    # The index finds the nodes without copying the tree, and without recursion
+    index = NodeIndex(json_data)
+    if in_place:
+        index.remove_children(target_ids)
+        return json_data
+
+    # Copies of the containers on the paths to the pruned nodes, by id of the original
+    copies = {id(json_data): copy.copy(json_data)}
+    for key in set(target_ids):
+        entry = index.entries.get(key)
+        if entry is None or "children" not in entry.node:
+            continue
+        original, current = json_data, copies[id(json_data)]
+        for step in entry.path:
+            original = original[step]
+            if id(original) not in copies:
+                copies[id(original)] = copy.copy(original)
+            current[step] = copies[id(original)]
+            current = current[step]
+        current.pop("children", None)
+    return copies[id(json_data)]
 
 def move_children_to_last(json_data):
     """
@@ -204,8 +275,241 @@ def replace_keys(json_data, key_mapping):
     # Return primitive values as is
     return json_data
     
-def process_json(data, config):
-    """Process the JSON data."""
+# Returned by NodeTransform.replace to drop a key, or to leave the value to the normal traversal
+DROP = object()
+NOT_HANDLED = object()
+
+
+class NodeTransform:
+    """
+    A cleaning rule that run_transforms applies while it walks the tree.
+
+    Hooks, in the order the engine calls them:
+    - skip(key, value): return True to remove a key/value pair. Gets the raw value.
+    - replace(key, value): for keys in replace_keys only. Return a new final value,
+      DROP to remove the key, or NOT_HANDLED. Dict values arrive with the skipped
+      pairs already filtered out.
+    - leaf(value): rewrites a scalar.
+    - finish(node): rewrites a dict after all its values have been processed.
+
+    value_keys lists the keys whose values skip or finish need to look into.
+    finish_keys lists the keys whose pairs finish may look at, move, rename or drop,
+    None when it may touch any pair. The other pairs keep their value and their place,
+    nothing is moved before them.
+    """
+    replace_keys = frozenset()
+    value_keys = frozenset()
+    finish_keys = None
+
+    def skip(self, key, value):
+        return False
+
+    def replace(self, key, value):
+        return NOT_HANDLED
+
+    def leaf(self, value):
+        return value
+
+    def finish(self, node):
+        return node
+
+
+class RemoveKeyValuePairsTransform(NodeTransform):
+    """Single pass version of remove_key_value_pairs."""
+
+    def __init__(self, config):
+        self.compiled_config = compile_config(config)
+        self.value_keys = frozenset(self.compiled_config.values_to_remove)
+
+    def skip(self, key, value):
+        return self.compiled_config.should_remove(key, value)
+
+
+class ColorToHexTransform(NodeTransform):
+    """Single pass version of replace_color_with_hex."""
+    replace_keys = frozenset({"color", "backgroundColor"})
+
+    def replace(self, key, value):
+        if not isinstance(value, dict):
+            return NOT_HANDLED
+        try:
+            return rgba_to_hex(value)
+        except KeyError:
+            # Incomplete color objects are dropped
+            return DROP
+
+
+class RoundFloatsTransform(NodeTransform):
+    """Single pass version of round_floats."""
+
+    def leaf(self, value):
+        return round(value, 0) if isinstance(value, float) else value
+
+
+class ShortenKeysTransform(NodeTransform):
+    """Single pass version of shorten_keys."""
+    keys_to_replace = {
+        "fills": "fillColor",
+        "strokes": "strokeColor",
+        "background": "backgroundColor"
+    }
+    value_keys = frozenset(keys_to_replace)
+    # A shortened key replaces any pair already using the short name
+    finish_keys = frozenset(keys_to_replace).union(keys_to_replace.values())
+
+    def finish(self, node):
+        for key, value in list(node.items()):
+            if key in self.keys_to_replace and isinstance(value, list) and len(value) == 1 and "color" in value[0]:
+                node[self.keys_to_replace[key]] = value[0]["color"]
+                del node[key]
+        return node
+
+
+class ReplaceKeysTransform(NodeTransform):
+    """Single pass version of replace_keys."""
+
+    def __init__(self, key_mapping):
+        self.key_mapping = key_mapping
+        self.finish_keys = frozenset(key_mapping).union(key_mapping.values())
+
+    def finish(self, node):
+        if not any(key in self.key_mapping for key in node):
+            return node
+        return {self.key_mapping.get(key, key): value for key, value in node.items()}
+
+
+class MoveChildrenToLastTransform(NodeTransform):
+    """Single pass version of move_children_to_last."""
+    finish_keys = frozenset({"children"})
+
+    def finish(self, node):
+        if 'children' in node:
+            node['children'] = node.pop('children')
+        return node
+
+
+class RoundNumbersTransform(NodeTransform):
+    """Single pass version of round_numbers."""
+
+    def leaf(self, value):
+        if isinstance(value, float):
+            return int(value) if value.is_integer() else round(value)
+        return value
+
+
+def build_transforms(config):
+    """Returns the transforms of process_json, in the order of its original passes."""
+    return [
+        RemoveKeyValuePairsTransform(config),
+        ColorToHexTransform(),
+        RoundFloatsTransform(),
+        ShortenKeysTransform(),
+        ReplaceKeysTransform({"absoluteBoundingBox": "size"}),
+        MoveChildrenToLastTransform(),
+        RoundNumbersTransform(),
+    ]
+
+
+def _overrides(transform, hook):
+    return getattr(type(transform), hook) is not getattr(NodeTransform, hook)
+
+
+class TransformPipeline:
+    """
+    NodeTransform hooks composed once, so applying them costs a single call per key.
+
+    value_keys holds the keys whose values some hook needs to see whole (pair rules,
+    replacements, finish hooks that look into values). For every other key, skip
+    only looks at the key, which lets streaming callers decide without the value.
+    finish_keys holds the keys whose pairs finish may move or rewrite, None when
+    finish may touch any pair, so streaming callers know which pairs are final.
+    """
+
+    def __init__(self, transforms):
+        skips = [transform.skip for transform in transforms if _overrides(transform, "skip")]
+        self.leaves = [transform.leaf for transform in transforms if _overrides(transform, "leaf")]
+        self.finishers = [transform.finish for transform in transforms if _overrides(transform, "finish")]
+        self.replacers = {}
+        for transform in transforms:
+            for key in transform.replace_keys:
+                self.replacers.setdefault(key, []).append(transform.replace)
+        self.value_keys = frozenset().union(*(transform.value_keys for transform in transforms), self.replacers)
+        finish_keys = [transform.finish_keys for transform in transforms if _overrides(transform, "finish")]
+        self.finish_keys = None if None in finish_keys else frozenset().union(*finish_keys)
+
+        if len(skips) == 1:
+            self.skip = skips[0]
+        elif skips:
+            self.skip = lambda key, value: any(s(key, value) for s in skips)
+        else:
+            self.skip = lambda key, value: False
+
+    def leaf(self, value):
+        for leaf in self.leaves:
+            value = leaf(value)
+        return value
+
+    def replace(self, key, value):
+        if isinstance(value, dict):
+            # Replacers see the value as the earlier passes left it
+            value = {k: v for k, v in value.items() if not self.skip(k, v)}
+        for replacer in self.replacers[key]:
+            replaced = replacer(key, value)
+            if replaced is not NOT_HANDLED:
+                return replaced
+        return NOT_HANDLED
+
+    def process_pair(self, key, value):
+        """Returns the final value of a key/value pair of a dict, or DROP."""
+        if self.skip(key, value):
+            return DROP
+        if key in self.replacers:
+            replaced = self.replace(key, value)
+            if replaced is not NOT_HANDLED:
+                return replaced
+        if isinstance(value, (dict, list)):
+            return self.visit(value)
+        return self.leaf(value)
+
+    def finish(self, node):
+        for finish in self.finishers:
+            node = finish(node)
+        return node
+
+    def visit(self, data):
+        if isinstance(data, dict):
+            node = {}
+            for key, value in data.items():
+                value = self.process_pair(key, value)
+                if value is not DROP:
+                    node[key] = value
+            return self.finish(node)
+        elif isinstance(data, list):
+            return [self.visit(item) for item in data]
+        return self.leaf(data)
+
+
+def run_transforms(data, transforms):
+    """
+    Applies node transforms to a JSON structure in a single traversal.
+
+    The tree is walked once and a single output tree is built: pairs are skipped
+    or replaced on the way down, scalars are rewritten as they are copied and each
+    dict is finished once its values are done. This gives the same result as
+    running each transform as a separate pass over the whole tree.
+
+    Args:
+        data (dict/list): The JSON data structure to process
+        transforms (list): NodeTransform instances, in pass order
+
+    Returns:
+        The transformed copy of the JSON structure
+    """
+    return TransformPipeline(transforms).visit(data)
+
+
+def process_json_multipass(data, config):
+    """Process the JSON data with one full pass per cleaning step."""
     #Remove useless key-value pairs
     cleaned_data = remove_key_value_pairs(data, config)
     #Reduce the JSON structure for colors
@@ -222,6 +526,87 @@ def process_json(data, config):
     cleaned_data = round_numbers(cleaned_data)
     return cleaned_data
 
+def process_json(data, config):
+    """Process the JSON data in a single traversal, same result as process_json_multipass."""
+    return run_transforms(data, build_transforms(config))
+
+def split_document(data):
+    """
+    Splits a Figma response at its top level frames.
+
+    The frames are the children of the canvases of a whole file response, or the
+    children of the requested nodes of a /files/{key}/nodes response.
+
+    Returns:
+        (skeleton, pieces): pieces lists the frames in document order, skeleton is a copy
+        of data where each frame is replaced by its position in pieces. Both share the
+        unchanged parts of data.
+    """
+    pieces = []
+
+    def split_children(node):
+        node = dict(node)
+        children = node.get('children')
+        if isinstance(children, list):
+            node['children'] = list(range(len(pieces), len(pieces) + len(children)))
+            pieces.extend(children)
+        return node
+
+    skeleton = dict(data)
+    if isinstance(data.get('document'), dict):
+        document = skeleton['document'] = dict(data['document'])
+        if isinstance(document.get('children'), list):
+            document['children'] = [split_children(canvas) for canvas in document['children']]
+    elif isinstance(data.get('nodes'), dict):
+        skeleton['nodes'] = {
+            node_id: dict(entry, document=split_children(entry['document']))
+            if isinstance(entry, dict) and isinstance(entry.get('document'), dict) else entry
+            for node_id, entry in data['nodes'].items()
+        }
+    return skeleton, pieces
+
+def merge_document(skeleton, pieces):
+    """Puts the cleaned frames back in place of their positions in a cleaned skeleton, in place."""
+    def merge_children(node):
+        if isinstance(node.get('children'), list):
+            node['children'] = [pieces[position] for position in node['children']]
+
+    if isinstance(skeleton.get('document'), dict):
+        for canvas in skeleton['document'].get('children', []):
+            merge_children(canvas)
+    elif isinstance(skeleton.get('nodes'), dict):
+        for entry in skeleton['nodes'].values():
+            if isinstance(entry, dict) and isinstance(entry.get('document'), dict):
+                merge_children(entry['document'])
+    return skeleton
+
+def process_json_parallel(data, config, max_workers=None):
+    """
+    Process a Figma response like process_json, cleaning its top level frames in parallel.
+
+    The response is split at its frames (see split_document), each frame is cleaned in
+    a worker process and the results are merged back in document order. Cleaning
+    works node by node, so this gives the same result as process_json. Responses with
+    fewer than two frames are cleaned in this process.
+
+    Args:
+        data (dict): A fetch_figma_data response
+        config (dict): The cleaning config
+        max_workers (int): Number of worker processes, defaults to the number of CPUs
+    """
+    if not isinstance(data, dict):
+        return process_json(data, config)
+    skeleton, pieces = split_document(data)
+    if len(pieces) < PARALLEL_MIN_PIECES:
+        return process_json(data, config)
+
+    workers = max_workers or os.cpu_count() or 1
+    # Several frames per task, so small frames do not cost a round trip each
+    chunksize = max(1, len(pieces) // (workers * PARALLEL_CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        cleaned_pieces = list(executor.map(process_json, pieces, repeat(config), chunksize=chunksize))
+    return merge_document(process_json(skeleton, config), cleaned_pieces)
+
 
 if __name__ == "__main__":
     figma_url = "https://www.figma.com/design/Q1nZ4assLAHsrKaHlBf5Po/Untitled?node-id=4-79&t=lfRV7L5YpT1WEhOn-0"
@@ -245,18 +630,14 @@ if __name__ == "__main__":
         print(f"Error: {e}")
 
 
-    # Load the JSON data
-    with open("figma_data.json", "r") as json_file:
-        data = json.load(json_file)
-
-    import config_initial as config
+    from config_initial import config
+    from stream_clean_json import stream_clean_file
 
-    # Process the JSON data
-    cleaned_data = process_json(data, config)
+    # Clean the JSON data while it is read, large files are never loaded whole
+    stream_clean_file("figma_data.json", "cleaned_figma_data.json", config)
 
-    # Save the cleaned JSON data
-    with open("cleaned_figma_data.json", "w") as cleaned_json_file:
-        json.dump(cleaned_data, cleaned_json_file, indent=2)
+    with open("cleaned_figma_data.json", "r") as cleaned_json_file:
+        cleaned_data = json.load(cleaned_json_file)
     
     formatted_str = ", ".join(f"{key}: {value}" if isinstance(value, int) else f"{key}: {value}" 
                           for key, value in cleaned_data.items())
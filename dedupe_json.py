@@ -0,0 +1,236 @@
+import re
+import json
+
+#This file replaces repeated subtrees of cleaned Figma JSON (list rows, cards, style blocks) with references to shared definitions
+
+
+# Constants
+REF_KEY = "$ref"
+SIZE_KEY = "size"
+POSITION_KEYS = ("x", "y")
+# Subtrees shorter than this, in characters of JSON, cost fewer tokens inline than as a reference
+MIN_SUBTREE_LENGTH = 120
+
+
+def _origin(node):
+    size = node.get(SIZE_KEY)
+    if isinstance(size, dict) and all(isinstance(size.get(key), (int, float)) for key in POSITION_KEYS):
+        return size["x"], size["y"]
+    return None
+
+
+def _shift(size, dx, dy):
+    """Returns a copy of a size dict with its position moved by (dx, dy)."""
+    shifted = dict(size)
+    shifted["x"] = size["x"] + dx
+    shifted["y"] = size["y"] + dy
+    return shifted
+
+
+class SubtreeIndex:
+    """
+    Hash-conses the dicts of a JSON tree.
+
+    Every dict gets an integer shape id, equal ids meaning equal subtrees. For nodes
+    with a position the id ignores where the node is: its own size only counts
+    through its width and height and the positions of its descendants are taken
+    relative to it, so the same card placed twice gets the same id.
+    """
+
+    def __init__(self, data):
+        self.shapes = {}
+        # id(dict) -> shape id
+        self.ids = {}
+        # shape id -> number of occurrences, approximate JSON length, and whether
+        # the subtree holds positions that only make sense relative to an ancestor
+        self.counts = {}
+        self.lengths = {}
+        self.positioned = {}
+        self.visit(data, None)
+
+    def intern(self, shape):
+        shape_id = self.shapes.get(shape)
+        if shape_id is None:
+            shape_id = self.shapes[shape] = len(self.shapes)
+        return shape_id
+
+    def visit(self, value, origin):
+        """Returns (shape, length, positioned) of a value whose positions are relative to origin."""
+        if isinstance(value, dict):
+            own_origin = _origin(value)
+            inner_origin = own_origin if own_origin is not None else origin
+            items = []
+            length = 2
+            positioned = False
+            for key, item in value.items():
+                length += len(key) + 4
+                if key == SIZE_KEY and own_origin is not None:
+                    # The node's own position is left out, its box size is kept
+                    items.append((key, tuple(sorted((k, v) for k, v in item.items() if k not in POSITION_KEYS))))
+                    length += len(json.dumps(item))
+                    continue
+                shape, item_length, item_positioned = self.visit(item, inner_origin)
+                items.append((key, shape))
+                length += item_length
+                positioned = positioned or item_positioned
+            shape_id = self.intern(("dict", tuple(items)))
+            self.ids[id(value)] = shape_id
+            self.counts[shape_id] = self.counts.get(shape_id, 0) + 1
+            self.lengths[shape_id] = length
+            self.positioned[shape_id] = positioned
+            if own_origin is None:
+                return shape_id, length, positioned
+            # Where the node sits relative to its ancestors is part of the parent's shape
+            offset = None if origin is None else (own_origin[0] - origin[0], own_origin[1] - origin[1])
+            return ("at", shape_id, offset), length, True
+        elif isinstance(value, list):
+            shapes = []
+            length = 2
+            positioned = False
+            for item in value:
+                shape, item_length, item_positioned = self.visit(item, origin)
+                shapes.append(shape)
+                length += item_length + 2
+                positioned = positioned or item_positioned
+            return ("list", tuple(shapes)), length, positioned
+        return (type(value).__name__, value), len(json.dumps(value)), False
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-") or "node"
+
+
+def dedupe_subtrees(data, min_length=MIN_SUBTREE_LENGTH):
+    """
+    Replaces repeated subtrees with references to a shared definition table.
+
+    A repeated node becomes {"$ref": "card#1", "size": {...}}: its own size stays at the
+    reference and the definition holds the rest, with the positions of its descendants
+    relative to the node. Repeated dicts without a position, such as text style
+    blocks, become {"$ref": "style#1"}. Definitions may reference each other and every
+    definition is referenced at least twice.
+
+    Args:
+        data (dict/list): Cleaned JSON, as returned by process_json
+        min_length (int): Subtrees shorter than this many characters of JSON are kept inline
+
+    Returns:
+        (tree, definitions): The deduplicated copy of data and a dict from reference
+        name to definition. expand_refs(tree, definitions) gives back data.
+    """
+    index = SubtreeIndex(data)
+    candidates = {shape_id for shape_id, count in index.counts.items()
+                  if count > 1 and index.lengths[shape_id] >= min_length}
+
+    def is_candidate(node):
+        # Sizes that hold a node position are not indexed
+        shape_id = index.ids.get(id(node))
+        if shape_id not in candidates:
+            return False
+        # Positions inside a shared subtree need a root that carries the origin
+        return _origin(node) is not None or not index.positioned[shape_id]
+
+    def count_uses(value, uses, seen):
+        # Mirrors rewrite: the content of a definition is only walked once
+        if isinstance(value, dict):
+            if is_candidate(value):
+                shape_id = index.ids[id(value)]
+                uses[shape_id] = uses.get(shape_id, 0) + 1
+                if shape_id in seen:
+                    return
+                seen.add(shape_id)
+            for item in value.values():
+                count_uses(item, uses, seen)
+        elif isinstance(value, list):
+            for item in value:
+                count_uses(item, uses, seen)
+
+    # A subtree repeated only inside another repeated subtree ends up used once
+    while True:
+        uses = {}
+        count_uses(data, uses, set())
+        single_use = {shape_id for shape_id in candidates if uses.get(shape_id, 0) < 2}
+        if not single_use:
+            break
+        candidates -= single_use
+
+    definitions = {}
+    names = {}
+    slug_counts = {}
+
+    def define(node, key):
+        shape_id = index.ids[id(node)]
+        name = names.get(shape_id)
+        if name is None:
+            slug = _slug(node.get("name", key))
+            slug_counts[slug] = slug_counts.get(slug, 0) + 1
+            name = names[shape_id] = f"{slug}#{slug_counts[slug]}"
+            origin = _origin(node) or (0, 0)
+            definitions[name] = {k: rewrite(v, origin, k) for k, v in node.items() if k != SIZE_KEY or _origin(node) is None}
+        return name
+
+    def rewrite(value, origin, key=None):
+        if isinstance(value, dict):
+            if is_candidate(value):
+                reference = {REF_KEY: define(value, key)}
+                if _origin(value) is not None:
+                    reference[SIZE_KEY] = _shift(value[SIZE_KEY], -origin[0], -origin[1])
+                return reference
+            node = {}
+            for k, item in value.items():
+                if k == SIZE_KEY and _origin(value) is not None:
+                    node[k] = _shift(item, -origin[0], -origin[1])
+                else:
+                    node[k] = rewrite(item, origin, k)
+            return node
+        elif isinstance(value, list):
+            return [rewrite(item, origin, key) for item in value]
+        return value
+
+    tree = rewrite(data, (0, 0))
+    return tree, definitions
+
+
+def expand_refs(data, definitions, offset=(0, 0)):
+    """
+    Replaces the references left by dedupe_subtrees with full copies of their definitions.
+
+    Args:
+        data (dict/list): A deduplicated tree or part of one
+        definitions (dict): The definition table returned by dedupe_subtrees
+        offset (tuple): Position that the positions in data are relative to
+
+    Returns:
+        A copy of data without references
+    """
+    if isinstance(data, dict):
+        if REF_KEY in data:
+            definition = definitions[data[REF_KEY]]
+            if SIZE_KEY not in data:
+                return expand_refs(definition, definitions, offset)
+            size = _shift(data[SIZE_KEY], *offset)
+            node = {SIZE_KEY: size}
+            node.update(expand_refs(definition, definitions, (size["x"], size["y"])))
+            return node
+        node = {}
+        for key, value in data.items():
+            if key == SIZE_KEY and _origin(data) is not None:
+                node[key] = _shift(value, *offset)
+            else:
+                node[key] = expand_refs(value, definitions, offset)
+        return node
+    elif isinstance(data, list):
+        return [expand_refs(item, definitions, offset) for item in data]
+    return data
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "cleaned_figma_data.json"
+    with open(path, "r") as f:
+        data = json.load(f)
+    tree, definitions = dedupe_subtrees(data)
+    before = len(json.dumps(data))
+    after = len(json.dumps({"definitions": definitions, "tree": tree}))
+    print(f"{len(definitions)} definitions, {before} -> {after} characters of JSON")
@@ -0,0 +1,197 @@
+import re
+import os
+import json
+
+#This file extracts design tokens (colors, type styles, radii and spacings) from cleaned Figma JSON and turns them into a Tailwind theme
+
+
+# Constants
+COLOR_KEYS = ("fillColor", "strokeColor", "backgroundColor", "color")
+# Style properties that make up a type style, the rest (alignment, auto resize...) stays on the node
+TYPE_STYLE_KEYS = ("fontFamily", "fontPostScriptName", "fontStyle", "fontWeight", "fontSize", "lineHeightPx",
+                   "lineHeightPercent", "lineHeightPercentFontSize", "lineHeightUnit", "letterSpacing")
+RADIUS_KEYS = ("cornerRadius",)
+SPACING_KEYS = ("itemSpacing", "counterAxisSpacing", "paddingLeft", "paddingRight", "paddingTop", "paddingBottom")
+TEXT_STYLE_KEY = "textStyle"
+TAILWIND_TOKENS_FILE = "tailwind.tokens.js"
+
+
+def _is_number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _slug(text):
+    return re.sub(r"[^a-z0-9]+", "-", str(text).lower()).strip("-") or "font"
+
+
+def _type_style(style):
+    """Returns the type style part of a text style as a hashable tuple, or None."""
+    if not isinstance(style, dict) or not _is_number(style.get("fontSize")):
+        return None
+    return tuple((key, style[key]) for key in TYPE_STYLE_KEYS if key in style)
+
+
+def collect_token_values(data):
+    """
+    Counts the token candidates of a cleaned tree.
+
+    Returns:
+        dict: For colors, type styles, radii and spacings, a dict from value to number of uses
+    """
+    usage = {"colors": {}, "textStyles": {}, "radii": {}, "spacing": {}}
+
+    def count(kind, value):
+        usage[kind][value] = usage[kind].get(value, 0) + 1
+
+    def visit(data):
+        if isinstance(data, dict):
+            for key, value in data.items():
+                if key in COLOR_KEYS and isinstance(value, str) and value.startswith("#"):
+                    count("colors", value)
+                elif key in RADIUS_KEYS and _is_number(value):
+                    count("radii", value)
+                elif key in SPACING_KEYS and _is_number(value):
+                    count("spacing", value)
+                elif key == "style" and _type_style(value) is not None:
+                    count("textStyles", _type_style(value))
+                else:
+                    visit(value)
+        elif isinstance(data, list):
+            for item in data:
+                visit(item)
+
+    visit(data)
+    return usage
+
+
+def name_tokens(usage):
+    """
+    Gives every collected value a token name.
+
+    Colors are numbered from the most used, type styles from the largest font size,
+    radii and spacings from the smallest value.
+
+    Returns:
+        (names, tokens): names maps each kind to a dict from value to token name,
+        tokens maps each kind to a dict from token name to value.
+    """
+    orders = {
+        "colors": ("color", sorted(usage["colors"], key=lambda value: (-usage["colors"][value], value))),
+        "textStyles": ("type", sorted(usage["textStyles"], key=lambda value: (-dict(value)["fontSize"], -usage["textStyles"][value], repr(value)))),
+        "radii": ("radius", sorted(usage["radii"])),
+        "spacing": ("space", sorted(usage["spacing"])),
+    }
+    names = {}
+    tokens = {}
+    for kind, (prefix, values) in orders.items():
+        names[kind] = {value: f"{prefix}-{index}" for index, value in enumerate(values, 1)}
+        tokens[kind] = {f"{prefix}-{index}": dict(value) if kind == "textStyles" else value
+                        for index, value in enumerate(values, 1)}
+    tokens["fontFamilies"] = {}
+    for style in tokens["textStyles"].values():
+        if "fontFamily" in style:
+            tokens["fontFamilies"][_slug(style["fontFamily"])] = style["fontFamily"]
+    return names, tokens
+
+
+def extract_design_tokens(data):
+    """
+    Replaces colors, type styles, radii and spacings with the names of shared tokens.
+
+    A text style keeps its per node properties (alignment, auto resize...) and refers
+    to its font properties through "textStyle": {"textStyle": "type-1", "textAlignHorizontal": "LEFT"}.
+
+    Args:
+        data (dict/list): Cleaned JSON, as returned by process_json
+
+    Returns:
+        (tree, tokens): The rewritten copy of data and the token tables, a dict with
+        colors, textStyles, radii, spacing and fontFamilies
+    """
+    names, tokens = name_tokens(collect_token_values(data))
+
+    def rewrite(data):
+        if isinstance(data, dict):
+            node = {}
+            for key, value in data.items():
+                if key in COLOR_KEYS and isinstance(value, str) and value.startswith("#"):
+                    node[key] = names["colors"][value]
+                elif key in RADIUS_KEYS and _is_number(value):
+                    node[key] = names["radii"][value]
+                elif key in SPACING_KEYS and _is_number(value):
+                    node[key] = names["spacing"][value]
+                elif key == "style" and _type_style(value) is not None:
+                    style = {TEXT_STYLE_KEY: names["textStyles"][_type_style(value)]}
+                    style.update((k, v) for k, v in value.items() if k not in TYPE_STYLE_KEYS)
+                    node[key] = style
+                else:
+                    node[key] = rewrite(value)
+            return node
+        elif isinstance(data, list):
+            return [rewrite(item) for item in data]
+        return data
+
+    return rewrite(data), tokens
+
+
+def _px(value):
+    return f"{value:g}px" if isinstance(value, float) else f"{value}px"
+
+
+def tailwind_theme(tokens):
+    """
+    Converts the token tables into a Tailwind theme.extend section.
+
+    The token names become the class suffixes: bg-color-1, text-type-1, font-inter,
+    rounded-radius-1, p-space-1, gap-space-1...
+    """
+    font_sizes = {}
+    for name, style in tokens["textStyles"].items():
+        options = {}
+        if _is_number(style.get("lineHeightPx")):
+            options["lineHeight"] = _px(style["lineHeightPx"])
+        if _is_number(style.get("letterSpacing")):
+            options["letterSpacing"] = _px(style["letterSpacing"])
+        if _is_number(style.get("fontWeight")):
+            options["fontWeight"] = str(style["fontWeight"])
+        font_sizes[name] = [_px(style["fontSize"]), options]
+    return {
+        "colors": dict(tokens["colors"]),
+        "fontFamily": {name: [family] for name, family in tokens["fontFamilies"].items()},
+        "fontSize": font_sizes,
+        "borderRadius": {name: _px(value) for name, value in tokens["radii"].items()},
+        "spacing": {name: _px(value) for name, value in tokens["spacing"].items()},
+    }
+
+
+def write_tailwind_tokens(route, tokens):
+    """
+    Writes the Tailwind theme extension into the project, to be spread into theme.extend.
+
+    Returns:
+        str: The path of the written file
+    """
+    path = os.path.join(route, TAILWIND_TOKENS_FILE)
+    with open(path, "w") as f:
+        f.write("// Design tokens from Figma, spread into theme.extend of tailwind.config.js\n")
+        f.write(f"module.exports = {json.dumps(tailwind_theme(tokens), indent=2)};\n")
+    return path
+
+
+def design_token_hint(tokens):
+    """Returns the prompt text that explains the token names used in the style info."""
+    families = ", ".join(f"font-{name} for {family}" for name, family in tokens["fontFamilies"].items())
+    return (f"Colors, text styles, radii and spacings in the style info are names of the designTokens, also defined "
+            f"in ./{TAILWIND_TOKENS_FILE}: spread it into theme.extend of tailwind.config.js and use the token classes "
+            f"instead of arbitrary values: bg-/text-/border-color-N, text-type-N, {families + ', ' if families else ''}"
+            f"rounded-radius-N, p-/gap-space-N.")
+
+
+if __name__ == "__main__":
+    import sys
+
+    path = sys.argv[1] if len(sys.argv) > 1 else "cleaned_figma_data.json"
+    with open(path, "r") as f:
+        data = json.load(f)
+    tree, tokens = extract_design_tokens(data)
+    print(json.dumps(tailwind_theme(tokens), indent=2))
@@ -2,14 +2,15 @@ import re
 import requests
 import os
 import json
-from PIL import Image
-from io import BytesIO
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from figma_client import FIGMA_API_BASE_URL, get_figma_client
+from node_index import NodeIndex
 
 #This file downaloads images from figma and saves them in the reference folder
 
 
 # Constants
-FIGMA_API_BASE_URL = "https://api.figma.com/v1"
 figma_token = os.getenv("FIGMA_TOKEN")
 print(figma_token)
 
@@ -25,34 +26,47 @@ def parse_figma_url(figma_url):
     return file_key, node_id
 
 # Function to make API calls
-def fetch_figma_data(file_key, node_id=None):
+def fetch_figma_data(file_key, node_id=None, depth=None):
     """
     Fetches JSON data from the Figma API for a specific file and node.
+
+    node_id may hold several comma separated IDs. When depth is given only that many
+    levels below the requested nodes are returned.
     """
 
-    headers = {
-        "X-FIGMA-TOKEN": figma_token
-    }
-    
     if node_id:
         endpoint = f"{FIGMA_API_BASE_URL}/files/{file_key}/nodes"
         params = {"ids": node_id}
     else:
         endpoint = f"{FIGMA_API_BASE_URL}/files/{file_key}"
         params = {}
-    
-    response = requests.get(endpoint, headers=headers, params=params)
 
+    if depth:
+        params["depth"] = depth
     
-    return response.json()
+    return get_figma_client(figma_token).get_json(endpoint, params=params)
+
+def fetch_file_version(file_key):
+    """
+    Fetches the current version of a Figma file without downloading its node tree.
+
+    Returns:
+    - str: The file's version, combined with its lastModified timestamp.
+    """
+    # depth=1 limits the document to its pages, which keeps this request small
+    endpoint = f"{FIGMA_API_BASE_URL}/files/{file_key}"
+    file_data = get_figma_client(figma_token).get_json(endpoint, params={"depth": 1})
+    return f"{file_data.get('version')}@{file_data.get('lastModified')}"
 
-def fetch_figma_image(file_key, node_id):
+def fetch_figma_image(file_key, node_id, scale=1, format="png"):
     """
     Fetches an image of a specific node from Figma.
     
     Args:
     - file_key (str): The Figma file key.
     - node_id (str): The node ID of the object to export.
+    - scale (int): The export scale.
+    - format (str): The export format.
     
     Returns:
     - bytes: The image data in bytes.
@@ -60,21 +74,14 @@ def fetch_figma_image(file_key, node_id):
     Raises:
     - Exception: If the API request fails or returns an error.
     """
-    headers = {
-        "X-FIGMA-TOKEN": figma_token
-    }
+    client = get_figma_client(figma_token)
     
     # Figma Image Export API endpoint
-    endpoint = f"{FIGMA_API_BASE_URL}/images/{file_key}?ids={node_id}"
-    
-    # Send the request to the Figma API
-    response = requests.get(endpoint, headers=headers)
-    
-    if response.status_code != 200:
-        raise Exception(f"Error: {response.status_code}, {response.text}")
+    endpoint = f"{FIGMA_API_BASE_URL}/images/{file_key}"
+    params = {"ids": node_id, "scale": scale, "format": format}
     
-    # Get the image URL from the response
-    image_data = response.json()
+    # Send the request to the Figma API and get the image URL from the response
+    image_data = client.get_json(endpoint, params=params)
 
     image_url = image_data['images'][node_id.replace("-", ":")]
 
@@ -82,7 +89,7 @@ def fetch_figma_image(file_key, node_id):
     #print(f"Image URL: {image_url}")
     
     # Download the image from the URL
-    img_response = requests.get(image_url)
+    img_response = client.get(image_url)
 
     
     if img_response.status_code != 200:
@@ -93,115 +100,401 @@ def fetch_figma_image(file_key, node_id):
 
 
 
-def download_and_save_images(basedir, figma_url):
+# Number of assets downloaded in parallel and the chunk size used to stream them to disk
+DOWNLOAD_WORKERS = 8
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+
+def detect_image_extension(head, content_type=""):
+    """
+    Detects the file extension of an image from its first bytes.
+
+    Args:
+    - head (bytes): The first bytes of the image body.
+    - content_type (str): The Content-Type header, used when the bytes are inconclusive.
+
+    Returns:
+    - str: The file extension (png, jpeg or svg).
+    """
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    text = head.lstrip(b"\xef\xbb\xbf \t\r\n").lower()
+    if text.startswith(b"<svg") or (text.startswith(b"<?xml") and b"<svg" in text):
+        return "svg"
+    if "svg" in content_type:
+        return "svg"
+    if "jpeg" in content_type or "jpg" in content_type:
+        return "jpeg"
+    return "png"
+
+def unique_file_stem(image_name, image_id, taken):
+    """
+    Returns the file name, without extension, for an asset and reserves it in taken.
+
+    Different assets often share a Figma name ("Image", "Vector"...), the ones after
+    the first get their node ID as a suffix so they never write to the same file.
+
+    Args:
+    - image_name (str): The node name.
+    - image_id (str): The node ID.
+    - taken (set): Lowercased stems already in use, updated in place.
+    """
+    stem = image_name
+    suffix = 1
+    while stem.lower() in taken:
+        stem = f"{image_name}-{image_id.replace(':', '-')}" + (f"-{suffix}" if suffix > 1 else "")
+        suffix += 1
+    taken.add(stem.lower())
+    return stem
+
+def download_image(client, basedir, image_id, image_name, image_url):
+    """
+    Streams a single image to disk as image_name.<format>, the format being found in its magic bytes.
+
+    Returns:
+    - str: The saved file name, or None if the download failed.
+    """
+    print(f"Downloading image: {image_name} from {image_url}")
+    path = None
+    try:
+        with client.get(image_url, stream=True) as img_response:
+            if img_response.status_code != 200:
+                print(f"Failed to download image {image_id} (status code: {img_response.status_code})")
+                return None
+
+            content_type = img_response.headers.get("Content-Type", "").lower()
+            chunks = img_response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE)
+            head = next(chunks, b"")
+            file_extension = detect_image_extension(head, content_type)
+            file_name = f"{image_name}.{file_extension}"
+            path = os.path.join(basedir, file_name)
+
+            # Streamed to a partial file and renamed once complete, so a failed download never
+            # leaves a truncated image under the real name
+            with open(path + ".part", "wb") as img_file:
+                img_file.write(head)
+                for chunk in chunks:
+                    img_file.write(chunk)
+            os.replace(path + ".part", path)
+    except (requests.RequestException, OSError) as e:
+        print(f"Failed to download image {image_id} ({e})")
+        if path is not None:
+            try:
+                os.remove(path + ".part")
+            except OSError:
+                pass
+        return None
+
+    print(f"Saved image {file_name} to {basedir}")
+    return file_name
+
+# File written next to the downloaded assets to remember what was downloaded for which node
+ASSET_MANIFEST_FILE = ".figma_assets.json"
+
+def load_asset_manifest(basedir):
+    """
+    Loads the asset manifest of a directory, or an empty one if there is none.
+    """
+    try:
+        with open(os.path.join(basedir, ASSET_MANIFEST_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {"version": None, "assets": {}}
+
+def save_asset_manifest(basedir, manifest):
+    path = os.path.join(basedir, ASSET_MANIFEST_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=4)
+    os.replace(path + ".tmp", path)
+
+def asset_manifest_entry(candidate, file_name):
+    return {
+        'name': candidate['name'],
+        'file': file_name,
+        'format': candidate['format'],
+        'content_hash': candidate['content_hash'],
+        'imageRef': candidate.get('imageRef'),
+    }
+
+def download_and_save_images(basedir, figma_url, max_workers=DOWNLOAD_WORKERS, figma_data=None, incremental=True):
     """
     Downloads images from a Figma file and saves them to a specified directory.
 
+    Images are downloaded concurrently by a bounded pool of workers sharing the
+    keep-alive session of the Figma client. Images that fail to download are reported and skipped.
+
+    Nodes that render the same asset are exported and downloaded once and all point at
+    the same file: image fills with the same imageRef rendered the same way, and
+    identical vector groups (see content_hash). The export is a render of the node, so
+    an imageRef shown at different sizes or crops is downloaded once per rendering.
+
+    A manifest next to the images records the node ID, content hash, imageRef and file
+    name of every asset along with the Figma version. When incremental, only new or
+    changed assets are exported and downloaded, and files whose nodes are gone are deleted.
+
     Args:
     - basedir (str): The base directory where images will be saved.
     - figma_url (str): The Figma file URL.
+    - max_workers (int): Maximum number of concurrent downloads.
+    - figma_data (dict): The already fetched fetch_figma_data response for the URL, if any.
+    - incremental (bool): Reuse unchanged assets recorded in the manifest.
 
     Returns:
-    - list: A list of node IDs for the downloaded images.
-
-    Raises:
-    - Exception: If there's an error downloading or saving an image.
+    - list: A list of node IDs for the downloaded (or still up to date) images.
     """
     
 
     file_key, node_id = parse_figma_url(figma_url)
-    image_data = fetch_image_ids_from_node(file_key, node_id, figma_token) 
-    
-    node_ids = []
+    if figma_data is None:
+        figma_data = fetch_figma_data(file_key, node_id)
+    candidates = collect_image_candidates(get_figma_node(figma_data, node_id))
+
+    if not os.path.exists(basedir):
+        os.makedirs(basedir)
+
+    manifest = load_asset_manifest(basedir) if incremental else {"version": None, "assets": {}}
+    old_assets = manifest.get("assets", {})
+
+    # A file recorded for assets with different contents was overwritten by one of them, trust none
+    hashes_by_file = {}
+    for entry in old_assets.values():
+        hashes_by_file.setdefault(entry['file'], set()).add(entry['content_hash'])
+
+    assets = {}
+    changed = []
+    for candidate in candidates:
+        entry = old_assets.get(candidate['id'])
+        if (entry and entry['content_hash'] == candidate['content_hash'] and entry['name'] == candidate['name']
+                and len(hashes_by_file[entry['file']]) == 1
+                and os.path.exists(os.path.join(basedir, entry['file']))):
+            assets[candidate['id']] = entry
+        else:
+            changed.append(candidate)
+
+    # Changed nodes that render an asset which is already on disk reuse its file
+    files_by_content = {(entry.get('format'), entry['content_hash']): entry['file'] for entry in assets.values()}
+    to_download = []
+    for candidate in changed:
+        file_name = files_by_content.get((candidate['format'], candidate['content_hash']))
+        if file_name:
+            assets[candidate['id']] = asset_manifest_entry(candidate, file_name)
+        else:
+            to_download.append(candidate)
+    print(f"{len(assets)} images are up to date, {len(to_download)} to download")
+
+    image_data = resolve_image_urls(file_key, to_download, figma_token)
+
+    # Shared assets resolve to the same export URL, download each URL once. File names are
+    # picked before the downloads start, so assets sharing a name never race for one file
+    taken = {os.path.splitext(entry['file'])[0].lower() for entry in assets.values()}
+    downloads = {}
     for image_id, value in image_data.items():
-        image_name = value['name']  # Extract the image name
-        image_url = value['image_url']  # Extract the image URL
-        print(f"Downloading image: {image_name} from {image_url}")
-        
-        headers = {"X-FIGMA-TOKEN": figma_token}
-        img_response = requests.get(image_url, headers=headers)
-        
-        if img_response.status_code != 200:
-            print(f"Failed to download image {image_id} (status code: {img_response.status_code})")
+        if value['image_url'] not in downloads:
+            downloads[value['image_url']] = (image_id, unique_file_stem(value['name'], image_id, taken))
+
+    client = get_figma_client(figma_token)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            image_url: executor.submit(download_image, client, basedir, image_id, image_name, image_url)
+            for image_url, (image_id, image_name) in downloads.items()
+        }
+        file_names = {image_url: future.result() for image_url, future in futures.items()}
+
+    for candidate in to_download:
+        value = image_data.get(candidate['id'])
+        file_name = file_names.get(value['image_url']) if value else None
+        if file_name:
+            assets[candidate['id']] = asset_manifest_entry(candidate, file_name)
+
+    # Delete the files of assets whose nodes were removed or now export to a different file
+    files_in_use = {entry['file'] for entry in assets.values()}
+    for entry in old_assets.values():
+        path = os.path.join(basedir, entry['file'])
+        if entry['file'] not in files_in_use and os.path.exists(path):
+            print(f"Removing orphaned image {entry['file']}")
+            os.remove(path)
+
+    save_asset_manifest(basedir, {"version": figma_data.get("version"), "assets": assets})
+
+    # Keep the discovery order so the result does not depend on which download finished first
+    return [candidate['id'].replace(":", "-") for candidate in candidates if candidate['id'] in assets]
+
+# Maximum number of node ids sent in a single /images export request. Figma
+# accepts comma separated ids, this keeps the query string well under URL limits.
+IMAGE_EXPORT_BATCH_SIZE = 50
+
+# Keys that do not change how an exported node looks
+CONTENT_HASH_IGNORED_KEYS = {
+    'id', 'name', 'constraints', 'interactions', 'transitionNodeID', 'scrollBehavior',
+    'layoutAlign', 'layoutGrow', 'layoutPositioning', 'boundVariables', 'componentId',
+}
+
+def content_hash(node):
+    """
+    Hashes what a node renders to, ignoring its ID, name and position on the page.
+
+    For image filled rectangles this is their imageRef together with what changes the
+    export of it (size, crop and scale mode, effects), so nodes showing the same photo
+    at the same size share a hash, and a photo shown at two sizes gets two exports.
+    """
+    def normalize(data):
+        if isinstance(data, dict):
+            normalized = {}
+            for key, value in data.items():
+                if key in CONTENT_HASH_IGNORED_KEYS:
+                    continue
+                if key in ('absoluteBoundingBox', 'absoluteRenderBounds') and isinstance(value, dict):
+                    value = {'width': value.get('width'), 'height': value.get('height')}
+                normalized[key] = normalize(value)
+            return normalized
+        if isinstance(data, list):
+            return [normalize(item) for item in data]
+        return data
+
+    serialized = json.dumps(normalize(node), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha1(serialized.encode("utf-8")).hexdigest()
+
+def get_figma_node(figma_data, node_id):
+    """
+    Returns the entry of a node in a fetch_figma_data response.
+    """
+    if node_id and 'nodes' in figma_data:
+        return figma_data['nodes'][node_id.replace("-",":")]
+    # A whole file response, its 'document' is walked like a node entry
+    return figma_data
+
+def collect_image_candidates(node, format="png", scale=2):
+    """
+    Walks a Figma node tree and collects the nodes that should be exported as images.
+
+    RECTANGLE nodes with an IMAGE fill are exported as raster images, groups whose
+    children are all VECTOR nodes are exported as a single SVG (and not descended into).
+
+    Args:
+    - node (dict): A Figma node, or an entry of the /files/{key}/nodes response.
+    - format (str): Export format for image filled rectangles.
+    - scale (int): Export scale for image filled rectangles.
+
+    Returns:
+    - list: Candidate dicts with 'id', 'name', 'format', 'scale' and 'content_hash'
+      (plus 'imageRef' for image fills), in tree order.
+    """
+    candidates = []
+    # Keys of the vector groups exported as a whole and of everything below them
+    exported_groups = set()
+
+    for key, entry in NodeIndex(node).items():
+        if entry.parent_id in exported_groups:
+            exported_groups.add(key)
             continue
-        
-        content_type = img_response.headers.get("Content-Type", "").lower()
-        
-        if "svg" in content_type:
-            print("The image is an SVG.")
-            image_content = img_response.text  # SVG is text-based
-            file_extension = "svg"
-        else:
-            image = Image.open(BytesIO(img_response.content))
-            print(f"Downloaded image format: {image.format}")
-            image_content = img_response.content
-            file_extension = image.format.lower()
-        
-        if not os.path.exists(basedir):
-            os.makedirs(basedir)
-            
-        file_mode = "w" if file_extension == "svg" else "wb"
-        with open(f"{basedir}/{image_name}.{file_extension}", file_mode) as img_file:
-            img_file.write(image_content)
-            print(f"Saved image {image_name}.{file_extension} to {basedir}")
-            node_ids.append(image_id.replace(":", "-")) 
-
-    return node_ids
-
-def fetch_image_ids_from_node(file_key, node_id, figma_token, format="png", scale=2):
-    headers = {"X-FIGMA-TOKEN": figma_token}
-    endpoint = f"https://api.figma.com/v1/files/{file_key}/nodes"
-    params = {"ids": node_id}
-    
-    response = requests.get(endpoint, headers=headers, params=params)
-    
-    if response.status_code != 200:
-        raise Exception(f"Error: {response.status_code}, {response.text}")
-    
-    data = response.json()
-    node = data['nodes'][node_id.replace("-",":")]
-    
+        node = entry.node
+        # The document of a response is only walked through
+        if 'type' not in node or entry.path[-1:] == ('document',):
+            continue
+        if node['type'] == 'RECTANGLE' and 'fills' in node:
+            image_fills = [fill for fill in node['fills'] if fill.get('type') == 'IMAGE']
+            if image_fills:
+                candidates.append({
+                    'id': node['id'], 'name': node['name'], 'format': format, 'scale': scale,
+                    'content_hash': content_hash(node), 'imageRef': image_fills[0].get('imageRef'),
+                })
+
+        if 'children' in node and all(child['type'] == 'VECTOR' for child in node['children']):
+            candidates.append({
+                'id': node['id'], 'name': node['name'], 'format': 'svg', 'scale': 1,
+                'content_hash': content_hash(node),
+            })
+            exported_groups.add(key)
+
+    return candidates
+
+def export_image_urls(file_key, ids, figma_token, format="png", scale=2):
+    """
+    Resolves export URLs for many nodes with a few chunked multi-id /images requests.
+
+    Args:
+    - file_key (str): The Figma file key.
+    - ids (list): Node IDs to export.
+    - figma_token (str): The Figma access token.
+    - format (str): Export format (png, jpg, svg or pdf).
+    - scale (int): Export scale.
+
+    Returns:
+    - dict: A mapping of node ID to image URL. Nodes Figma could not render, or whose
+      batch still failed after retries, map to None so the other batches are kept.
+    """
+    client = get_figma_client(figma_token)
+    endpoint = f"{FIGMA_API_BASE_URL}/images/{file_key}"
+
+    image_urls = {}
+    for start in range(0, len(ids), IMAGE_EXPORT_BATCH_SIZE):
+        batch = ids[start:start + IMAGE_EXPORT_BATCH_SIZE]
+        params = {"ids": ",".join(batch), "format": format, "scale": scale}
+        try:
+            images = client.get_json(endpoint, params=params).get('images') or {}
+        except (requests.RequestException, ValueError) as e:
+            print(f"Failed to export {len(batch)} images as {format}: {e}")
+            images = {}
+        for image_id in batch:
+            image_urls[image_id] = images.get(image_id.replace("-", ":"))
+    return image_urls
+
+def resolve_image_urls(file_key, candidates, figma_token):
+    """
+    Exports image candidates with one batch of chunked /images requests per format and scale.
+
+    Candidates with the same content hash (nodes sharing an imageRef and rendering
+    identically, or identical vector groups) are exported once, through the first
+    of them, and all map to its name and URL.
+
+    Returns:
+    - dict: A mapping of node ID to {'name': ..., 'image_url': ...}, without the nodes
+      Figma could not export.
+    """
+    representatives = {}
+    for candidate in candidates:
+        representatives.setdefault((candidate['format'], candidate['scale'], candidate['content_hash']), candidate)
+
+    # Group candidates so each format/scale combination is exported in as few requests as possible
+    groups = {}
+    for (group_format, group_scale, _), representative in representatives.items():
+        groups.setdefault((group_format, group_scale), []).append(representative['id'])
+
+    image_urls = {}
+    for (group_format, group_scale), ids in groups.items():
+        image_urls.update(export_image_urls(file_key, ids, figma_token, group_format, group_scale))
+
     image_data = {}
-    
-    def extract_images_from_node(node, format):
-        all_children_are_vectors = False
-        if 'type' in node:
-            if node['type'] == 'RECTANGLE' and 'fills' in node:
-                for fill in node['fills']:
-                    if fill.get('type') == 'IMAGE':
-                        image_id = node['id']
-                        image_url = f"https://api.figma.com/v1/images/{file_key}?ids={image_id}&format={format}&scale=2"
-                        response = requests.get(image_url, headers=headers)
-                        if response.status_code != 200:
-                            raise Exception(f"Error: {response.status_code}, {response.text}")
-                        image_url = response.json()['images'][image_id]
-                        image_data[image_id] = {'name': node['name'], 'image_url': image_url}
-            
-            if 'children' in node:
-                all_children_are_vectors = all(child['type'] == 'VECTOR' for child in node['children'])
-                if all_children_are_vectors:
-                    image_url = f"https://api.figma.com/v1/images/{file_key}?ids={node['id']}&format=svg"
-                    response = requests.get(image_url, headers=headers)
-                    response_result = response.json()
-                    image_url = response_result['images'][node['id'].replace("-", ":")]
-                    if image_url is None:
-                        print(f"Image URL is None for node {node['id']}")
-                        return
-                    image_data[node['id']] = {'name': node['name'], 'image_url': image_url}
-                    if response.status_code != 200:
-                        raise Exception(f"Error: {response.status_code}, {response.text}")
-        
-        if not all_children_are_vectors:
-            if 'document' in node:
-                for child in node['document']['children']:
-                    extract_images_from_node(child, format)
-            if 'children' in node:
-                for child in node['children']:
-                    extract_images_from_node(child, format)
-    
-    extract_images_from_node(node, format)
+    for candidate in candidates:
+        representative = representatives[(candidate['format'], candidate['scale'], candidate['content_hash'])]
+        image_url = image_urls.get(representative['id'])
+        if image_url is None:
+            print(f"Image URL is None for node {candidate['id']}")
+            continue
+        image_data[candidate['id']] = {'name': representative['name'], 'image_url': image_url}
     return image_data
 
+def fetch_image_ids_from_node(file_key, node_id, figma_token, format="png", scale=2, figma_data=None):
+    """
+    Finds the exportable images under a node and resolves their export URLs.
+
+    The tree is walked first to collect every candidate, then the candidates are
+    exported with one batch of chunked /images requests per format and scale.
+
+    Args:
+    - figma_data (dict): The already fetched fetch_figma_data response for the node.
+      The node tree is only requested from Figma when this is not given.
+
+    Returns:
+    - dict: A mapping of node ID to {'name': ..., 'image_url': ...}.
+    """
+    if figma_data is None:
+        figma_data = fetch_figma_data(file_key, node_id)
+
+    candidates = collect_image_candidates(get_figma_node(figma_data, node_id), format, scale)
+    return resolve_image_urls(file_key, candidates, figma_token)
+
 
 # Main execution
 if __name__ == "__main__":
@@ -226,7 +519,7 @@ if __name__ == "__main__":
 
         
         # Download and save all images
-        download_and_save_images(basedir=".", figma_url=figma_url)  # Change format as needed
+        download_and_save_images(basedir=".", figma_url=figma_url, figma_data=figma_data)  # Change format as needed
        
 
     except Exception as e:
@@ -0,0 +1,207 @@
+import os
+import json
+import time
+import atexit
+import hashlib
+import threading
+from contextlib import contextmanager
+from figma_apis import fetch_figma_data, fetch_figma_image, fetch_file_version
+
+#This file keeps Figma node JSON and reference renders on disk so unchanged designs are not fetched again
+
+
+# Constants
+CACHE_DIR = ".figma_cache"
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock"
+
+try:
+    import fcntl
+except ImportError:
+    # No advisory file locks (Windows): processes sharing a cache directory may then lose entries
+    fcntl = None
+
+
+class FigmaCache:
+    """
+    An on-disk, size capped LRU cache for Figma API payloads.
+
+    Entries are keyed by (file_key, node_id, scale, format) and remember the Figma
+    file version they were fetched at. A cached entry is only returned while the
+    file's version is unchanged, or unconditionally when running offline.
+
+    Reads only update the access order in memory. It is written with the next put,
+    by flush, or when the process exits. Writes reload the index under a file lock and
+    merge this instance's changes into it, so processes can share a cache directory.
+    Entries larger than max_bytes are not cached.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, offline=False):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._versions = {}
+        self._lock = threading.Lock()
+        # Changes not written to the index yet: access times of reads and entries found missing
+        self._accessed = {}
+        self._missing = set()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._index = self._load_index()
+        atexit.register(self.flush)
+
+    def _load_index(self):
+        try:
+            with open(os.path.join(self.cache_dir, INDEX_FILE), "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    @contextmanager
+    def _index_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.cache_dir, LOCK_FILE), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _reload_index(self):
+        """Reloads the index written by any process and reapplies the pending changes of this one."""
+        index = self._load_index()
+        for key in self._missing:
+            index.pop(key, None)
+        for key, (version, last_access) in self._accessed.items():
+            entry = index.get(key)
+            if entry is not None and entry["version"] == version:
+                entry["last_access"] = max(entry["last_access"], last_access)
+        self._index = index
+
+    def _save_index(self, entries=None):
+        """
+        Merges the pending changes and new entries into the index on disk, evicts and writes it.
+        """
+        path = os.path.join(self.cache_dir, INDEX_FILE)
+        with self._index_lock():
+            self._reload_index()
+            self._index.update(entries or {})
+            self._evict()
+            # Written to a temporary file and swapped in, so a crash never leaves a partial index
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, "w") as f:
+                json.dump(self._index, f)
+            os.replace(temp_path, path)
+        self._accessed.clear()
+        self._missing.clear()
+
+    def flush(self):
+        """
+        Writes the access order recorded by reads since the last write.
+        """
+        with self._lock:
+            if self._accessed or self._missing:
+                self._save_index()
+
+    @staticmethod
+    def make_key(file_key, node_id, scale, format):
+        return f"{file_key}/{(node_id or '').replace('-', ':')}/{scale}/{format}"
+
+    def file_version(self, file_key):
+        """
+        Returns the current version of a Figma file, looked up at most once per cache instance.
+        """
+        if file_key not in self._versions:
+            self._versions[file_key] = fetch_file_version(file_key)
+        return self._versions[file_key]
+
+    def get(self, key, version=None):
+        """
+        Returns the cached bytes for a key, or None on a miss.
+
+        Args:
+        - key (str): The cache key, see make_key.
+        - version (str): The expected file version. None accepts any cached version.
+        """
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                # Another process may have cached it since the index was read
+                self._reload_index()
+                entry = self._index.get(key)
+            if entry is None or (version is not None and entry["version"] != version):
+                return None
+            try:
+                with open(os.path.join(self.cache_dir, entry["file"]), "rb") as f:
+                    data = f.read()
+            except OSError:
+                del self._index[key]
+                self._missing.add(key)
+                return None
+            entry["last_access"] = time.time()
+            self._accessed[key] = (entry["version"], entry["last_access"])
+            return data
+
+    def put(self, key, version, data):
+        """
+        Stores bytes for a key and evicts least recently used entries above the size cap.
+
+        Data larger than the cap is not stored, it would evict itself right away.
+        """
+        if len(data) > self.max_bytes:
+            return
+        with self._lock:
+            file_name = hashlib.sha1(key.encode("utf-8")).hexdigest()
+            path = os.path.join(self.cache_dir, file_name)
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._missing.discard(key)
+            self._accessed.pop(key, None)
+            self._save_index({key: {"file": file_name, "version": version, "size": len(data),
+                                    "last_access": time.time()}})
+
+    def _evict(self):
+        total = sum(entry["size"] for entry in self._index.values())
+        for key, entry in sorted(self._index.items(), key=lambda item: item[1]["last_access"]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.cache_dir, entry["file"]))
+            except OSError:
+                pass
+            total -= entry["size"]
+            del self._index[key]
+
+    def _fetch(self, key, file_key, fetch):
+        if self.offline:
+            data = self.get(key)
+            if data is None:
+                raise Exception(f"Offline mode: {key} is not in the cache at {self.cache_dir}")
+            return data
+
+        version = self.file_version(file_key)
+        data = self.get(key, version)
+        if data is None:
+            data = fetch()
+            self.put(key, version, data)
+        else:
+            print(f"Using cached {key} (version {version})")
+        return data
+
+    def fetch_figma_data(self, file_key, node_id=None):
+        """
+        Cached version of figma_apis.fetch_figma_data.
+        """
+        key = self.make_key(file_key, node_id, 1, "json")
+        data = self._fetch(key, file_key, lambda: json.dumps(fetch_figma_data(file_key, node_id)).encode("utf-8"))
+        return json.loads(data)
+
+    def fetch_figma_image(self, file_key, node_id, scale=1, format="png"):
+        """
+        Cached version of figma_apis.fetch_figma_image.
+        """
+        key = self.make_key(file_key, node_id, scale, format)
+        return self._fetch(key, file_key, lambda: fetch_figma_image(file_key, node_id, scale, format))
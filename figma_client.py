@@ -0,0 +1,217 @@
+import time
+import random
+import threading
+import email.utils
+from urllib.parse import urlparse
+import requests
+from requests.adapters import HTTPAdapter
+
+#This file holds the shared HTTP client that every Figma API call goes through
+
+
+# Constants
+FIGMA_API_BASE_URL = "https://api.figma.com/v1"
+RETRY_STATUS_CODES = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 60.0
+# (connect, read) timeouts in seconds
+TIMEOUT = (10, 120)
+# Concurrent requests allowed per Figma token, shared by every client using that token
+MAX_CONCURRENCY_PER_TOKEN = 4
+POOL_SIZE = 16
+
+_token_semaphores = {}
+_token_semaphores_lock = threading.Lock()
+
+
+def _token_semaphore(token, limit):
+    """
+    Returns the semaphore shared by every client of a token.
+
+    Raises:
+    - ValueError: If the token is already limited to a different number of calls.
+    """
+    with _token_semaphores_lock:
+        if token not in _token_semaphores:
+            _token_semaphores[token] = (threading.BoundedSemaphore(limit), limit)
+        semaphore, token_limit = _token_semaphores[token]
+        if token_limit != limit:
+            raise ValueError(f"This token is already limited to {token_limit} concurrent calls, not {limit}")
+        return semaphore
+
+
+def endpoint_name(url):
+    """
+    Returns a metrics label for a URL, e.g. 'GET /v1/files/:key/nodes' or 'GET s3-alpha.figma.com'.
+    """
+    parsed = urlparse(url)
+    if not url.startswith(FIGMA_API_BASE_URL):
+        return f"GET {parsed.netloc}"
+    parts = parsed.path.strip("/").split("/")
+    # parts look like ['v1', 'files', '<file_key>', 'nodes'], hide the file key
+    if len(parts) > 2:
+        parts[2] = ":key"
+    return "GET /" + "/".join(parts)
+
+
+def retry_after_seconds(response):
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+    """
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(retry_at.timestamp() - time.time(), 0.0)
+
+
+class FigmaClient:
+    """
+    A pooled HTTP client for the Figma API.
+
+    Requests share one keep-alive session, time out instead of hanging, and are
+    retried on 429 and transient 5xx responses with exponential backoff and full
+    jitter, honouring Retry-After when Figma sends it. Calls to the Figma API are
+    limited to a fixed number in flight per token. Request counts, bytes and
+    latency are recorded per endpoint.
+    """
+
+    def __init__(self, token, max_retries=MAX_RETRIES, timeout=TIMEOUT,
+                 max_concurrency=MAX_CONCURRENCY_PER_TOKEN, pool_size=POOL_SIZE):
+        self.token = token
+        self.max_retries = max_retries
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._semaphore = _token_semaphore(token, max_concurrency)
+        self._metrics = {}
+        self._metrics_lock = threading.Lock()
+
+    def _record(self, name, latency, response=None, stream=False, retried=False, failed=False):
+        with self._metrics_lock:
+            metrics = self._metrics.setdefault(name, {"requests": 0, "retries": 0, "errors": 0, "bytes": 0, "latency": 0.0})
+            metrics["requests"] += 1
+            metrics["latency"] += latency
+            if retried:
+                metrics["retries"] += 1
+            if failed:
+                metrics["errors"] += 1
+            if response is not None:
+                if stream:
+                    # Streamed bodies are not read yet, count their declared length
+                    metrics["bytes"] += int(response.headers.get("Content-Length") or 0)
+                else:
+                    metrics["bytes"] += len(response.content)
+
+    def _backoff(self, attempt, response=None):
+        delay = retry_after_seconds(response) if response is not None else None
+        if delay is None:
+            delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+        return delay
+
+    def get(self, url, params=None, stream=False):
+        """
+        Sends a GET request, retrying rate limited and transient failures.
+
+        The Figma token is only attached to Figma API URLs, other URLs (such as the
+        signed asset URLs returned by /images) are fetched without it and outside the
+        per-token concurrency limit.
+
+        Returns:
+        - requests.Response: The final response, which may still be an error response.
+
+        Raises:
+        - requests.RequestException: If the request still fails after all retries.
+        """
+        is_api_call = url.startswith(FIGMA_API_BASE_URL)
+        headers = {"X-FIGMA-TOKEN": self.token} if is_api_call else {}
+        name = endpoint_name(url)
+
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            response = None
+            try:
+                if is_api_call:
+                    with self._semaphore:
+                        response = self.session.get(url, headers=headers, params=params, timeout=self.timeout, stream=stream)
+                else:
+                    response = self.session.get(url, headers=headers, params=params, timeout=self.timeout, stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self._record(name, time.perf_counter() - start, retried=attempt > 0, failed=True)
+                if attempt == self.max_retries:
+                    raise
+                delay = self._backoff(attempt)
+                print(f"{name} failed ({e}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+                continue
+
+            retryable = response.status_code in RETRY_STATUS_CODES and attempt < self.max_retries
+            self._record(name, time.perf_counter() - start, response, stream, retried=attempt > 0,
+                         failed=response.status_code >= 400)
+            if not retryable:
+                return response
+
+            delay = self._backoff(attempt, response)
+            print(f"{name} returned {response.status_code}, retrying in {delay:.1f}s")
+            response.close()
+            time.sleep(delay)
+
+    def get_json(self, url, params=None):
+        """
+        Sends a GET request and returns the decoded JSON body.
+
+        Raises:
+        - requests.HTTPError: If the response is not successful after all retries.
+        - ValueError: If the body is not JSON.
+        """
+        response = self.get(url, params=params)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Error: {response.status_code}, {response.text}", response=response)
+        return response.json()
+
+    def metrics(self):
+        """
+        Returns a copy of the per endpoint request metrics.
+        """
+        with self._metrics_lock:
+            return {name: dict(metrics) for name, metrics in self._metrics.items()}
+
+    def print_metrics(self):
+        """
+        Prints the per endpoint request metrics, slowest endpoint first.
+        """
+        for name, metrics in sorted(self.metrics().items(), key=lambda item: -item[1]["latency"]):
+            print(f"{name}: {metrics['requests']} requests ({metrics['retries']} retries, {metrics['errors']} errors), "
+                  f"{metrics['bytes'] / 1024:.1f} KB, {metrics['latency']:.2f}s")
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_figma_client(token, max_concurrency=MAX_CONCURRENCY_PER_TOKEN):
+    """
+    Returns the shared client for a Figma token, creating it on first use.
+
+    Raises:
+    - ValueError: If the shared client was created with a different max_concurrency.
+    """
+    with _clients_lock:
+        if token not in _clients:
+            _clients[token] = FigmaClient(token, max_concurrency=max_concurrency)
+        client = _clients[token]
+        if client.max_concurrency != max_concurrency:
+            raise ValueError(f"The client of this token is limited to {client.max_concurrency} concurrent calls, "
+                             f"not {max_concurrency}")
+        return client
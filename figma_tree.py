@@ -0,0 +1,124 @@
+import threading
+from figma_apis import fetch_figma_data
+
+#This file fetches large Figma documents a few levels at a time and loads deeper subtrees on demand
+
+
+# Constants
+LAZY_DEPTH = 3
+# Node IDs sent in a single /nodes request when loading subtrees
+NODES_BATCH_SIZE = 50
+# Node types that can have children, only these are loaded when the depth limit cut them off
+CONTAINER_TYPES = {
+    "DOCUMENT", "CANVAS", "FRAME", "GROUP", "SECTION", "COMPONENT", "COMPONENT_SET",
+    "INSTANCE", "BOOLEAN_OPERATION",
+}
+
+
+class LazyFigmaTree:
+    """
+    A Figma node tree that is fetched with a depth limit and filled in on demand.
+
+    Only the top `depth` levels under the node are fetched up front. Containers cut
+    off by the limit are remembered as pending and their children are fetched (in
+    batched multi-id /nodes requests) the first time they are asked for, then spliced
+    into the tree in place. Each subtree is requested at most once.
+
+    Without a node_id the whole file is fetched the same way, from its document down.
+    """
+
+    def __init__(self, file_key, node_id, depth=LAZY_DEPTH):
+        self.file_key = file_key
+        self.node_id = node_id.replace("-", ":") if node_id else None
+        self.depth = depth
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._data = fetch_figma_data(file_key, node_id, depth=depth)
+        if self.node_id:
+            self.root = self._data['nodes'][self.node_id]['document']
+        else:
+            self.root = self._data['document']
+        self._mark_pending(self.root, depth)
+
+    def _mark_pending(self, root, depth):
+        """
+        Records the containers at the depth limit under root whose children were not fetched.
+        """
+        if depth is None:
+            return
+        stack = [(root, 0)]
+        while stack:
+            node, level = stack.pop()
+            if level >= depth:
+                if node.get('type') in CONTAINER_TYPES and not node.get('children'):
+                    self._pending[node['id']] = node
+                continue
+            # Pushed in reverse so pending nodes are recorded, and later fetched, in tree order
+            for child in reversed(node.get('children', [])):
+                stack.append((child, level + 1))
+
+    def response(self):
+        """
+        Returns the tree in the shape of a fetch_figma_data response, as loaded so far.
+        """
+        return self._data
+
+    def load(self, nodes, depth=LAZY_DEPTH):
+        """
+        Fetches the children of every pending node in nodes, a batch of IDs per request.
+
+        Args:
+        - nodes (list): Nodes of this tree. Nodes that are already loaded are skipped.
+        - depth (int): Levels to fetch below each node, None fetches the whole subtree.
+        """
+        with self._lock:
+            ids = list(dict.fromkeys(node['id'] for node in nodes if node.get('id') in self._pending))
+            for start in range(0, len(ids), NODES_BATCH_SIZE):
+                batch = ids[start:start + NODES_BATCH_SIZE]
+                data = fetch_figma_data(self.file_key, ",".join(batch), depth=depth)
+                for node_id in batch:
+                    node = self._pending.pop(node_id)
+                    entry = data['nodes'].get(node_id)
+                    if entry is None:
+                        continue
+                    node['children'] = entry['document'].get('children', [])
+                    self._mark_pending(node, depth)
+
+    def children(self, node):
+        """
+        Returns a node's children, fetching them first if the depth limit cut them off.
+
+        The children are fetched with the depth the tree was built with.
+        """
+        self.load([node], depth=self.depth)
+        return node.get('children', [])
+
+    def pending_count(self):
+        return len(self._pending)
+
+    def expand(self, fits, max_rounds=None):
+        """
+        Loads deeper levels only while the tree is still small enough to use them.
+
+        Every round fetches `depth` more levels below all the pending nodes, until
+        nothing is pending or fits(response) rejects the tree loaded so far.
+
+        Args:
+        - fits (callable): Takes the response and returns whether it may grow further.
+        - max_rounds (int): Stop after this many rounds, None for no limit.
+
+        Returns:
+        - int: The number of rounds that were fetched.
+        """
+        rounds = 0
+        while self._pending and (max_rounds is None or rounds < max_rounds) and fits(self._data):
+            self.load(list(self._pending.values()), depth=self.depth)
+            rounds += 1
+        return rounds
+
+    def load_all(self):
+        """
+        Fetches every pending subtree in full and returns the completed response.
+        """
+        self.load(list(self._pending.values()), depth=None)
+        return self._data
@@ -1,65 +1,89 @@
 from openai import OpenAI
 from write_code import write_code
-import os, json
-from figma_apis import parse_figma_url, fetch_figma_data, fetch_figma_image, download_and_save_images
-from clean_json import process_json, remove_children_by_ids
+import os, sys, json
+from figma_apis import parse_figma_url, download_and_save_images, figma_token
+from figma_client import get_figma_client
+from figma_cache import FigmaCache
+from figma_tree import LazyFigmaTree
+from optimize_assets import optimize_assets
+from svg_assets import process_svg_assets
+from clean_json import process_json, process_json_parallel, remove_children_by_ids
+from dedupe_json import dedupe_subtrees
+from design_tokens import extract_design_tokens, write_tailwind_tokens
+from prompt_serializer import PROMPT_TOKEN_BUDGET, estimate_tokens, format_style_info
 from test_UI import test_UI
 
 global figma_url
 
-base_dir = os.getcwd()
-print("Current working directory: " + base_dir)
+# Run with --offline to reuse the cached Figma data without touching the network
+offline = "--offline" in sys.argv
+# Run with --lazy to fetch only the top levels of the design and load deeper subtrees when needed
+lazy = "--lazy" in sys.argv and not offline
+# Run with --dedupe to send repeated subtrees (cards, list rows, style blocks) to the model only once
+dedupe = "--dedupe" in sys.argv
+# Run with --tokens to replace colors, type styles, radii and spacings with shared design tokens
+tokens = "--tokens" in sys.argv
+
+# Main workflow
+if __name__ == "__main__":
+    # Prompts and clients are set up here, not at import time: worker processes started
+    # with spawn (macOS, Windows) import this module again and must not block on input()
+    base_dir = os.getcwd()
+    print("Current working directory: " + base_dir)
 
 
-if not os.path.exists("figma_url.txt"):
-    with open("figma_url.txt", "w") as f:
-        f.write("")
+    if not os.path.exists("figma_url.txt"):
+        with open("figma_url.txt", "w") as f:
+            f.write("")
 
-with open("figma_url.txt", "r") as f:
-    figma_url = f.read().strip()
+    with open("figma_url.txt", "r") as f:
+        figma_url = f.read().strip()
 
-if figma_url == "":
-    figma_url = input("Enter Figma URL: ")
-    with open("figma_url.txt", "w") as f:
-        f.write(figma_url)
-else:
-    print("Figma URL found in figma_url.txt: " + figma_url)
-    print("Press Enter to use this URL or type in the new URL")
-    new_url = input()
-    if new_url != "":
-        figma_url = new_url
+    if figma_url == "":
+        figma_url = input("Enter Figma URL: ")
         with open("figma_url.txt", "w") as f:
             f.write(figma_url)
+    else:
+        print("Figma URL found in figma_url.txt: " + figma_url)
+        print("Press Enter to use this URL or type in the new URL")
+        new_url = input()
+        if new_url != "":
+            figma_url = new_url
+            with open("figma_url.txt", "w") as f:
+                f.write(figma_url)
 
-client = OpenAI()
+    client = OpenAI()
 
 
-if not os.path.exists("rules.txt"):
-    with open("rules.txt", "w") as f:
-        f.write("")
+    if not os.path.exists("rules.txt"):
+        with open("rules.txt", "w") as f:
+            f.write("")
 
-with open("rules.txt", "r") as f:
-    rules = f.read().strip()
+    with open("rules.txt", "r") as f:
+        rules = f.read().strip()
 
-    if rules == "":
-        print("No rules found, please enter rules in rules.txt")
-    else:
-        print("Rules found in rules.txt: " + rules)
-        print("Press Enter to use these rules") 
-        input()
+        if rules == "":
+            print("No rules found, please enter rules in rules.txt")
+        else:
+            print("Rules found in rules.txt: " + rules)
+            print("Press Enter to use these rules") 
+            input()
 
-# Main workflow
-if __name__ == "__main__":
     #chat_history = []
 
     file_key, node_id = parse_figma_url(figma_url)
-    figma_data = fetch_figma_data(file_key, node_id)
+    figma_cache = FigmaCache(offline=offline)
+    if lazy:
+        figma_tree = LazyFigmaTree(file_key, node_id)
+        figma_data = figma_tree.response()
+    else:
+        figma_data = figma_cache.fetch_figma_data(file_key, node_id)
 
     with open('figma_data.json', 'w') as f:
         f.write(json.dumps(figma_data, indent=4))
         
     with open('reference.png', 'wb') as img_file:
-        img_file.write(fetch_figma_image(file_key, node_id))
+        img_file.write(figma_cache.fetch_figma_image(file_key, node_id))
 
     print("Reference image saved at './reference.png\n\n")
 
@@ -73,27 +97,62 @@ if __name__ == "__main__":
         os.makedirs('./'+route)
     
     from config_initial import config
-    print("Press Enter to download images, or type any other key to skip")
-    if input() == "":
-        node_ids_of_images = download_and_save_images('./'+route, figma_url)
+    # A whole file fetch holds every page, its frames are cleaned on all cores
+    clean = process_json if node_id else process_json_parallel
+    if offline:
+        print("Offline mode, skipping image download")
+        download_images = False
+    else:
+        print("Press Enter to download images, or type any other key to skip")
+        download_images = input() == ""
+    if download_images:
+        if lazy:
+            # Asset discovery needs every node, load the remaining subtrees in batched requests
+            figma_data = figma_tree.load_all()
+        node_ids_of_images = download_and_save_images('./'+route, figma_url, figma_data=figma_data)
 
         #print paths of images
         print("Images have been downloaded at "+route)
+
+        print("Press Enter to generate optimized image variants (1x/2x WebP), or type any other key to skip")
+        if input() == "":
+            optimize_assets('./'+route)
+
+        print("Press Enter to minify SVG icons, type s to also merge them into sprite.svg or r into React components in icons.js, or type any other key to skip")
+        svg_mode = {"": "minify", "s": "sprite", "r": "react"}.get(input())
+        if svg_mode:
+            process_svg_assets('./'+route, svg_mode)
         #Convert - to :  in node_ids_of_images
         node_ids_of_images = [node_id.replace("-", ":") for node_id in node_ids_of_images]  
         processed_json = remove_children_by_ids(figma_data, node_ids_of_images)
-        processed_json = process_json(processed_json, config)
+        processed_json = clean(processed_json, config)
 
         with open('cleaned_figma_data.json', 'w') as f:
             f.write(json.dumps(processed_json, indent=4))
 
     else:
+        if lazy:
+            # Load deeper levels only while the cleaned design still fits the prompt, deeper ones would be summarized anyway
+            figma_tree.expand(lambda data: estimate_tokens(format_style_info(process_json(data, config))) <= PROMPT_TOKEN_BUDGET)
         processed_json = figma_data
-        processed_json = process_json(processed_json, config)
+        processed_json = clean(processed_json, config)
 
         #with open('cleaned_figma_data.json', 'w') as f:
         #    f.write(json.dumps(processed_json, indent=4))
 
+    if tokens:
+        tree, design_tokens = extract_design_tokens(processed_json)
+        processed_json = {"designTokens": design_tokens, **tree}
+        write_tailwind_tokens('./'+route, design_tokens)
+
+    if dedupe:
+        tree, definitions = dedupe_subtrees(processed_json)
+        if definitions:
+            processed_json = {"definitions": definitions, **tree}
+
+    # Show where the time spent fetching from Figma went
+    get_figma_client(figma_token).print_metrics()
+
 
     
 
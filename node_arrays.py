@@ -0,0 +1,165 @@
+import numpy as np
+from node_index import NodeIndex
+
+#This file stores the geometry of a Figma tree as parallel NumPy arrays, so spacing, hit-testing and layout analysis can run as array operations
+
+
+# Constants
+TYPE_CODES = ("UNKNOWN", "DOCUMENT", "CANVAS", "FRAME", "GROUP", "SECTION", "COMPONENT", "COMPONENT_SET", "INSTANCE",
+              "TEXT", "RECTANGLE", "ELLIPSE", "VECTOR", "LINE", "STAR", "REGULAR_POLYGON", "BOOLEAN_OPERATION", "SLICE")
+TYPE_CODE = {node_type: code for code, node_type in enumerate(TYPE_CODES)}
+PADDING_KEYS = ("paddingLeft", "paddingTop", "paddingRight", "paddingBottom")
+# Keys that only frames have, used to tell frames from groups once "type" has been cleaned away
+FRAME_KEYS = ("layoutMode", "clipsContent", "backgroundColor", "cornerRadius", "itemSpacing") + PADDING_KEYS
+
+
+def infer_type(node):
+    """
+    Returns the Figma type of a node, guessed from its other keys when "type" was removed.
+
+    Text nodes have characters, containers with frame properties are frames and other
+    containers groups. Leaves with an image fill or a fill, stroke or corner radius are
+    rectangles, the remaining leaves vectors.
+    """
+    node_type = node.get("type")
+    if node_type in TYPE_CODE:
+        return node_type
+    if "characters" in node:
+        return "TEXT"
+    if "children" in node:
+        return "FRAME" if any(key in node for key in FRAME_KEYS) else "GROUP"
+    if "size" not in node:
+        return "UNKNOWN"
+    fills = node.get("fills")
+    if isinstance(fills, list) and any(isinstance(fill, dict) and fill.get("type") == "IMAGE" for fill in fills):
+        return "RECTANGLE"
+    if any(key in node for key in ("fillColor", "strokeColor", "cornerRadius")):
+        return "RECTANGLE"
+    return "VECTOR"
+
+
+class NodeArrays:
+    """
+    The nodes of a Figma tree as parallel arrays, in tree order (parents before children).
+
+    - ids: Figma node ids as ASCII bytes, b"" for nodes without one (cleaned trees)
+    - parent: index of the parent node, -1 for roots
+    - depth: depth in the tree
+    - x, y, w, h: absolute bounding box, NaN for nodes without a size
+    - padding: (n, 4) left, top, right and bottom padding, NaN where the node sets none
+    - type_code: index into TYPE_CODES, inferred when "type" was cleaned away
+
+    Apart from ids, which take as many bytes per node as the longest id, this takes
+    39 bytes per node. Nodes of cleaned trees are addressed by their array index.
+    """
+
+    def __init__(self, ids, parent, depth, x, y, w, h, padding, type_code):
+        self.ids = ids
+        self.parent = parent
+        self.depth = depth
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.padding = padding
+        self.type_code = type_code
+        self._position = None
+        self._children = None
+
+    @classmethod
+    def from_tree(cls, data, dtype=np.float32):
+        """Builds the arrays from a Figma response, a node or a cleaned tree."""
+        return cls.from_index(NodeIndex(data), dtype)
+
+    @classmethod
+    def from_index(cls, index, dtype=np.float32):
+        """
+        Builds the arrays from a NodeIndex, array indices following its order.
+
+        Args:
+            index (NodeIndex): The index of the tree
+            dtype: Type of the geometry and padding arrays, np.float64 keeps the JSON values exactly
+        """
+        count = len(index)
+        positions = {}
+        parent = np.full(count, -1, dtype=np.int32)
+        depth = np.zeros(count, dtype=np.int16)
+        geometry = np.full((count, 4), np.nan, dtype=dtype)
+        padding = np.full((count, 4), np.nan, dtype=dtype)
+        type_code = np.zeros(count, dtype=np.uint8)
+
+        for position, (key, entry) in enumerate(index.items()):
+            positions[key] = position
+            node = entry.node
+            if entry.parent_id is not None:
+                parent[position] = positions[entry.parent_id]
+            depth[position] = entry.depth
+            size = node.get("size") or node.get("absoluteBoundingBox")
+            if isinstance(size, dict):
+                geometry[position] = [size.get("x", 0), size.get("y", 0), size.get("width", 0), size.get("height", 0)]
+            # Paddings already replaced by design token names count as unset
+            padding[position] = [value if isinstance(value, (int, float)) else np.nan
+                                 for value in (node.get(key) for key in PADDING_KEYS)]
+            type_code[position] = TYPE_CODE[infer_type(node)]
+
+        ids = np.array([str(entry.node.get("id", "")).encode("ascii", "replace") for entry in index.entries.values()],
+                       dtype=bytes)
+        return cls(ids, parent, depth, *geometry.T.copy(), padding, type_code)
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in (self.ids, self.parent, self.depth, self.x, self.y, self.w, self.h,
+                                               self.padding, self.type_code))
+
+    @property
+    def has_size(self):
+        return ~np.isnan(self.x)
+
+    def position(self, node_id):
+        """Returns the array index of the node with that Figma id."""
+        if self._position is None:
+            self._position = {node_id.decode("ascii"): position for position, node_id in enumerate(self.ids.tolist())
+                              if node_id}
+        return self._position[node_id]
+
+    def types(self):
+        """Returns the type names of all nodes."""
+        return np.array(TYPE_CODES)[self.type_code]
+
+    def children(self, position):
+        """Returns the array indices of the children of a node, in tree order."""
+        if self._children is None:
+            # Children grouped by parent, a stable sort keeps them in tree order
+            order = np.argsort(self.parent, kind="stable")
+            offsets = np.searchsorted(self.parent[order], np.arange(-1, len(self) + 1))
+            self._children = order, offsets
+        order, offsets = self._children
+        return order[offsets[position + 1]:offsets[position + 2]]
+
+    def sized_parent(self):
+        """
+        Returns, for each node, the index of its closest ancestor that has a size, or -1.
+
+        Groups without a bounding box are skipped like extract_nodes does.
+        """
+        has_size = self.has_size
+        result = np.full(len(self), -1, dtype=np.int32)
+        # Tree order puts every parent before its children
+        for position, parent in enumerate(self.parent.tolist()):
+            if parent >= 0:
+                result[position] = parent if has_size[parent] else result[parent]
+        return result
+
+    def hit_test(self, x, y):
+        """Returns the indices of the nodes whose box contains the point, from the root down."""
+        hits = (self.x <= x) & (x <= self.x + self.w) & (self.y <= y) & (y <= self.y + self.h)
+        found = np.flatnonzero(hits)
+        return found[np.argsort(self.depth[found], kind="stable")]
+
+
+def build_node_arrays(data):
+    """Returns the NodeArrays of a Figma response, node or cleaned tree."""
+    return NodeArrays.from_tree(data)
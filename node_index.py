@@ -0,0 +1,128 @@
+from collections import namedtuple
+
+#This file indexes the nodes of a Figma tree, so passes can look nodes up and prune subtrees without walking the tree again
+
+
+# One indexed node. parent_id is the key of the parent node (None for roots), path the
+# keys and list indices that lead from the root to the node
+NodeEntry = namedtuple("NodeEntry", ["node", "parent_id", "depth", "path"])
+
+
+def path_key(path):
+    """Returns the key of a node without an id: its path as a JSON pointer, such as /document/children/0."""
+    return "".join("/" + str(step).replace("~", "~0").replace("/", "~1") for step in path)
+
+
+def child_nodes(node):
+    """
+    Yields (steps, child) for the nodes directly below a node.
+
+    Besides "children", this follows the "document" of a file response and the
+    documents of the entries of a /files/{key}/nodes response.
+    """
+    document = node.get("document")
+    if isinstance(document, dict):
+        yield ("document",), document
+    nodes = node.get("nodes")
+    if isinstance(nodes, dict):
+        for node_id, entry in nodes.items():
+            if isinstance(entry, dict) and isinstance(entry.get("document"), dict):
+                yield ("nodes", node_id, "document"), entry["document"]
+    children = node.get("children")
+    if isinstance(children, list):
+        for index, child in enumerate(children):
+            if isinstance(child, dict):
+                yield ("children", index), child
+
+
+class NodeIndex:
+    """
+    Maps the nodes of a Figma tree to their parent, depth and path, built in one iterative traversal.
+
+    Nodes are keyed by their "id", or by their path_key when they have none (cleaned
+    trees no longer carry ids). Iterating the index gives the keys in tree order,
+    parents before their children. There is no recursion, so deep trees do not hit
+    the recursion limit.
+
+    Args:
+        root (dict/list): A Figma response, a node, or a list of nodes
+    """
+
+    def __init__(self, root):
+        self.entries = {}
+        # id(node) -> key, to find the entry of a node object
+        self.keys = {}
+        roots = root if isinstance(root, list) else [root]
+        stack = [(node, None, (index,) if isinstance(root, list) else ()) for index, node in reversed(list(enumerate(roots)))]
+        while stack:
+            node, parent_id, path = stack.pop()
+            if not isinstance(node, dict):
+                continue
+            key = node.get("id")
+            if key is None or key in self.entries:
+                key = path_key(path)
+            depth = 0 if parent_id is None else self.entries[parent_id].depth + 1
+            self.entries[key] = NodeEntry(node, parent_id, depth, path)
+            self.keys[id(node)] = key
+            # Pushed in reverse so children come out in tree order
+            stack.extend((child, key, path + steps) for steps, child in reversed(list(child_nodes(node))))
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __iter__(self):
+        return iter(self.entries)
+
+    def __getitem__(self, key):
+        return self.entries[key]
+
+    def get(self, key, default=None):
+        """Returns the node with that key, or default."""
+        entry = self.entries.get(key)
+        return default if entry is None else entry.node
+
+    def key_of(self, node):
+        """Returns the key of an indexed node object, or None."""
+        return self.keys.get(id(node))
+
+    def parent(self, key):
+        """Returns the parent node of the node with that key, or None for roots."""
+        parent_id = self.entries[key].parent_id
+        return None if parent_id is None else self.entries[parent_id].node
+
+    def items(self):
+        """Yields (key, entry) pairs in tree order."""
+        return self.entries.items()
+
+    def descendants(self, key):
+        """Yields the keys of the nodes below the node with that key, in tree order."""
+        stack = [self.keys[id(child)] for _, child in reversed(list(child_nodes(self.entries[key].node)))
+                 if id(child) in self.keys]
+        while stack:
+            child_key = stack.pop()
+            yield child_key
+            stack.extend(self.keys[id(child)] for _, child in reversed(list(child_nodes(self.entries[child_key].node)))
+                         if id(child) in self.keys)
+
+    def remove_children(self, node_ids):
+        """
+        Removes the children of the nodes with the given keys, in place.
+
+        Keys that are not in the index are ignored. The removed nodes are dropped from the index.
+
+        Returns:
+            int: The number of nodes whose children were removed
+        """
+        removed = 0
+        for key in set(node_ids):
+            entry = self.entries.get(key)
+            if entry is None or "children" not in entry.node:
+                continue
+            for child_key in list(self.descendants(key)):
+                del self.keys[id(self.entries.pop(child_key).node)]
+            del entry.node["children"]
+            removed += 1
+        return removed
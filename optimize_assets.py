@@ -0,0 +1,134 @@
+import os
+import json
+from concurrent.futures import ProcessPoolExecutor
+from PIL import Image
+
+#This file turns the downloaded Figma exports into right-sized, metadata free WebP/PNG variants
+
+
+# Constants
+OPTIMIZED_DIR = "optimized"
+ASSETS_MAP_FILE = "assets_map.json"
+RASTER_EXTENSIONS = (".png", ".jpg", ".jpeg")
+# Figma exports rasters at scale=2, so the 1x variant is half the exported size
+EXPORT_SCALE = 2
+WEBP_QUALITY = 80
+
+
+def is_up_to_date(source, target):
+    return os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(source)
+
+
+def optimize_image(path, out_dir, export_scale=EXPORT_SCALE):
+    """
+    Writes the optimized variants of a single image.
+
+    The original is re-saved without metadata, and WebP variants are written for
+    every scale from 1x up to the export scale. Variants that are newer than the
+    source image are left as they are.
+
+    Args:
+    - path (str): The exported image.
+    - out_dir (str): The directory the variants are written to.
+    - export_scale (int): The scale the image was exported at.
+
+    Returns:
+    - dict: The image's dimensions and its variants, for the assets map.
+    """
+    file_name = os.path.basename(path)
+    name, extension = os.path.splitext(file_name)
+
+    with Image.open(path) as image:
+        image.load()
+        width, height = image.size
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+
+        variants = []
+
+        # Saving a fresh copy without exif/icc/text info strips the editor metadata
+        stripped_path = os.path.join(out_dir, file_name)
+        if not is_up_to_date(path, stripped_path):
+            image.save(stripped_path, optimize=True)
+        variants.append({
+            'file': f"{OPTIMIZED_DIR}/{file_name}", 'format': extension.lstrip(".").lower(),
+            'scale': export_scale, 'width': width, 'height': height,
+        })
+
+        for scale in range(1, export_scale + 1):
+            variant_width = max(round(width * scale / export_scale), 1)
+            variant_height = max(round(height * scale / export_scale), 1)
+            variant_name = f"{name}@{scale}x.webp"
+            variant_path = os.path.join(out_dir, variant_name)
+            if not is_up_to_date(path, variant_path):
+                variant = image if scale == export_scale else image.resize((variant_width, variant_height), Image.LANCZOS)
+                variant.save(variant_path, "WEBP", quality=WEBP_QUALITY, method=6)
+            variants.append({
+                'file': f"{OPTIMIZED_DIR}/{variant_name}", 'format': 'webp',
+                'scale': scale, 'width': variant_width, 'height': variant_height,
+            })
+
+    return {
+        'width': round(width / export_scale),
+        'height': round(height / export_scale),
+        'variants': variants,
+    }
+
+
+def optimize_assets(basedir, max_workers=None, export_scale=EXPORT_SCALE):
+    """
+    Generates optimized variants for every raster image in a directory.
+
+    Images are processed in a process pool so the work scales with the number of
+    cores. The variants are written to an 'optimized' folder along with a JSON map
+    from each original file to its display size and variants.
+
+    Args:
+    - basedir (str): The directory holding the downloaded images.
+    - max_workers (int): Number of worker processes, defaults to the number of cores.
+    - export_scale (int): The scale the images were exported at.
+
+    Returns:
+    - dict: The assets map, keyed by original file name.
+    """
+    out_dir = os.path.join(basedir, OPTIMIZED_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = sorted(
+        file for file in os.listdir(basedir)
+        if file.lower().endswith(RASTER_EXTENSIONS) and os.path.isfile(os.path.join(basedir, file))
+    )
+
+    assets_map = {}
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            file: executor.submit(optimize_image, os.path.join(basedir, file), out_dir, export_scale)
+            for file in files
+        }
+        for file, future in futures.items():
+            try:
+                assets_map[file] = future.result()
+            except Exception as e:
+                print(f"Failed to optimize image {file}: {e}")
+
+    with open(os.path.join(out_dir, ASSETS_MAP_FILE), "w") as f:
+        json.dump(assets_map, f, indent=2)
+    print(f"Optimized {len(assets_map)} images into {out_dir}")
+
+    return assets_map
+
+
+def load_assets_map(basedir):
+    """
+    Returns the assets map written by optimize_assets, or None if there is none.
+    """
+    try:
+        with open(os.path.join(basedir, OPTIMIZED_DIR, ASSETS_MAP_FILE), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+if __name__ == "__main__":
+    import sys
+    optimize_assets(sys.argv[1] if len(sys.argv) > 1 else ".")
@@ -0,0 +1,290 @@
+import re
+from collections import Counter
+from node_index import NodeIndex
+from dedupe_json import REF_KEY
+
+#This file turns cleaned Figma JSON into the style info of the prompt, summarizing deep subtrees to stay within a token budget
+
+
+# Constants
+PROMPT_TOKEN_BUDGET = 8000
+# Rough size of a token in characters, good enough to keep prompts predictable
+CHARS_PER_TOKEN = 4
+# Node properties whose most common value in a subtree is shown in its summary
+SUMMARY_STYLE_KEYS = ("fillColor", "backgroundColor", "strokeColor", "cornerRadius", "layoutMode")
+SUMMARY_TEXT_KEYS = ("textStyle", "fontFamily", "fontSize", "fontWeight")
+SUMMARY_CHARACTERS = 40
+DETAIL_KEY = "detail"
+DETAIL_REQUEST_PATTERN = re.compile(r"detail: *([^\s}\]]+)")
+# Tables added next to the nodes by --dedupe and --tokens, cut down to the entries the shown nodes use
+DEFINITIONS_KEY = "definitions"
+DESIGN_TOKENS_KEY = "designTokens"
+FONT_FAMILIES_KEY = "fontFamilies"
+
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def format_style_info(data):
+    """The plain style info format: top level key: value pairs, without commas and quotes."""
+    if isinstance(data, dict):
+        formatted_str = ", ".join(f"{key}: {value}" for key, value in data.items())
+    else:
+        formatted_str = str(data)
+    return formatted_str.replace(",", "").replace("'", "")
+
+
+def summarize_subtree(index, key):
+    """
+    Returns the summary that stands for a subtree: its name, size, child count and
+    dominant styles, and the detail key that gives it back in full.
+    """
+    node = index.get(key)
+    summary = {"name": node.get("name", "Unnamed")}
+    if "size" in node:
+        summary["size"] = node["size"]
+    if isinstance(node.get("characters"), str):
+        summary["characters"] = node["characters"][:SUMMARY_CHARACTERS]
+    if isinstance(node.get("children"), list):
+        summary["childCount"] = len(node["children"])
+
+    counts = {}
+    for subtree_key in [key, *index.descendants(key)]:
+        subtree_node = index.get(subtree_key)
+        values = [(style_key, subtree_node[style_key]) for style_key in SUMMARY_STYLE_KEYS if style_key in subtree_node]
+        style = subtree_node.get("style")
+        if isinstance(style, dict):
+            values += [(text_key, style[text_key]) for text_key in SUMMARY_TEXT_KEYS if text_key in style]
+        for style_key, value in values:
+            if isinstance(value, (str, int, float)):
+                counts.setdefault(style_key, Counter())[value] += 1
+    if counts:
+        summary["styles"] = {style_key: counter.most_common(1)[0][0] for style_key, counter in counts.items()}
+    summary[DETAIL_KEY] = key
+    return summary
+
+
+class ReferencedTables:
+    """
+    The definitions and design tokens of a prompt, keeping only the entries the shown values refer to.
+
+    Entries are (table, name) pairs: ("definitions", name) for dedupe_json references,
+    (kind, name) for design token names, and the font families of the shown text styles.
+    """
+
+    def __init__(self, data):
+        definitions = data.get(DEFINITIONS_KEY)
+        tokens = data.get(DESIGN_TOKENS_KEY)
+        self.definitions = definitions if isinstance(definitions, dict) else {}
+        self.tokens = tokens if isinstance(tokens, dict) else {}
+        self.token_kinds = {name: kind for kind, table in self.tokens.items()
+                            if kind != FONT_FAMILIES_KEY and isinstance(table, dict) for name in table}
+        self.shown = set()
+
+    def item(self, entry):
+        table, name = entry
+        if table == DEFINITIONS_KEY:
+            return self.definitions[name]
+        return self.tokens[table][name]
+
+    def references(self, value):
+        """Yields the entries a value refers to directly."""
+        stack = [value]
+        while stack:
+            value = stack.pop()
+            if isinstance(value, dict):
+                if isinstance(value.get(REF_KEY), str) and value[REF_KEY] in self.definitions:
+                    yield DEFINITIONS_KEY, value[REF_KEY]
+                stack.extend(value.values())
+            elif isinstance(value, list):
+                stack.extend(value)
+            elif isinstance(value, str) and value in self.token_kinds:
+                yield self.token_kinds[value], value
+
+    def missing(self, value):
+        """
+        Returns the entries value needs that are not shown yet, definitions followed, and their size in characters.
+        """
+        entries = set()
+        size = 0
+        stack = list(self.references(value))
+        while stack:
+            entry = stack.pop()
+            if entry in self.shown or entry in entries:
+                continue
+            entries.add(entry)
+            item = self.item(entry)
+            size += len(str({entry[1]: item}))
+            if entry[0] == DEFINITIONS_KEY:
+                stack.extend(self.references(item))
+            elif isinstance(item, dict) and "fontFamily" in item:
+                families = self.tokens.get(FONT_FAMILIES_KEY) or {}
+                stack.extend((FONT_FAMILIES_KEY, slug) for slug, family in families.items() if family == item["fontFamily"])
+        return entries, size
+
+    def show(self, entries):
+        self.shown |= entries
+
+    def cut(self, data):
+        """Returns the definitions and designTokens of data with only the shown entries, in their order."""
+        tables = {}
+        if self.definitions:
+            tables[DEFINITIONS_KEY] = {name: item for name, item in self.definitions.items()
+                                       if (DEFINITIONS_KEY, name) in self.shown}
+        if self.tokens:
+            tables[DESIGN_TOKENS_KEY] = {
+                kind: {name: item for name, item in table.items() if (kind, name) in self.shown}
+                if isinstance(table, dict) else table for kind, table in self.tokens.items()
+            }
+        return tables
+
+
+def level_of_detail(data, token_budget=PROMPT_TOKEN_BUDGET, max_levels=None, root_key=None):
+    """
+    Returns a copy of cleaned Figma JSON that fits a token budget.
+
+    Nodes are shown in full level by level, from the top: a level is expanded while
+    the budget allows it, a level that does not fit is expanded in tree order as far
+    as the budget goes, and nothing deeper is. Every other node stands as the summary
+    of its subtree (see summarize_subtree), whose detail key subtree_detail accepts.
+    The definitions and designTokens tables of --dedupe and --tokens count against the
+    budget: only their entries the shown nodes and summaries refer to are kept, and a
+    node is only expanded if the entries it brings in fit too. Other values that are
+    not nodes are always kept, and so are the summaries of the top level children, even
+    when they alone exceed the budget.
+
+    Args:
+        data (dict): Cleaned JSON, as returned by process_json
+        token_budget (int): Approximate number of tokens the formatted result may take
+        max_levels (int): Show at most this many levels of children in full, None for no limit
+        root_key (str): Reduce only the subtree with this detail key, keeping the detail
+            keys of its summaries valid for data
+
+    Returns:
+        (data, summarized): The reduced copy and the number of summarized subtrees
+    """
+    index = NodeIndex(data)
+    summaries = {}
+
+    def summary(node):
+        key = index.key_of(node)
+        if key not in summaries:
+            summaries[key] = summarize_subtree(index, key)
+        return summaries[key]
+
+    if root_key is None:
+        root = data
+        # Nodes below a "children" list start summarized, the others (roots, documents) in full
+        expanded = {key for key, entry in index.items() if entry.path[-2:-1] != ("children",)}
+        candidates = [key for key in index if key not in expanded]
+    else:
+        root = index.get(root_key)
+        expanded = {root_key}
+        candidates = list(index.descendants(root_key))
+
+    def build(value):
+        if isinstance(value, dict):
+            if index.key_of(value) is None:
+                return {key: build(item) for key, item in value.items()}
+            node = {}
+            for key, item in value.items():
+                if key == "children" and isinstance(item, list):
+                    node[key] = [build(child) if index.key_of(child) in expanded else summary(child)
+                                 if isinstance(child, dict) else child for child in item]
+                else:
+                    node[key] = build(item)
+            return node
+        elif isinstance(value, list):
+            return [build(item) for item in value]
+        return value
+
+    def expanded_form(key):
+        node = index.get(key)
+        return {k: (v if k != "children" or not isinstance(v, list) else
+                    [summary(child) if isinstance(child, dict) else child for child in v])
+                for k, v in node.items()}
+
+    tables = ReferencedTables(data) if root_key is None and isinstance(data, dict) else None
+    budget = token_budget * CHARS_PER_TOKEN
+    shown = build(root)
+    if tables is not None:
+        shown = {key: value for key, value in shown.items() if key not in (DEFINITIONS_KEY, DESIGN_TOKENS_KEY)}
+        entries, tables_size = tables.missing(shown)
+        tables.show(entries)
+    used = len(format_style_info(shown)) + (tables_size if tables is not None else 0)
+    levels = {}
+    for key in candidates:
+        levels.setdefault(index[key].depth, []).append(key)
+
+    for level_number, depth in enumerate(sorted(levels), 1):
+        if max_levels is not None and level_number > max_levels:
+            break
+        complete = True
+        for key in levels[depth]:
+            if index[key].parent_id not in expanded:
+                continue
+            form = expanded_form(key)
+            cost = len(str(form)) - len(str(summary(index.get(key))))
+            if tables is not None:
+                entries, tables_size = tables.missing(form)
+                cost += tables_size
+            if used + cost > budget:
+                complete = False
+                continue
+            expanded.add(key)
+            used += cost
+            if tables is not None:
+                tables.show(entries)
+        if not complete:
+            break
+
+    summarized = sum(1 for key in candidates if key not in expanded and index[key].parent_id in expanded)
+    reduced = build(root)
+    if tables is not None:
+        reduced.update(tables.cut(data))
+    return reduced, summarized
+
+
+def serialize_style_info(data, token_budget=PROMPT_TOKEN_BUDGET, max_levels=None):
+    """
+    Formats cleaned Figma JSON for the prompt within a token budget.
+
+    Designs that fit are formatted in full, others through level_of_detail.
+
+    Returns:
+        (text, summarized): The style info and the number of summarized subtrees
+    """
+    text = format_style_info(data)
+    if estimate_tokens(text) <= token_budget and max_levels is None:
+        return text, 0
+    reduced, summarized = level_of_detail(data, token_budget, max_levels)
+    return format_style_info(reduced), summarized
+
+
+def subtree_detail(data, key, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Returns the style info of one summarized subtree, within its own token budget.
+
+    Args:
+        data (dict): The cleaned JSON the summary was made from
+        key (str): The detail key of the summary
+    """
+    node = NodeIndex(data).get(key)
+    if node is None:
+        return None
+    text = format_style_info(node)
+    if estimate_tokens(text) > token_budget:
+        reduced, _ = level_of_detail(data, token_budget, root_key=key)
+        text = format_style_info(reduced)
+    return text
+
+
+def requested_details(data, text, token_budget=PROMPT_TOKEN_BUDGET):
+    """Returns the subtrees asked for with "detail: <key>" in a text, as {key: style info}."""
+    details = {}
+    for key in DETAIL_REQUEST_PATTERN.findall(text or ""):
+        detail = subtree_detail(data, key, token_budget)
+        if detail is not None:
+            details[key] = detail
+    return details
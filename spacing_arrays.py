@@ -0,0 +1,186 @@
+import numpy as np
+from node_index import NodeIndex
+from node_arrays import NodeArrays
+from spacing_evaluator import infer_layout
+
+#This file computes the spacing report of a whole tree at once with NumPy: parent paddings, child margins and sibling gaps as arrays
+
+
+# Constants
+SIDES = ("left", "top", "right", "bottom")
+PADDING_KEYS = ("paddingLeft", "paddingTop", "paddingRight", "paddingBottom")
+
+
+def sized_geometry(nodes):
+    """
+    Selects the nodes with a size, as extract_nodes sees them.
+
+    Nodes without a size are left out and their children attached to the closest
+    ancestor with a size (NodeArrays.sized_parent).
+
+    Args:
+        nodes (NodeArrays): The arrays of the whole tree
+
+    Returns:
+        (sized, x, y, w, h, parent): sized holds the NodeArrays indices of the selected
+        nodes in tree order, the other arrays follow it, parent being an index into sized or -1
+    """
+    sized = np.flatnonzero(nodes.has_size)
+    compact = np.full(len(nodes), -1, dtype=np.intp)
+    compact[sized] = np.arange(len(sized))
+    parent = nodes.sized_parent()[sized]
+    parent = np.where(parent >= 0, compact[parent], -1)
+    return sized, nodes.x[sized], nodes.y[sized], nodes.w[sized], nodes.h[sized], parent
+
+
+def _sibling_gaps(position, extent, parent, children):
+    """Returns the (previous, next) pairs of siblings along one axis and the gaps between them."""
+    # Grouped sort: by parent, then by position, ties kept in tree order
+    order = children[np.lexsort((position[children], parent[children]))]
+    previous, following = order[:-1], order[1:]
+    same_parent = parent[previous] == parent[following]
+    previous, following = previous[same_parent], following[same_parent]
+    gaps = np.maximum(position[following] - (position[previous] + extent[previous]), 0)
+    return np.stack([previous, following], axis=1), gaps
+
+
+class SpacingArrays:
+    """
+    The spacing report of a tree as arrays, indexed like the geometry it was computed from.
+
+    - x, y, w, h: the geometry
+    - parent: index of the parent node, -1 for roots
+    - padding: (n, 4) left, top, right and bottom padding of every node, from its children (0 for leaves)
+    - margin: (n, 4) margins of every node inside its parent's padding, NaN for roots
+    - horizontal_pairs, horizontal_gaps: neighbouring siblings from left to right and the gaps between them
+    - vertical_pairs, vertical_gaps: neighbouring siblings from top to bottom and the gaps between them
+    """
+
+    def __init__(self, x, y, w, h, parent, padding, margin, horizontal_pairs, horizontal_gaps, vertical_pairs,
+                 vertical_gaps, default_padding=0, names=None):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = h
+        self.parent = parent
+        self.padding = padding
+        self.margin = margin
+        self.horizontal_pairs = horizontal_pairs
+        self.horizontal_gaps = horizontal_gaps
+        self.vertical_pairs = vertical_pairs
+        self.vertical_gaps = vertical_gaps
+        self.default_padding = default_padding
+        self.names = names
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def layout_padding(self):
+        """The padding margins are measured from: the computed padding, default_padding where it is 0."""
+        return np.where(self.padding == 0, self.default_padding, self.padding)
+
+    def parents(self):
+        """Returns the indices of the nodes with children, in tree order."""
+        return np.unique(self.parent[self.parent >= 0])
+
+    def to_results(self, names=None):
+        """
+        Returns the report in the format of spacing_evaluator.analyze_spacing.
+
+        Layouts are inferred per parent by spacing_evaluator.infer_layout.
+
+        Args:
+            names (list): Node names, defaults to the names the arrays were built with
+        """
+        names = self.names if names is None else names
+        padding = self.padding.tolist()
+        layout_padding = self.layout_padding.tolist()
+        margin = self.margin.tolist()
+        geometry = zip(self.x.tolist(), self.y.tolist(), self.w.tolist(), self.h.tolist())
+        results = {}
+        # Children boxes of each parent, for infer_layout
+        boxes = {}
+        for parent in self.parents().tolist():
+            results[parent] = {
+                'parent_name': names[parent],
+                'parent_padding': dict(zip(PADDING_KEYS, padding[parent])),
+                'children': [],
+                'sibling_margins': {},
+            }
+        for child, (parent, (x, y, w, h)) in enumerate(zip(self.parent.tolist(), geometry)):
+            if parent >= 0:
+                boxes.setdefault(parent, []).append({'name': names[child], 'x': x, 'y': y, 'width': w, 'height': h})
+                results[parent]['children'].append({
+                    'child_name': names[child],
+                    'auto_layout_based': {
+                        'parent_padding': dict(zip(SIDES, layout_padding[parent])),
+                        'margin': dict(zip(SIDES, margin[child])),
+                    }
+                })
+        for pairs, gaps, gap_key in ((self.horizontal_pairs, self.horizontal_gaps, 'horizontal_gap'),
+                                     (self.vertical_pairs, self.vertical_gaps, 'vertical_gap')):
+            for (first, second), gap in zip(pairs.tolist(), gaps.tolist()):
+                margins = results[self.parent[first]]['sibling_margins']
+                margins.setdefault((names[first], names[second]), {})[gap_key] = gap
+        for parent, result in results.items():
+            result['layout'] = infer_layout(boxes[parent])
+        return list(results.values())
+
+
+def compute_spacing(x, y, w, h, parent, default_padding=0, names=None):
+    """
+    Computes the spacing of every node of a tree in a few array operations.
+
+    Paddings are grouped min reductions over the children of each parent, margins
+    elementwise differences to the padded parent box, and sibling gaps differences
+    between neighbours of a grouped sort. The values match calculate_parent_padding,
+    calculate_spacing and calculate_sibling_spacing.
+
+    Args:
+        x, y, w, h (np.ndarray): Bounding boxes of the nodes
+        parent (np.ndarray): Index of the parent of each node, -1 for roots. Nodes without
+            a size should be left out, as sized_geometry does
+        default_padding (int): Padding margins are measured from when a parent has none
+        names (list): Node names, for SpacingArrays.to_results
+
+    Returns:
+        SpacingArrays
+    """
+    x, y, w, h = (np.asarray(values, dtype=np.float64) for values in (x, y, w, h))
+    parent = np.asarray(parent, dtype=np.intp)
+    count = len(parent)
+    children = np.flatnonzero(parent >= 0)
+    of = parent[children]
+
+    # Distance of every child to each side of its parent
+    distances = np.stack([x[children] - x[of], y[children] - y[of],
+                          (x[of] + w[of]) - (x[children] + w[children]),
+                          (y[of] + h[of]) - (y[children] + h[children])], axis=1)
+    padding = np.zeros((count, 4), dtype=np.float64)
+    if len(children):
+        # Grouped min: children sorted by parent, reduced from the start of each group
+        order = np.argsort(of, kind="stable")
+        grouped_parents, starts = np.unique(of[order], return_index=True)
+        padding[grouped_parents] = np.maximum(np.minimum.reduceat(distances[order], starts, axis=0), 0)
+
+    spacing = SpacingArrays(x, y, w, h, parent, padding, np.full((count, 4), np.nan), None, None, None, None,
+                            default_padding, names)
+    spacing.margin[children] = np.maximum(distances - spacing.layout_padding[of], 0)
+    spacing.horizontal_pairs, spacing.horizontal_gaps = _sibling_gaps(x, w, parent, children)
+    spacing.vertical_pairs, spacing.vertical_gaps = _sibling_gaps(y, h, parent, children)
+    return spacing
+
+
+def spacing_arrays(document, default_padding=0):
+    """
+    Returns the SpacingArrays of a Figma document, with its node names.
+
+    Nodes are sized like NodeArrays does, by their size or, in raw responses, their
+    absoluteBoundingBox. Geometry is kept in float64 so the values match analyze_spacing.
+    """
+    index = NodeIndex(document)
+    sized, x, y, w, h, parent = sized_geometry(NodeArrays.from_index(index, np.float64))
+    entries = list(index.entries.values())
+    names = [entries[position].node.get("name", "Unnamed") for position in sized.tolist()]
+    return compute_spacing(x, y, w, h, parent, default_padding, names)
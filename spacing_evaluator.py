@@ -1,38 +1,56 @@
+import os
 import json
-from collections import defaultdict
+import heapq
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+from node_index import NodeIndex, child_nodes, path_key
+
+# Constants
+# Distances below this many pixels count as touching, so rounding noise does not break layouts apart
+LAYOUT_TOLERANCE = 0.5
+# Batches with fewer frames than this are evaluated in a single process
+PARALLEL_MIN_FRAMES = 2
+PARALLEL_CHUNKS_PER_WORKER = 4
+
+def extract_node(node, parent=None):
+    """
+    Returns the simplified dictionary (with just x, y, etc.) of a node with a size.
+    """
+    return {
+        'name': node.get('name', 'Unnamed'),
+        'x': node['size'].get('x', 0),
+        'y': node['size'].get('y', 0),
+        'width': node['size'].get('width', 0),
+        'height': node['size'].get('height', 0),
+        'paddingLeft': node.get('paddingLeft'),
+        'paddingTop': node.get('paddingTop'),
+        'paddingRight': node.get('paddingRight'),
+        'paddingBottom': node.get('paddingBottom'),
+        'parent': parent  # simplified parent, if available
+    }
 
 def extract_nodes(node, parent=None):
     """
-    Recursively extracts nodes as simplified dictionaries (with just x, y, etc.)
+    Extracts nodes as simplified dictionaries (with just x, y, etc.)
     and passes the simplified parent to children.
     """
     extracted = []
-    simplified_node = None
-
-    # Simplify the node if it has a size.
-    if 'size' in node:
-        simplified_node = {
-            'name': node.get('name', 'Unnamed'),
-            'x': node['size'].get('x', 0),
-            'y': node['size'].get('y', 0),
-            'width': node['size'].get('width', 0),
-            'height': node['size'].get('height', 0),
-            'paddingLeft': node.get('paddingLeft'),
-            'paddingTop': node.get('paddingTop'),
-            'paddingRight': node.get('paddingRight'),
-            'paddingBottom': node.get('paddingBottom'),
-            'parent': parent  # simplified parent, if available
-        }
-        extracted.append(simplified_node)
-    else:
-        # If there is no size, pass the current parent along.
-        simplified_node = parent
+    # Simplified node, or closest simplified ancestor, of each indexed node
+    simplified_nodes = {}
+
+    # The index lists parents before their children, so no recursion is needed
+    for key, entry in NodeIndex(node).items():
+        simplified_parent = parent if entry.parent_id is None else simplified_nodes[entry.parent_id]
+
+        # Simplify the node if it has a size.
+        if 'size' in entry.node:
+            simplified_node = extract_node(entry.node, simplified_parent)
+            extracted.append(simplified_node)
+        else:
+            # If there is no size, pass the current parent along.
+            simplified_node = simplified_parent
+        simplified_nodes[key] = simplified_node
 
-    # Process children using the simplified node as the parent.
-    if 'children' in node and isinstance(node['children'], list):
-        for child in node['children']:
-            extracted.extend(extract_nodes(child, parent=simplified_node))
-    
     return extracted
 
 def calculate_parent_padding(parent, children):
@@ -139,12 +157,233 @@ def calculate_sibling_spacing(children):
         top_child = sorted_children_y[i]
         bottom_child = sorted_children_y[i + 1]
         margin_y = bottom_child['y'] - (top_child['y'] + top_child['height'])
-        sibling_margins[(top_child['name'], bottom_child['name'])].update({
+        # The pairs differ from the horizontal ones when the x and y orders disagree
+        sibling_margins.setdefault((top_child['name'], bottom_child['name']), {}).update({
             'vertical_gap': max(margin_y, 0)
         })
 
     return sibling_margins
 
+def _bands(children, start, extent, tolerance):
+    """
+    Splits children into bands along one axis: groups whose [start, start + extent]
+    intervals overlap, found by merging the sorted intervals.
+    """
+    bands = []
+    band_end = None
+    for child in sorted(children, key=lambda c: c[start]):
+        if bands and child[start] < band_end - tolerance:
+            bands[-1].append(child)
+            band_end = max(band_end, child[start] + child[extent])
+        else:
+            bands.append([child])
+            band_end = child[start] + child[extent]
+    return bands
+
+def _band_gaps(bands, start, extent):
+    """Returns the gaps between consecutive bands along their axis."""
+    ends = [max(c[start] + c[extent] for c in band) for band in bands]
+    starts = [min(c[start] for c in band) for band in bands]
+    return [starts[i + 1] - ends[i] for i in range(len(bands) - 1)]
+
+def _gap(gaps, tolerance):
+    """Returns {'gap': value} for gaps that agree within the tolerance, {'gaps': [...]} otherwise."""
+    def number(value):
+        value = round(value, 2)
+        return int(value) if value == int(value) else value
+
+    if max(gaps) - min(gaps) <= 2 * tolerance:
+        return {'gap': number(sum(gaps) / len(gaps))}
+    return {'gaps': [number(gap) for gap in gaps]}
+
+def _alignment(children, start, extent, tolerance):
+    """Returns how children line up across an axis: start, center, end, or None."""
+    for align, edge in (('start', lambda c: c[start]), ('center', lambda c: c[start] + c[extent] / 2),
+                        ('end', lambda c: c[start] + c[extent])):
+        edges = [edge(child) for child in children]
+        if max(edges) - min(edges) <= 2 * tolerance:
+            return align
+    return None
+
+def find_overlaps(children, tolerance=LAYOUT_TOLERANCE):
+    """
+    Returns the (name, name) pairs of children whose boxes overlap.
+
+    Boxes can only overlap within a band of vertically overlapping children, which is
+    swept from left to right, keeping the boxes the sweep line crosses in a heap by
+    their right edge. That is O(n log n) as long as few boxes are crossed at once.
+    """
+    overlaps = []
+    for band in _bands(children, 'y', 'height', tolerance):
+        active = []
+        for order, child in enumerate(sorted(band, key=lambda c: c['x'])):
+            while active and active[0][0] <= child['x'] + tolerance:
+                heapq.heappop(active)
+            for _, _, other in active:
+                if (min(child['y'] + child['height'], other['y'] + other['height']) - max(child['y'], other['y'])
+                        > tolerance):
+                    overlaps.append((other['name'], child['name']))
+            heapq.heappush(active, (child['x'] + child['width'], order, child))
+    return overlaps
+
+def infer_layout(children, tolerance=LAYOUT_TOLERANCE):
+    """
+    Infers how a container lays out its children, as a compact hint for the prompt.
+
+    Children are split into rows (bands of vertically overlapping boxes) and columns
+    (bands of horizontally overlapping boxes) by sorting them, so it takes O(n log n):
+    - rows and columns that hold one child per cell make a grid, with a row and a column gap
+    - otherwise the container is a flex-col of rows, or a flex-row of columns when there
+      are fewer of them. Rows (columns) of several children are listed in groups with
+      their own layout, a plain row (column) gets the alignment of its children instead
+    - children that all overlap are positioned absolutely
+
+    A gap is {'gap': value} when consistent and {'gaps': [...]} when not. Overlapping
+    children are listed in overlaps.
+
+    Returns:
+        dict: The layout hint, empty for fewer than two children
+    """
+    if not children or len(children) < 2:
+        return {}
+
+    layout = _band_layout(children, tolerance)
+    overlaps = find_overlaps(children, tolerance)
+    if overlaps:
+        layout['overlaps'] = overlaps
+    return layout
+
+def _band_layout(children, tolerance):
+    """The layout part of infer_layout, applied again to the bands listed in groups."""
+    rows = _bands(children, 'y', 'height', tolerance)
+    columns = _bands(children, 'x', 'width', tolerance)
+
+    if len(rows) == 1 and len(columns) == 1:
+        layout = {'layout': 'absolute'}
+    elif len(rows) > 1 and len(columns) > 1 and all(len(row) == len(columns) for row in rows) and \
+            all(len(column) == len(rows) for column in columns):
+        layout = {
+            'layout': 'grid',
+            'rows': len(rows),
+            'columns': len(columns),
+            'row_gap': _gap(_band_gaps(rows, 'y', 'height'), tolerance),
+            'column_gap': _gap(_band_gaps(columns, 'x', 'width'), tolerance),
+        }
+    else:
+        # A row of columns or a column of rows, whichever has fewer bands
+        if len(rows) == 1 or 1 < len(columns) < len(rows):
+            layout = {'layout': 'flex-row', **_gap(_band_gaps(columns, 'x', 'width'), tolerance)}
+            bands, cross_start, cross_extent = columns, 'y', 'height'
+        else:
+            layout = {'layout': 'flex-col', **_gap(_band_gaps(rows, 'y', 'height'), tolerance)}
+            bands, cross_start, cross_extent = rows, 'x', 'width'
+        if all(len(band) == 1 for band in bands):
+            align = _alignment(children, cross_start, cross_extent, tolerance)
+            if align:
+                layout['align'] = align
+        else:
+            layout['groups'] = [{'children': [child['name'] for child in band], **_band_layout(band, tolerance)}
+                                if len(band) > 1 else {'children': [band[0]['name']]}
+                                for band in bands]
+    return layout
+
+def _iter_parents(document):
+    """
+    Walks the document once and yields (position, key, depth, parent, children, child_keys)
+    for every simplified node with children, as soon as the traversal leaves its subtree.
+
+    Children are linked to the node object of their parent, the closest ancestor with
+    a size, so parents that share a name are kept apart. position is the order of the
+    parent in the document, key its NodeIndex key.
+    """
+    # Simplified node, or closest simplified ancestor, of each indexed node
+    simplified_nodes = {}
+    # [position, key, depth, simplified parent, simplified children, child keys] of the parents being traversed
+    open_parents = []
+    open_parents_by_node = {}
+
+    for position, (key, entry) in enumerate(NodeIndex(document).items()):
+        # Parents whose subtree has ended have all their children
+        while open_parents and open_parents[-1][2] >= entry.depth:
+            parent = open_parents.pop()
+            del open_parents_by_node[id(parent[3])]
+            if parent[4]:
+                yield tuple(parent)
+
+        simplified_parent = None if entry.parent_id is None else simplified_nodes[entry.parent_id]
+        if 'size' not in entry.node:
+            simplified_nodes[key] = simplified_parent
+            continue
+
+        simplified_node = simplified_nodes[key] = extract_node(entry.node, simplified_parent)
+        if simplified_parent is not None:
+            parent = open_parents_by_node[id(simplified_parent)]
+            parent[4].append(simplified_node)
+            parent[5].append(key)
+        open_parents.append([position, key, entry.depth, simplified_node, [], []])
+        open_parents_by_node[id(simplified_node)] = open_parents[-1]
+
+    while open_parents:
+        parent = open_parents.pop()
+        if parent[4]:
+            yield tuple(parent)
+
+def _parent_spacing(parent_node, children, default_padding=0):
+    """Calculates the padding of a parent, the spacing of its children, their sibling margins and layout."""
+    # Calculate parent's padding from its children
+    parent_padding = calculate_parent_padding(parent_node, children)
+    parent_node.update(parent_padding)
+
+    return {
+        'parent_padding': parent_padding,
+        # Calculate child spacing relative to parent
+        'children': [calculate_spacing(parent_node, child, default_padding) for child in children],
+        # Compute sibling margins (relative spacing between children)
+        'sibling_margins': calculate_sibling_spacing(children),
+        # Infer rows, columns and grids from the children's boxes
+        'layout': infer_layout(children),
+    }
+
+def analyze_spacing(document, default_padding=0):
+    """
+    Calculates the padding of every parent, the spacing of its children relative to it,
+    and the sibling spacing between them, in a single traversal of the document.
+
+    Returns:
+        list: One result per parent with children, in document order
+    """
+    parents = sorted(_iter_parents(document), key=lambda parent: parent[0])
+    return [{'parent_name': parent_node['name'], **_parent_spacing(parent_node, children, default_padding)}
+            for _, _, _, parent_node, children, _ in parents]
+
+def iter_spacing_records(document, default_padding=0):
+    """
+    Lazily yields one spacing record per container (node with children) of the document.
+
+    A container is yielded as soon as the traversal leaves its subtree, so the records
+    of nested containers come before the record of their parent and a consumer can stop
+    once the subtree it needs is done. Records only hold JSON types:
+
+        {'key': NodeIndex key, 'name': ..., 'depth': ...,
+         'padding': {'paddingLeft': ..., ...},
+         'children': [{'key': ..., 'name': ..., 'margin': {'left': ..., ...}}, ...],
+         'layout': infer_layout hint}
+    """
+    for _, key, depth, parent_node, children, child_keys in _iter_parents(document):
+        spacing = _parent_spacing(parent_node, children, default_padding)
+        layout = spacing['layout']
+        if 'overlaps' in layout:
+            layout['overlaps'] = [list(pair) for pair in layout['overlaps']]
+        yield {
+            'key': key,
+            'name': parent_node['name'],
+            'depth': depth,
+            'padding': spacing['parent_padding'],
+            'children': [{'key': child_key, 'name': child['name'], 'margin': child_spacing['auto_layout_based']['margin']}
+                         for child_key, child, child_spacing in zip(child_keys, children, spacing['children'])],
+            'layout': layout,
+        }
+
 def process_json_file(filename, default_padding=0):
     """
     Processes the JSON file, extracts nodes, calculates spacing relative to parent,
@@ -155,110 +394,138 @@ def process_json_file(filename, default_padding=0):
 
     # Extract nodes from the Figma document
     document = list(figma_data["nodes"].values())[0]["document"]
-    nodes = extract_nodes(document)
-
-    # Group children by parent
-    parent_to_children = defaultdict(list)
-    for node in nodes:
-        if node.get('parent') is not None:
-            parent_to_children[node['parent']['name']].append(node)
+    return analyze_spacing(document, default_padding)
 
-    results = []
 
-    # Process each parent-child relationship
-    for parent_name, children in parent_to_children.items():
-        # Find the parent node
-        parent_node = next(node for node in nodes if node.get('name') == parent_name)
+def render_records(records, indent=0):
+    """
+    Prints spacing records as a tree of nodes. For each node that has children,
+    we print its padding (based on its children), its layout and the child margins.
+    """
+    records = {record['key']: record for record in records}
+    child_keys = {child['key'] for record in records.values() for child in record['children']}
+
+    def render(record, indent):
+        indent_str = ' ' * indent
+        print(f"{indent_str}Node: {record['name']}")
+        print(f"{indent_str}  Padding: {record['padding']}")
+        if record['layout']:
+            print(f"{indent_str}  Layout: {record['layout']}")
+        for child in record['children']:
+            print(f"{indent_str}  Child: {child['name'][:10]}")
+            print(f"{indent_str}    Auto Layout Margin: {child['margin']}")
+            # Recurse on the child's own subtree
+            if child['key'] in records:
+                render(records[child['key']], indent + 4)
+            else:
+                print(f"{' ' * (indent + 4)}Node: {child['name']}")
+
+    # Records come after those of their subtree, the top level ones are rendered first
+    for key, record in sorted(records.items(), key=lambda item: item[1]['depth']):
+        if key not in child_keys:
+            render(record, indent)
 
-        # Calculate parent's padding from its children
-        parent_padding = calculate_parent_padding(parent_node, children)
-        parent_node.update(parent_padding)
+def print_tree(node, default_padding=0, indent=0):
+    """Prints the spacing records of a tree of nodes (see render_records)."""
+    render_records(iter_spacing_records(node, default_padding), indent)
 
-        parent_result = {
-            'parent_name': parent_name,
-            'parent_padding': parent_padding,
-            'children': []
-        }
+def find_frames(figma_data):
+    """
+    Returns the frames of a Figma response: the first nodes with a size below its
+    documents and canvases, in document order.
 
-        # Calculate child spacing relative to parent
-        for child in children:
-            spacing = calculate_spacing(parent_node, child, default_padding)
-            parent_result['children'].append(spacing)
+    Returns:
+        list: (key, frame) pairs, key being the frame's id or path as in NodeIndex
+    """
+    frames = []
+    stack = [(figma_data, ())]
+    while stack:
+        node, path = stack.pop()
+        if 'size' in node:
+            frames.append((node.get('id') or path_key(path), node))
+            continue
+        # Pushed in reverse so frames come out in document order
+        stack.extend((child, path + steps) for steps, child in reversed(list(child_nodes(node))))
+    return frames
+
+def frame_spacing_records(frame, default_padding=0):
+    """Returns the spacing records of one frame, as a list so they can be sent back from a worker."""
+    return list(iter_spacing_records(frame, default_padding))
+
+def evaluate_frames(frames, default_padding=0, max_workers=None):
+    """
+    Evaluates the spacing of independent frames in parallel.
 
-        # Compute sibling margins (relative spacing between children)
-        sibling_margins = calculate_sibling_spacing(children)
-        parent_result['sibling_margins'] = sibling_margins
+    Frames share nothing, so each one is analyzed in a worker process. Fewer than
+    two frames are evaluated in this process.
 
-        results.append(parent_result)
+    Args:
+        frames (list): Frame nodes
+        default_padding (int): Padding margins are measured from when a parent has none
+        max_workers (int): Number of worker processes, defaults to the number of CPUs
 
-    return results
+    Returns:
+        list: The spacing records of each frame, in the order of frames
+    """
+    if len(frames) < PARALLEL_MIN_FRAMES:
+        return [frame_spacing_records(frame, default_padding) for frame in frames]
 
+    workers = max_workers or os.cpu_count() or 1
+    # Several frames per task, so small frames do not cost a round trip each
+    chunksize = max(1, len(frames) // (workers * PARALLEL_CHUNKS_PER_WORKER))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(frame_spacing_records, frames, repeat(default_padding), chunksize=chunksize))
 
-def simplify_node(node, parent=None, default_padding=0):
-    """
-    Returns a simplified version of the node with its geometry data.
+def evaluate_files(filenames, default_padding=0, max_workers=None):
     """
-    if 'size' not in node:
-        return None
-    return {
-        'name': node.get('name', 'Unnamed'),
-        'x': node['size'].get('x', 0),
-        'y': node['size'].get('y', 0),
-        'width': node['size'].get('width', 0),
-        'height': node['size'].get('height', 0),
-        'paddingLeft': node.get('paddingLeft', default_padding),
-        'paddingTop': node.get('paddingTop', default_padding),
-        'paddingRight': node.get('paddingRight', default_padding),
-        'paddingBottom': node.get('paddingBottom', default_padding),
-        'parent': parent  # simplified parent, if available
-    }
+    Evaluates the spacing of every frame of one or more Figma JSON files, across processes.
 
-def print_tree(node, default_padding=0, indent=0):
+    Returns:
+        list: One report per frame, in file and document order:
+        {'file': ..., 'frame': frame key, 'name': ..., 'records': iter_spacing_records records}
     """
-    Recursively prints a tree of nodes. For each node that has children,
-    we first compute its padding (based on its children) and then print the child margins.
-    """
-    simplified = simplify_node(node, default_padding=default_padding)
-    if simplified is None:
-        return
-
-    indent_str = ' ' * indent
-    print(f"{indent_str}Node: {simplified['name']}")
-    # If the node has children, process them:
-    if 'children' in node and isinstance(node['children'], list) and node['children']:
-        # Extract only the children with a "size" property (valid nodes)
-        valid_children = [child for child in node['children'] if 'size' in child]
-        if valid_children:
-            # Simplify children
-            simplified_children = [
-                simplify_node(child, parent=simplified, default_padding=default_padding)
-                for child in valid_children
-            ]
-            # Calculate parent's padding from its children
-            parent_padding = calculate_parent_padding(simplified, simplified_children)
-            # Update our simplified node for use in margin calculation.
-            simplified.update(parent_padding)
-            print(f"{indent_str}  Padding: {parent_padding}")
-            
-            # For each child, calculate and print spacing relative to the parent.
-            for child, child_simplified in zip(valid_children, simplified_children):
-                spacing = calculate_spacing(simplified, child_simplified, default_padding)
-                print(f"{indent_str}  Child: {child_simplified['name'][:10]}")
-                #print(f"{indent_str}    Strict Margin: {spacing['strict_margin']}")
-                print(f"{indent_str}    Auto Layout Margin: {spacing['auto_layout_based']['margin']}")
-                # Recurse on the child's own subtree
-                print_tree(child, default_padding, indent + 4)
-                
+    reports = []
+    frames = []
+    for filename in filenames:
+        with open(filename, 'r') as f:
+            figma_data = json.load(f)
+        for key, frame in find_frames(figma_data):
+            reports.append({'file': str(filename), 'frame': key, 'name': frame.get('name', 'Unnamed')})
+            frames.append(frame)
+
+    for report, records in zip(reports, evaluate_frames(frames, default_padding, max_workers)):
+        report['records'] = records
+    return reports
 
-if __name__ == '__main__':
-    import json
-    # Replace with your actual JSON file path
-    filename = 'test/data.json'
-    with open(filename, 'r') as f:
-        figma_data = json.load(f)
-    # Assuming the file structure is similar to Figma’s where we have a document
-    document = list(figma_data["nodes"].values())[0]["document"]
 
-    # Print the hierarchical tree with margins and paddings.
-    print_tree(document, default_padding=20)
-    print("\n\n\n")
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the paddings, margins and layouts of a Figma design")
+    parser.add_argument("filenames", nargs="*", default=["test/data.json"], help="Figma responses saved as JSON")
+    parser.add_argument("--default-padding", type=float, default=20)
+    parser.add_argument("--jsonl", action="store_true", help="Print one JSON record per container instead of a tree")
+    parser.add_argument("--batch", action="store_true",
+                        help="Evaluate every frame of every file across processes, not only the first document")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes in batch mode")
+    args = parser.parse_args()
+
+    if args.batch:
+        reports = evaluate_files(args.filenames, args.default_padding, args.workers)
+    else:
+        with open(args.filenames[0], 'r') as f:
+            figma_data = json.load(f)
+        # Assuming the file structure is similar to Figma’s where we have a document
+        document = list(figma_data["nodes"].values())[0]["document"]
+        reports = [{'records': iter_spacing_records(document, args.default_padding)}]
+
+    for report in reports:
+        if args.jsonl:
+            for record in report['records']:
+                print(json.dumps({'file': report['file'], 'frame': report['frame'], **record} if args.batch else record))
+        else:
+            if args.batch:
+                print(f"Frame: {report['name']} ({report['file']} {report['frame']})")
+            # Print the hierarchical tree with margins and paddings.
+            render_records(report['records'])
+            print("\n\n\n")
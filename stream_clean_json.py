@@ -0,0 +1,369 @@
+import re
+import json
+import codecs
+import tempfile
+from clean_json import TransformPipeline, build_transforms, DROP
+
+#This file cleans Figma JSON while it is being read, so huge documents never sit in memory whole
+
+
+# Constants
+READ_CHUNK_SIZE = 64 * 1024
+# Output kept aside stays in memory up to this size before spilling to a temporary file
+SPOOL_MAX_SIZE = 1024 * 1024
+# Pieces of text a StreamedValue gathers before appending them to the spool at once
+SPOOL_FLUSH_WRITES = 1024
+
+TOKEN_PATTERN = re.compile(r'[ \t\r\n]*(?:([{}\[\],:])|(")|(-?(?:0|[1-9]\d*)(?:\.\d+)?(?:[eE][-+]?\d+)?)|(true|false|null))')
+NUMBER_CHARACTERS = "0123456789.eE+-"
+LITERALS = {"true": True, "false": False, "null": None}
+# Stands for the value of a pair already written out
+WRITTEN = object()
+
+
+def iter_json_events(read, chunk_size=READ_CHUNK_SIZE):
+    """
+    Parses a JSON document from a stream into a flat sequence of events.
+
+    Args:
+        read (callable): Returns up to n characters or bytes (UTF-8) per call, '' or b'' at the end
+        chunk_size (int): Number of characters or bytes read at a time
+
+    Yields:
+        (event, value) tuples: ('start_map', None), ('key', key), ('end_map', None),
+        ('start_array', None), ('end_array', None) and ('value', scalar)
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    at_end = False
+    # One entry per open container, True for maps
+    containers = []
+    expect_key = False
+
+    def more():
+        nonlocal buffer, position, at_end
+        chunk = read(chunk_size)
+        if not chunk:
+            at_end = True
+        if isinstance(chunk, bytes):
+            # Multi byte characters split across chunks are held back by the decoder
+            chunk = decoder.decode(chunk, final=at_end)
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    more()
+    while True:
+        match = TOKEN_PATTERN.match(buffer, position)
+        # A token touching the end of the buffer, or a number followed by more number
+        # characters, may continue in the next chunk
+        if not at_end and (match is None or match.end() == len(buffer)
+                           or (match.group(3) is not None and buffer[match.end()] in NUMBER_CHARACTERS)):
+            more()
+            continue
+        if match is None:
+            if buffer[position:].strip() == "":
+                return
+            raise ValueError(f"Invalid JSON near: {buffer[position:position + 40]!r}")
+
+        punctuation, quote, number, literal = match.groups()
+        if quote:
+            try:
+                text, end = json.decoder.scanstring(buffer, match.end())
+            except json.JSONDecodeError:
+                if at_end:
+                    raise
+                more()
+                continue
+            position = end
+            if expect_key:
+                expect_key = False
+                yield "key", text
+            else:
+                yield "value", text
+            continue
+
+        position = match.end()
+        if punctuation == "{":
+            containers.append(True)
+            expect_key = True
+            yield "start_map", None
+        elif punctuation == "}":
+            containers.pop()
+            expect_key = False
+            yield "end_map", None
+        elif punctuation == "[":
+            containers.append(False)
+            yield "start_array", None
+        elif punctuation == "]":
+            containers.pop()
+            yield "end_array", None
+        elif punctuation == ",":
+            expect_key = containers[-1]
+        elif number is not None:
+            yield "value", float(number) if "." in number or "e" in number or "E" in number else int(number)
+        elif literal is not None:
+            yield "value", LITERALS[literal]
+
+
+def build_value(event, value, events):
+    """Builds the Python value that starts with (event, value) from the remaining events."""
+    if event == "value":
+        return value
+    if event == "start_map":
+        node = {}
+        for event, key in events:
+            if event == "end_map":
+                return node
+            node[key] = build_value(*next(events), events)
+    items = []
+    for event, value in events:
+        if event == "end_array":
+            return items
+        items.append(build_value(event, value, events))
+
+
+def skip_value(event, events):
+    """Consumes the events of a value without building it."""
+    if event == "value":
+        return
+    depth = 1
+    for event, _ in events:
+        if event == "start_map" or event == "start_array":
+            depth += 1
+        elif event == "end_map" or event == "end_array":
+            depth -= 1
+            if depth == 0:
+                return
+
+
+class Spool:
+    """The temporary file shared by the StreamedValues of a document, only ever appended to."""
+    __slots__ = ("file", "size", "at_end")
+
+    def __init__(self):
+        self.file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        self.size = 0
+        self.at_end = True
+
+    def append(self, text):
+        """Appends text and returns the (start, end) range it was written to."""
+        if not self.at_end:
+            self.file.seek(self.size)
+            self.at_end = True
+        # json.dumps output is ASCII, so the text is its own byte count
+        start = self.size
+        self.size += self.file.write(text.encode("ascii"))
+        return start, self.size
+
+    def copy(self, start, end, write):
+        self.at_end = False
+        self.file.seek(start)
+        while start < end:
+            chunk = self.file.read(min(READ_CHUNK_SIZE, end - start))
+            start += len(chunk)
+            write(chunk.decode("ascii"))
+
+
+class DirectOutput:
+    """Where cleaned output is written as soon as it is final."""
+    __slots__ = ("write", "spool")
+
+    def __init__(self, write, spool):
+        self.write = write
+        self.spool = spool
+
+    def add(self, value):
+        value.copy_to(self.write)
+
+
+class StreamedValue:
+    """
+    The cleaned output of a subtree, kept aside until the keys of its parent are ordered.
+
+    Text goes to the spool of the document and pieces remember where, as (start, end)
+    ranges and the StreamedValues added to it. Adding a value to another one keeps a
+    reference, so a subtree is never copied from one level to the next and every byte
+    is read back once, when the outermost value is copied out.
+    """
+    __slots__ = ("spool", "pieces", "pending")
+
+    def __init__(self, spool):
+        self.spool = spool
+        self.pieces = []
+        self.pending = []
+
+    def write(self, text):
+        self.pending.append(text)
+        if len(self.pending) >= SPOOL_FLUSH_WRITES:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.pieces.append(self.spool.append("".join(self.pending)))
+            self.pending = []
+
+    def add(self, value):
+        self.flush()
+        self.pieces.append(value)
+
+    def copy_to(self, write):
+        self.flush()
+        for piece in self.pieces:
+            if isinstance(piece, StreamedValue):
+                piece.copy_to(write)
+            else:
+                self.spool.copy(*piece, write)
+
+
+def stream_value(event, value, events, out, pipeline):
+    if event == "value":
+        out.write(json.dumps(pipeline.leaf(value)))
+    elif event == "start_array":
+        out.write("[")
+        first = True
+        for event, value in events:
+            if event == "end_array":
+                break
+            if not first:
+                out.write(", ")
+            first = False
+            stream_value(event, value, events, out, pipeline)
+        out.write("]")
+    else:
+        stream_map(events, out, pipeline)
+
+
+def stream_map(events, out, pipeline):
+    """
+    Cleans a dict whose start_map event has been consumed.
+
+    Scalars and the values some hook needs whole (pipeline.value_keys) are built and
+    processed like process_json does. Skipped subtrees are consumed without being
+    built. Pairs are written out as they are read until the first key finish hooks
+    may move or rewrite (pipeline.finish_keys), from there on subtrees are cleaned
+    into StreamedValues so the hooks can still order the rest of the dict.
+    """
+    finish_keys = pipeline.finish_keys
+    in_place = finish_keys is not None
+    written = 0
+    node = {}
+    out.write("{")
+    for event, key in events:
+        if event == "end_map":
+            break
+        event, value = next(events)
+        if in_place and key in finish_keys:
+            in_place = False
+        if event == "value":
+            value = pipeline.process_pair(key, value)
+        elif key in pipeline.value_keys:
+            value = pipeline.process_pair(key, build_value(event, value, events))
+        elif pipeline.skip(key, None):
+            # Outside value_keys, skip rules only look at the key
+            skip_value(event, events)
+            continue
+        elif in_place:
+            out.write(f", {json.dumps(key)}: " if written else f"{json.dumps(key)}: ")
+            written += 1
+            stream_value(event, value, events, out, pipeline)
+            node[key] = WRITTEN
+            continue
+        else:
+            streamed = StreamedValue(out.spool)
+            stream_value(event, value, events, streamed, pipeline)
+            value = streamed
+        if value is DROP:
+            continue
+        if in_place:
+            out.write(f", {json.dumps(key)}: {json.dumps(value)}" if written else f"{json.dumps(key)}: {json.dumps(value)}")
+            written += 1
+            value = WRITTEN
+        node[key] = value
+    node = pipeline.finish(node)
+
+    for key, value in node.items():
+        if value is WRITTEN:
+            continue
+        out.write(f", {json.dumps(key)}: " if written else f"{json.dumps(key)}: ")
+        written += 1
+        if isinstance(value, StreamedValue):
+            out.add(value)
+        else:
+            out.write(json.dumps(value))
+    out.write("}")
+
+
+def stream_process_json(read, write, config, chunk_size=READ_CHUNK_SIZE):
+    """
+    Cleans a JSON document while it is read, with the same output as process_json.
+
+    Only the values that the cleaning rules need to see whole are held in memory.
+    Pairs are written out as soon as their place in the output is known, the subtrees
+    finish hooks may reorder go through a temporary file, written and read back once.
+    The output is the json.dumps serialization of process_json(data, config).
+
+    Args:
+        read (callable): Returns up to n characters or bytes (UTF-8) per call, '' or b'' at the end
+        write (callable): Receives the cleaned JSON text piece by piece
+        config (dict): The cleaning config
+        chunk_size (int): Number of characters or bytes read at a time
+    """
+    pipeline = TransformPipeline(build_transforms(config))
+    events = iter_json_events(read, chunk_size)
+    first = next(events, None)
+    if first is None:
+        raise ValueError("Empty JSON document")
+    spool = Spool()
+    try:
+        stream_value(*first, events, DirectOutput(write, spool), pipeline)
+    finally:
+        spool.file.close()
+
+
+def stream_clean_file(input_path, output_path, config, chunk_size=READ_CHUNK_SIZE):
+    """Cleans a JSON file into another one without loading either in memory."""
+    with open(input_path, "rb") as input_file, open(output_path, "w", encoding="utf-8") as output_file:
+        stream_process_json(input_file.read, output_file.write, config, chunk_size)
+
+
+def stream_clean_figma_data(file_key, node_id, output_path, config, depth=None):
+    """
+    Fetches Figma JSON and cleans it into output_path while it downloads.
+
+    The response body is never held in memory whole, which keeps whole-file fetches
+    of large documents within a bounded amount of memory.
+
+    Raises:
+    - Exception: If the response is not successful after all retries.
+    """
+    from figma_apis import FIGMA_API_BASE_URL, figma_token
+    from figma_client import get_figma_client
+
+    if node_id:
+        endpoint = f"{FIGMA_API_BASE_URL}/files/{file_key}/nodes"
+        params = {"ids": node_id}
+    else:
+        endpoint = f"{FIGMA_API_BASE_URL}/files/{file_key}"
+        params = {}
+    if depth:
+        params["depth"] = depth
+
+    response = get_figma_client(figma_token).get(endpoint, params=params, stream=True)
+    try:
+        if response.status_code != 200:
+            raise Exception(f"Error: {response.status_code}, {response.text}")
+        with open(output_path, "w", encoding="utf-8") as output_file:
+            stream_process_json(lambda n: response.raw.read(n, decode_content=True), output_file.write, config)
+    finally:
+        response.close()
+
+
+if __name__ == "__main__":
+    import sys
+    from config_initial import config
+
+    if len(sys.argv) != 3:
+        print("Usage: python stream_clean_json.py input.json output.json")
+        sys.exit(1)
+    stream_clean_file(sys.argv[1], sys.argv[2], config)
@@ -0,0 +1,348 @@
+import os
+import re
+import json
+import xml.etree.ElementTree as ET
+from figma_apis import load_asset_manifest
+
+#This file minifies the SVG icons exported from Figma and can merge them into a sprite or React components
+
+
+# Constants
+SVG_NAMESPACE = "http://www.w3.org/2000/svg"
+XLINK_NAMESPACE = "http://www.w3.org/1999/xlink"
+SPRITE_FILE = "sprite.svg"
+ICONS_FILE = "icons.js"
+PRECISION = 2
+REMOVED_ELEMENTS = {"metadata", "title", "desc"}
+# Attributes whose numbers are rounded when minifying
+NUMERIC_ATTRIBUTES = {
+    "d", "points", "transform", "viewBox", "x", "y", "x1", "y1", "x2", "y2", "cx", "cy", "r", "rx", "ry",
+    "width", "height", "stroke-width", "offset",
+}
+NUMBER_PATTERN = re.compile(r"-?(?:\d+\.\d*|\.\d+|\d+)(?:[eE][-+]?\d+)?")
+# Characters a JSX attribute string cannot hold as is, such values are written as expressions
+JSX_UNSAFE_PATTERN = re.compile(r'["{}<>&\\]')
+
+ET.register_namespace("", SVG_NAMESPACE)
+ET.register_namespace("xlink", XLINK_NAMESPACE)
+
+
+def format_number(match, precision=PRECISION):
+    value = round(float(match.group(0)), precision)
+    text = f"{value:.{precision}f}".rstrip("0").rstrip(".")
+    if text in ("-0", ""):
+        return "0"
+    # 0.5 -> .5 and -0.5 -> -.5
+    return re.sub(r"^(-?)0\.", r"\1.", text)
+
+
+def minify_path(d, precision=PRECISION):
+    d = NUMBER_PATTERN.sub(lambda match: format_number(match, precision), d)
+    d = re.sub(r"\s*,\s*|\s+", " ", d)
+    d = re.sub(r"\s*([a-zA-Z])\s*", r"\1", d)
+    return re.sub(r" (?=-)", "", d).strip()
+
+
+def local_name(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def minify_element(element, precision=PRECISION):
+    """
+    Strips editor metadata from an element tree in place and rounds its coordinates.
+    """
+    for child in list(element):
+        if not isinstance(child.tag, str):
+            element.remove(child)
+            continue
+        namespace = child.tag[1:].split("}")[0] if child.tag.startswith("{") else SVG_NAMESPACE
+        if namespace != SVG_NAMESPACE or local_name(child.tag) in REMOVED_ELEMENTS:
+            element.remove(child)
+            continue
+        minify_element(child, precision)
+
+    for key in list(element.attrib):
+        namespace = key[1:].split("}")[0] if key.startswith("{") else None
+        if namespace not in (None, XLINK_NAMESPACE) or key.startswith("data-"):
+            del element.attrib[key]
+        elif key == "d":
+            element.attrib[key] = minify_path(element.attrib[key], precision)
+        elif key in NUMERIC_ATTRIBUTES:
+            value = NUMBER_PATTERN.sub(lambda match: format_number(match, precision), element.attrib[key])
+            element.attrib[key] = re.sub(r"\s+", " ", value).strip()
+
+    if element.text is not None and not element.text.strip():
+        element.text = None
+    if element.tail is not None and not element.tail.strip():
+        element.tail = None
+
+
+def minify_svg(svg_text, precision=PRECISION):
+    """
+    Minifies an SVG document.
+
+    Comments, metadata/title/desc elements and attributes from editor namespaces are
+    removed, numbers are rounded to the given precision and whitespace is collapsed.
+
+    Returns:
+    - str: The minified SVG.
+    """
+    root = ET.fromstring(svg_text)
+    minify_element(root, precision)
+    return ET.tostring(root, encoding="unicode")
+
+
+def symbol_id(node_id):
+    return "icon-" + re.sub(r"[^a-zA-Z0-9_-]", "-", node_id)
+
+
+def prefix_ids(root, prefix):
+    """
+    Prefixes the ids inside an SVG, and the references to them, so several icons can share a document.
+    """
+    ids = {element.get("id") for element in root.iter() if element.get("id")}
+    if not ids:
+        return
+    reference = re.compile(r"#(" + "|".join(re.escape(id) for id in ids) + r")\b")
+    for element in root.iter():
+        for key, value in element.attrib.items():
+            if key == "id" and value in ids:
+                element.attrib[key] = f"{prefix}-{value}"
+            elif "#" in value:
+                element.attrib[key] = reference.sub(lambda match: f"#{prefix}-{match.group(1)}", value)
+
+
+def build_sprite(svgs):
+    """
+    Merges icons into one SVG sprite of <symbol> elements.
+
+    Args:
+    - svgs (dict): A mapping of node ID to SVG text.
+
+    Returns:
+    - str: The sprite document, each icon is referenced as #icon-<node id>.
+    """
+    sprite = ET.Element(f"{{{SVG_NAMESPACE}}}svg", {"style": "display:none"})
+    for node_id, svg_text in svgs.items():
+        root = ET.fromstring(svg_text)
+        minify_element(root)
+        prefix_ids(root, symbol_id(node_id))
+        symbol = ET.SubElement(sprite, f"{{{SVG_NAMESPACE}}}symbol", {"id": symbol_id(node_id)})
+        if root.get("viewBox"):
+            symbol.set("viewBox", root.get("viewBox"))
+        elif root.get("width") and root.get("height"):
+            symbol.set("viewBox", f"0 0 {root.get('width')} {root.get('height')}")
+        if root.get("fill"):
+            symbol.set("fill", root.get("fill"))
+        symbol.extend(list(root))
+    return ET.tostring(sprite, encoding="unicode")
+
+
+def jsx_attribute_name(key):
+    key = local_name(key)
+    if key == "class":
+        return "className"
+    if key.startswith(("aria-", "data-")):
+        return key
+    return re.sub(r"[-:]([a-z])", lambda match: match.group(1).upper(), key)
+
+
+def jsx_style(style):
+    """
+    Converts an inline CSS style into a JSX style object, "mask-type:alpha" -> {{maskType: "alpha"}}.
+
+    React only accepts objects for style, a string throws when the component renders.
+    """
+    properties = []
+    for declaration in style.split(";"):
+        name, _, value = declaration.partition(":")
+        name, value = name.strip(), value.strip()
+        if not name or not value:
+            continue
+        if name.startswith("--"):
+            key = json.dumps(name)
+        else:
+            # Vendor prefixes keep their capital: -webkit-mask -> WebkitMask
+            key = re.sub(r"-([a-z])", lambda match: match.group(1).upper(), name.lower())
+        properties.append(f"{key}: {json.dumps(value)}")
+    return "{{" + ", ".join(properties) + "}}"
+
+
+def jsx_attribute(key, value):
+    if local_name(key) == "style":
+        return f"style={jsx_style(value)}"
+    if JSX_UNSAFE_PATTERN.search(value):
+        return f"{jsx_attribute_name(key)}={{{json.dumps(value)}}}"
+    return f'{jsx_attribute_name(key)}="{value}"'
+
+
+def jsx_text(text):
+    """Returns text as a JSX string expression, so braces and markup in <style> or <text> stay text."""
+    if not text or not text.strip():
+        return ""
+    return "{" + json.dumps(text) + "}"
+
+
+def element_to_jsx(element, root_props=False):
+    attributes = " ".join(jsx_attribute(key, value) for key, value in element.attrib.items())
+    if root_props:
+        attributes = f"{attributes} {{...props}}".strip()
+    opening = f"<{local_name(element.tag)}{' ' + attributes if attributes else ''}"
+    children = jsx_text(element.text) + "".join(element_to_jsx(child) + jsx_text(child.tail) for child in element)
+    if not children:
+        return f"{opening} />"
+    return f"{opening}>{children}</{local_name(element.tag)}>"
+
+
+def component_name(name, used_names):
+    words = re.findall(r"[a-zA-Z0-9]+", name)
+    base = "".join(word[:1].upper() + word[1:] for word in words) or "Icon"
+    if base[0].isdigit():
+        base = "Icon" + base
+    component = base
+    counter = 2
+    while component in used_names:
+        component = f"{base}{counter}"
+        counter += 1
+    used_names.add(component)
+    return component
+
+
+def build_react_icons(svgs, names, representatives=None):
+    """
+    Turns icons into inlineable React components in a single module.
+
+    Args:
+    - svgs (dict): A mapping of node ID to SVG text.
+    - names (dict): A mapping of node ID to the Figma node name.
+    - representatives (dict): A mapping of every node ID to the node ID in svgs that
+      holds its icon, for nodes that share a deduplicated file.
+
+    Returns:
+    - str: A module exporting one component per icon and an `icons` object keyed by node ID.
+    """
+    used_names = set()
+    lines = []
+    components = {}
+    for node_id, svg_text in svgs.items():
+        root = ET.fromstring(svg_text)
+        minify_element(root)
+        prefix_ids(root, symbol_id(node_id))
+        component = component_name(names.get(node_id, ""), used_names)
+        lines.append(f"export const {component} = (props) => (\n  {element_to_jsx(root, root_props=True)}\n);\n")
+        components[node_id] = component
+    if representatives is None:
+        representatives = {node_id: node_id for node_id in svgs}
+    icons = [
+        f"  {json.dumps(node_id)}: {components[representative]},"
+        for node_id, representative in representatives.items() if representative in components
+    ]
+    lines.append("export const icons = {\n" + "\n".join(icons) + "\n};\n")
+    return "\n".join(lines)
+
+
+def asset_entries(basedir):
+    """
+    Returns the assets of a directory's manifest, keeping only well formed entries.
+
+    A manifest that is missing, unreadable or not shaped like one counts as empty,
+    as load_asset_manifest does for missing and invalid JSON.
+    """
+    assets = load_asset_manifest(basedir)
+    assets = assets.get('assets') if isinstance(assets, dict) else None
+    if not isinstance(assets, dict):
+        return {}
+    return {node_id: entry for node_id, entry in assets.items()
+            if isinstance(entry, dict) and isinstance(entry.get('file'), str)}
+
+
+def svg_representatives(basedir):
+    """
+    Maps the node ID of every SVG asset to the first node ID sharing its file, and to the file.
+    """
+    svg_files = {
+        node_id: entry['file'] for node_id, entry in asset_entries(basedir).items()
+        if entry['file'].endswith(".svg")
+    }
+    first_node_by_file = {}
+    for node_id, file in svg_files.items():
+        first_node_by_file.setdefault(file, node_id)
+    representatives = {node_id: first_node_by_file[file] for node_id, file in svg_files.items()}
+    return representatives, svg_files
+
+def process_svg_assets(basedir, mode="minify"):
+    """
+    Minifies the downloaded SVG icons and optionally merges them.
+
+    Args:
+    - basedir (str): The directory holding the downloaded assets and their manifest.
+    - mode (str): 'minify' only minifies the files in place, 'sprite' also writes
+      sprite.svg and 'react' also writes icons.js with one component per icon.
+
+    Returns:
+    - dict: A mapping of node ID to the SVG file of the icon.
+    """
+    names = {node_id: str(entry.get('name', "")) for node_id, entry in asset_entries(basedir).items()}
+    representatives, svg_files = svg_representatives(basedir)
+
+    # Nodes sharing a deduplicated file become a single symbol/component
+    svgs = {}
+    saved = 0
+    for node_id in dict.fromkeys(representatives.values()):
+        file = svg_files[node_id]
+        path = os.path.join(basedir, file)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                svg_text = f.read()
+        except (OSError, UnicodeDecodeError) as e:
+            print(f"Failed to read {file}: {e}")
+            continue
+        try:
+            minified = minify_svg(svg_text)
+        except ET.ParseError as e:
+            print(f"Failed to minify {file}: {e}")
+            continue
+        if minified != svg_text:
+            saved += len(svg_text.encode("utf-8")) - len(minified.encode("utf-8"))
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(minified)
+        svgs[node_id] = minified
+    print(f"Minified {len(svgs)} SVG files, saved {saved / 1024:.1f} KB")
+
+    if not svgs:
+        return svg_files
+    if mode == "sprite":
+        with open(os.path.join(basedir, SPRITE_FILE), "w", encoding="utf-8") as f:
+            f.write(build_sprite(svgs))
+        print(f"Merged {len(svgs)} icons into {SPRITE_FILE}")
+    elif mode == "react":
+        with open(os.path.join(basedir, ICONS_FILE), "w", encoding="utf-8") as f:
+            f.write(build_react_icons(svgs, names, representatives))
+        print(f"Wrote {len(svgs)} icon components to {ICONS_FILE}")
+
+    return svg_files
+
+
+def svg_asset_hint(basedir):
+    """
+    Describes the merged icons of a directory for the codegen prompt.
+
+    Returns:
+    - str: Instructions for using icons.js or sprite.svg, empty if neither was generated.
+    """
+    entries = asset_entries(basedir)
+    representatives, _ = svg_representatives(basedir)
+    # Keyed by node ID, icons often share a name ("Vector", "Icon")
+    icons = {node_id: entries[node_id].get('name', "") for node_id in representatives}
+    if not icons:
+        return ""
+    if os.path.exists(os.path.join(basedir, ICONS_FILE)):
+        return (f"The SVG icons are React components exported from ./{ICONS_FILE}, keyed by Figma node id in "
+                f"`icons` (icon names by node id: {json.dumps(icons)}). Use them instead of the .svg files.")
+    if os.path.exists(os.path.join(basedir, SPRITE_FILE)):
+        symbols = {}
+        for node_id, representative in representatives.items():
+            symbols.setdefault(symbol_id(representative), icons[node_id])
+        return (f"The SVG icons are symbols in ./{SPRITE_FILE}, use them as <svg><use href=\"{SPRITE_FILE}#SYMBOL_ID\" /></svg>. "
+                f"Icon names by symbol id: {json.dumps(symbols)}")
+    return ""
@@ -0,0 +1,45 @@
+import json
+import pytest
+from benchmark_clean_json import generate_tree, benchmark, measure, PASSES, PIPELINES
+from clean_json import process_json, process_json_multipass, shorten_keys
+from node_index import NodeIndex
+from config_initial import config
+
+
+def test_generate_tree_shape():
+    data = generate_tree(500, depth=3, fan_out=10, seed=1)
+    index = NodeIndex(data["nodes"]["1:0"]["document"])
+    assert len(index) == 500
+    assert max(entry.depth for _, entry in index.items()) <= 3
+    assert max(len(entry.node.get("children", [])) for _, entry in index.items()) <= 10
+    # Seeded, and raw enough for the cleaning to have work to do
+    assert generate_tree(500, depth=3, fan_out=10, seed=1) == data
+    assert json.dumps(process_json(data, config)) == json.dumps(process_json_multipass(json.loads(json.dumps(data)), config))
+    assert len(json.dumps(process_json(data, config))) < len(json.dumps(data)) / 2
+
+    with pytest.raises(ValueError):
+        generate_tree(100, depth=2, fan_out=3)
+
+
+def test_benchmark_report():
+    result = benchmark(generate_tree(200, depth=4, fan_out=6), config, repeat=1)
+    assert list(result["passes"]) == [name for name, _ in PASSES]
+    assert list(result["pipelines"]) == [name for name, _ in PIPELINES]
+    assert all(measurement["seconds"] > 0 for measurement in result["pipelines"].values())
+
+
+def test_measure_runs_on_fresh_copies():
+    color = {"r": 1.0, "g": 1.0, "b": 1.0, "a": 1.0}
+    data = {"fills": [{"color": color}], "children": [{"strokes": [{"color": color}]}]}
+    inputs = []
+
+    def record(data):
+        inputs.append(json.dumps(data))
+        return shorten_keys(data)
+
+    result, _, _ = measure(record, data, repeat=3)
+    # shorten_keys rewrites its input in place, yet every run sees the original
+    assert inputs == [json.dumps(data)] * 4
+    assert result == {"fillColor": color, "children": [{"strokeColor": color}]}
+    assert "fills" in data
+
@@ -0,0 +1,154 @@
+import copy
+import io
+import json
+from clean_json import process_json, process_json_multipass, process_json_parallel, compile_config
+from config_initial import config
+
+
+def assert_same_as_multipass(data):
+    expected = process_json_multipass(copy.deepcopy(data), config)
+    result = process_json(data, config)
+    # Compare the serialized form too, key order matters for the prompt
+    assert result == expected, f"{result} != {expected}"
+    assert json.dumps(result) == json.dumps(expected), f"{json.dumps(result)} != {json.dumps(expected)}"
+
+
+def test_process_json_matches_multipass():
+    with open("figma_data.json", "r") as f:
+        figma_data = json.load(f)
+    original = copy.deepcopy(figma_data)
+
+    assert_same_as_multipass(figma_data)
+    # The input must not be modified
+    assert figma_data == original
+
+
+def test_process_json_edge_cases():
+    # Test Case 1: background shortened onto an existing backgroundColor, in both key orders
+    color = {"r": 1.0, "g": 0.5, "b": 0.25, "a": 1.0}
+    assert_same_as_multipass({"background": [{"type": "SOLID", "color": color}], "backgroundColor": color, "children": []})
+    assert_same_as_multipass({"backgroundColor": color, "children": [], "background": [{"color": color}]})
+
+    # Test Case 2: incomplete colors are dropped, fills with several paints are kept
+    assert_same_as_multipass({"fills": [{"color": {"r": 1.0}}], "strokes": [{"color": color}, {"color": color}]})
+
+    # Test Case 3: absoluteBoundingBox renamed onto an existing size, floats rounded
+    assert_same_as_multipass({"size": {"x": 1.5}, "absoluteBoundingBox": {"x": 2.5, "y": -0.49}, "opacity": 1.0})
+
+    # Test Case 4: removed pairs nested in lists and scalars at the top level
+    assert_same_as_multipass([{"effects": [], "visible": False, "children": [{"blendMode": "NORMAL", "x": 3.7}]}, 2.5])
+    assert_same_as_multipass(0.5)
+
+
+def test_compiled_config_matches_rules():
+    compiled_config = compile_config(config)
+    pairs = [
+        ("opacity", 1), ("opacity", 1.0), ("opacity", True), ("opacity", 0.5),
+        ("letterSpacing", 0), ("letterSpacing", -0.0), ("fills", []), ("fills", [{"type": "SOLID"}]),
+        ("constraints", {"horizontal": "LEFT", "vertical": "TOP"}), ("constraints", {"vertical": "TOP"}),
+        ("rectangleCornerRadii", [0, 0, 0, 0]), ("rectangleCornerRadii", [0, 0, 0, 4]),
+        ("styleOverrideTable", {}), ("styleOverrideTable", []), ("absoluteBoundingBox", None),
+        ("id", "1:2"), ("name", "Frame 1"),
+    ]
+    for key, value in pairs:
+        expected = key in config["keys_to_remove"] or any({key: value} == pair for pair in config["key_value_pairs_to_remove"])
+        assert compiled_config.should_remove(key, value) == expected, f"{key}: {value}"
+
+    # Key prefix rules
+    assert compile_config({"key_prefixes_to_remove": ["layout"]}).should_remove("layoutMode", "HORIZONTAL")
+    assert not compile_config({"key_prefixes_to_remove": ["layout"]}).should_remove("name", "layout")
+
+    # Prefixes also remove keys that have value rules, whatever the value
+    prefixed_config = compile_config(dict(config, key_prefixes_to_remove=["layout", "fill"]))
+    for key, value in [("layoutMode", "HORIZONTAL"), ("layoutMode", "NONE"), ("layoutPositioning", "AUTO"),
+                       ("fills", [1]), ("fills", []), ("fills", [{"type": "SOLID"}])]:
+        assert prefixed_config.should_remove(key, value), f"{key}: {value}"
+    assert not prefixed_config.should_remove("strokes", [1])
+    assert process_json({"layoutMode": "HORIZONTAL", "fills": [1], "name": "Frame"},
+                        dict(config, key_prefixes_to_remove=["layout", "fill"])) == {"name": "Frame"}
+
+    # A compiled config does not pose as the config dict, stale readers fail loudly
+    assert not hasattr(compiled_config, "get")
+
+
+def stream_clean(data, chunk_size):
+    from stream_clean_json import stream_process_json
+    output = []
+    stream_process_json(io.BytesIO(json.dumps(data).encode("utf-8")).read, output.append, config, chunk_size)
+    return "".join(output)
+
+
+def test_stream_process_json_matches_process_json():
+    with open("figma_data.json", "r") as f:
+        figma_data = json.load(f)
+    color = {"r": 1.0, "g": 0.5, "b": 0.25, "a": 1.0}
+    cases = [
+        figma_data,
+        {"background": [{"type": "SOLID", "color": color}], "backgroundColor": color, "children": []},
+        {"children": [{"name": "é\\\"", "id": "1:2"}], "absoluteBoundingBox": {"x": 2.5}, "size": {"x": 1.5}},
+        [{"effects": [], "visible": False, "children": [{"blendMode": "NORMAL", "x": 3.7}]}, 2.5],
+        0.5,
+    ]
+    for data in cases:
+        expected = json.dumps(process_json(copy.deepcopy(data), config))
+        # Small chunks split tokens and multi byte characters across reads
+        for chunk_size in (1, 7, 65536):
+            assert stream_clean(data, chunk_size) == expected
+
+
+def test_process_json_parallel_matches_process_json():
+    with open("figma_data.json", "r") as f:
+        frame = list(json.load(f)["nodes"].values())[0]["document"]
+    color = {"r": 1.0, "g": 1.0, "b": 1.0, "a": 1.0}
+    canvases = [{"id": f"0:{page}", "type": "CANVAS", "name": f"Page {page}", "backgroundColor": color,
+                 "children": [dict(frame, id=f"{page}:{position}") for position in range(3)]} for page in range(2)]
+    canvases.append({"id": "0:9", "type": "CANVAS", "name": "Empty", "children": []})
+    whole_file = {"name": "File", "document": {"id": "0:0", "type": "DOCUMENT", "children": canvases}}
+    original = copy.deepcopy(whole_file)
+
+    result = process_json_parallel(whole_file, config, max_workers=2)
+    # Same content and key order, frames back in document order
+    assert json.dumps(result) == json.dumps(process_json(whole_file, config))
+    assert whole_file == original
+
+
+def test_stream_process_json_spools_each_byte_once(monkeypatch):
+    import stream_clean_json
+    spools = []
+
+    class RecordingSpool(stream_clean_json.Spool):
+        def __init__(self):
+            super().__init__()
+            spools.append(self)
+
+    monkeypatch.setattr(stream_clean_json, "Spool", RecordingSpool)
+    node = {"id": "0:0", "name": "Leaf", "visible": True}
+    for depth in range(1, 200):
+        node = {"id": f"{depth}:0", "children": [node], "name": f"Level {depth}", "opacity": 0.5}
+    output = stream_clean({"document": node}, 65536)
+
+    assert output == json.dumps(process_json({"document": node}, config))
+    # Nested children moved last are kept aside once, not copied again at every level
+    assert 0 < spools[0].size <= len(output)
+
+    # Pairs before any key finish hooks may reorder are never kept aside
+    stream_clean({"document": {"id": "1:1", "name": "Frame", "style": {"fontSize": 12.0}}}, 65536)
+    assert spools[1].size == 0
+
+
+def test_stream_value_keeps_undeclared_finish_hooks_in_order():
+    from clean_json import NodeTransform, TransformPipeline
+    from stream_clean_json import DirectOutput, Spool, iter_json_events, stream_value
+
+    class SortKeysTransform(NodeTransform):
+        # No finish_keys: the hook may move any pair
+        def finish(self, node):
+            return dict(sorted(node.items()))
+
+    pipeline = TransformPipeline([SortKeysTransform()])
+    assert pipeline.finish_keys is None
+    data = {"z": {"b": [1, {"d": 2, "c": 3}], "a": None}, "y": 1.5, "x": [{"w": True}]}
+    events = iter_json_events(io.StringIO(json.dumps(data)).read)
+    output = []
+    stream_value(*next(events), events, DirectOutput(output.append, Spool()), pipeline)
+    assert "".join(output) == json.dumps(pipeline.visit(data))
@@ -0,0 +1,40 @@
+import json
+from dedupe_json import dedupe_subtrees, expand_refs, REF_KEY
+
+
+def card(x, y, title):
+    style = {"fontFamily": "Inter", "fontSize": 16, "fontWeight": 400, "lineHeightPx": 21, "textAlignHorizontal": "LEFT"}
+    return {
+        "name": "Card",
+        "size": {"x": x, "y": y, "width": 200, "height": 100},
+        "fillColor": "#FFFFFF",
+        "children": [
+            {"name": "Title", "size": {"x": x + 10, "y": y + 10, "width": 100, "height": 20}, "characters": title, "style": dict(style)},
+            {"name": "Button", "size": {"x": x + 10, "y": y + 50, "width": 50, "height": 20}, "characters": "Go", "style": dict(style)},
+        ],
+    }
+
+
+def test_dedupe_subtrees_round_trip():
+    with open("test/data.json", "r") as f:
+        data = json.load(f)
+    tree, definitions = dedupe_subtrees(data)
+    assert len(json.dumps([tree, definitions])) < len(json.dumps(data))
+    assert expand_refs(tree, definitions) == data
+
+
+def test_dedupe_subtrees_ignores_positions():
+    data = {"name": "Page", "children": [card(0, 0, "Hello"), card(0, 120, "Hello"), card(300, 0, "Hello"), card(300, 120, "Other")]}
+    tree, definitions = dedupe_subtrees(data)
+
+    # The three identical cards share a definition, wherever they are, and the button
+    # is shared by that definition and the fourth card
+    assert sorted(definitions) == ["button#1", "card#1"]
+    assert [child.get(REF_KEY) for child in tree["children"]] == ["card#1", "card#1", "card#1", None]
+    assert tree["children"][2]["size"] == {"x": 300, "y": 0, "width": 200, "height": 100}
+    # Positions inside the definition are relative to the card
+    assert definitions["card#1"]["children"][1] == {REF_KEY: "button#1", "size": {"x": 10, "y": 50, "width": 50, "height": 20}}
+    assert expand_refs(tree, definitions) == data
+
+    # Nothing is shared when no subtree repeats
+    assert dedupe_subtrees(card(0, 0, "Hello")) == (card(0, 0, "Hello"), {})
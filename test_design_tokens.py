@@ -0,0 +1,45 @@
+import json
+from design_tokens import extract_design_tokens, tailwind_theme
+
+
+def text(name, size, weight, color):
+    style = {"fontFamily": "Inter", "fontWeight": weight, "fontSize": size, "lineHeightPx": size + 4, "letterSpacing": 0,
+             "textAlignHorizontal": "LEFT"}
+    return {"name": name, "characters": name, "style": style, "fillColor": color}
+
+
+def test_extract_design_tokens():
+    data = {
+        "name": "Card",
+        "cornerRadius": 10,
+        "paddingLeft": 24,
+        "itemSpacing": 8,
+        "backgroundColor": "#FFFFFF",
+        "children": [text("Title", 24, 700, "#1A202C"), text("Body", 16, 400, "#596780"), text("Note", 16, 400, "#596780")],
+    }
+    tree, tokens = extract_design_tokens(data)
+
+    assert tokens["colors"] == {"color-1": "#596780", "color-2": "#1A202C", "color-3": "#FFFFFF"}
+    assert tokens["radii"] == {"radius-1": 10}
+    assert tokens["spacing"] == {"space-1": 8, "space-2": 24}
+    assert list(tokens["textStyles"]) == ["type-1", "type-2"]
+    assert tokens["textStyles"]["type-1"]["fontSize"] == 24
+    assert tokens["fontFamilies"] == {"inter": "Inter"}
+
+    assert tree["cornerRadius"] == "radius-1" and tree["paddingLeft"] == "space-2"
+    # Per node text properties stay on the node
+    assert tree["children"][1] == {"name": "Body", "characters": "Body", "fillColor": "color-1",
+                                   "style": {"textStyle": "type-2", "textAlignHorizontal": "LEFT"}}
+    assert data["cornerRadius"] == 10
+
+    theme = tailwind_theme(tokens)
+    assert theme["fontSize"]["type-2"] == ["16px", {"lineHeight": "20px", "letterSpacing": "0px", "fontWeight": "400"}]
+    assert theme["spacing"] == {"space-1": "8px", "space-2": "24px"}
+
+
+def test_extract_design_tokens_shrinks_style_payload():
+    with open("test/data.json", "r") as f:
+        data = json.load(f)
+    tree, tokens = extract_design_tokens(data)
+    assert len(json.dumps(tree)) < len(json.dumps(data))
+    assert set(tokens["colors"].values()) >= {"#FFFFFF", "#3563E9"}
@@ -0,0 +1,172 @@
+import os
+import json
+import pytest
+import requests
+import figma_apis
+from figma_apis import download_and_save_images, unique_file_stem
+
+FIGMA_URL = "https://www.figma.com/design/KEY123/Untitled?node-id=1-1"
+
+
+class FakeResponse:
+    def __init__(self, content, status_code=200):
+        self.content = content
+        self.status_code = status_code
+        self.headers = {"Content-Type": "image/png"}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+
+class FakeClient:
+    """Exports every node to a URL serving the bytes of its fill, and counts the downloads."""
+
+    def __init__(self, images):
+        self.images = images
+        self.downloads = []
+
+    def get_json(self, endpoint, params=None):
+        return {"images": {node_id: f"https://s3.example.com/{node_id}" for node_id in params["ids"].split(",")}}
+
+    def get(self, url, params=None, stream=False):
+        node_id = url.rsplit("/", 1)[1]
+        self.downloads.append(node_id)
+        return FakeResponse(self.images[node_id])
+
+
+def photo(node_id, name, image_ref):
+    return {"id": node_id, "name": name, "type": "RECTANGLE", "fills": [{"type": "IMAGE", "imageRef": image_ref}],
+            "absoluteBoundingBox": {"x": 0, "y": 0, "width": 10, "height": 10}}
+
+
+def figma_data(*children):
+    return {"nodes": {"1:1": {"document": {"id": "1:1", "name": "Frame", "type": "FRAME", "children": list(children)}}}}
+
+
+def fake_client(monkeypatch, images):
+    client = FakeClient(images)
+    monkeypatch.setattr(figma_apis, "get_figma_client", lambda token: client)
+    return client
+
+
+def read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def test_unique_file_stem():
+    taken = set()
+
+    assert unique_file_stem("Image", "1:2", taken) == "Image"
+    assert unique_file_stem("image", "1:3", taken) == "image-1-3"
+    assert unique_file_stem("Icon", "1:4", taken) == "Icon"
+    assert taken == {"image", "image-1-3", "icon"}
+
+
+def test_assets_with_the_same_name_get_their_own_files(monkeypatch, tmp_path):
+    png = b"\x89PNG\r\n\x1a\n"
+    fake_client(monkeypatch, {"1:2": png + b"photoA", "1:3": png + b"photoB"})
+    data = figma_data(photo("1:2", "Image", "refA"), photo("1:3", "Image", "refB"))
+
+    assert download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=data) == ["1-2", "1-3"]
+    assert read(tmp_path / "Image.png") == png + b"photoA"
+    assert read(tmp_path / "Image-1-3.png") == png + b"photoB"
+
+
+def test_manifest_keeps_same_name_assets_apart(monkeypatch, tmp_path):
+    png = b"\x89PNG\r\n\x1a\n"
+    client = fake_client(monkeypatch, {"1:2": png + b"photoA", "1:3": png + b"photoB"})
+    data = figma_data(photo("1:2", "Image", "refA"), photo("1:3", "Image", "refB"))
+
+    download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=data)
+    with open(tmp_path / figma_apis.ASSET_MANIFEST_FILE) as f:
+        assets = json.load(f)["assets"]
+    assert {node_id: entry["file"] for node_id, entry in assets.items()} == {"1:2": "Image.png", "1:3": "Image-1-3.png"}
+
+    # Nothing changed, nothing is downloaded again
+    client.downloads.clear()
+    assert download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=data) == ["1-2", "1-3"]
+    assert client.downloads == []
+
+
+def test_manifest_with_one_file_for_different_contents_is_repaired(monkeypatch, tmp_path):
+    png = b"\x89PNG\r\n\x1a\n"
+    client = fake_client(monkeypatch, {"1:2": png + b"photoA", "1:3": png + b"photoB"})
+    data = figma_data(photo("1:2", "Image", "refA"), photo("1:3", "Image", "refB"))
+    download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=data)
+
+    # A manifest written when both assets raced for Image.png
+    manifest = figma_apis.load_asset_manifest(str(tmp_path))
+    manifest["assets"]["1:3"]["file"] = "Image.png"
+    figma_apis.save_asset_manifest(str(tmp_path), manifest)
+    with open(tmp_path / "Image.png", "wb") as f:
+        f.write(png + b"photoB")
+    os.remove(tmp_path / "Image-1-3.png")
+
+    client.downloads.clear()
+    download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=data)
+    assert sorted(client.downloads) == ["1:2", "1:3"]
+    assert read(tmp_path / "Image.png") == png + b"photoA"
+    assert read(tmp_path / "Image-1-3.png") == png + b"photoB"
+
+
+def test_nodes_sharing_an_image_ref_download_it_once(monkeypatch, tmp_path):
+    png = b"\x89PNG\r\n\x1a\n"
+    client = fake_client(monkeypatch, {"1:2": png + b"logo", "1:3": png + b"logo", "1:4": png + b"big logo"})
+    moved = photo("1:3", "Logo copy", "refA")
+    moved["absoluteBoundingBox"] = {"x": 300, "y": 40, "width": 10, "height": 10}
+    data = figma_data(photo("1:2", "Logo", "refA"), moved)
+
+    assert download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=data) == ["1-2", "1-3"]
+    assert client.downloads == ["1:2"]
+    with open(tmp_path / figma_apis.ASSET_MANIFEST_FILE) as f:
+        assets = json.load(f)["assets"]
+    assert {node_id: entry["file"] for node_id, entry in assets.items()} == {"1:2": "Logo.png", "1:3": "Logo.png"}
+    assert assets["1:3"]["imageRef"] == "refA"
+
+    # The same imageRef rendered at another size is a different export
+    resized = photo("1:4", "Logo large", "refA")
+    resized["absoluteBoundingBox"] = {"x": 0, "y": 0, "width": 40, "height": 40}
+    client.downloads.clear()
+    download_and_save_images(str(tmp_path), FIGMA_URL, figma_data=figma_data(photo("1:2", "Logo", "refA"), moved, resized))
+    assert client.downloads == ["1:4"]
+    assert read(tmp_path / "Logo large.png") == png + b"big logo"
+
+def test_failed_download_leaves_no_partial_file(tmp_path):
+    class BrokenResponse(FakeResponse):
+        def iter_content(self, chunk_size):
+            yield b"\x89PNG\r\n\x1a\n"
+            raise requests.ConnectionError("connection reset")
+
+    class BrokenClient:
+        def get(self, url, stream=False):
+            return BrokenResponse(b"")
+
+    assert figma_apis.download_image(BrokenClient(), str(tmp_path), "1:2", "Image", "https://s3.example.com/1:2") is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_export_image_urls_keeps_the_batches_that_succeed(monkeypatch):
+    class FailingClient(FakeClient):
+        def get_json(self, endpoint, params=None):
+            if "1:3" in params["ids"]:
+                raise requests.HTTPError("Error: 500")
+            return super().get_json(endpoint, params)
+
+    monkeypatch.setattr(figma_apis, "get_figma_client", lambda token: FailingClient({}))
+    monkeypatch.setattr(figma_apis, "IMAGE_EXPORT_BATCH_SIZE", 1)
+    assert figma_apis.export_image_urls("KEY", ["1:2", "1:3"], "token") == {
+        "1:2": "https://s3.example.com/1:2", "1:3": None}
+
+    # Programming errors are not taken for failed batches
+    monkeypatch.setattr(FailingClient, "get_json", lambda self, endpoint, params=None: None)
+    with pytest.raises(AttributeError):
+        figma_apis.export_image_urls("KEY", ["1:2"], "token")
+
@@ -0,0 +1,97 @@
+import os
+import json
+import itertools
+import pytest
+import figma_cache
+from figma_cache import FigmaCache, INDEX_FILE
+
+
+@pytest.fixture(autouse=True)
+def clock(monkeypatch):
+    # A clock that ticks on every call, so access times never tie
+    ticks = itertools.count(1)
+    monkeypatch.setattr(figma_cache.time, "time", lambda: float(next(ticks)))
+
+
+def read_index(cache_dir):
+    with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+        return json.load(f)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = FigmaCache(str(tmp_path), max_bytes=10)
+    cache.put("a", "v1", b"aaaa")
+    cache.put("b", "v1", b"bbbb")
+    assert cache.get("a") == b"aaaa"
+    cache.put("c", "v1", b"cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == b"aaaa" and cache.get("c") == b"cccc"
+    assert sorted(read_index(str(tmp_path))) == ["a", "c"]
+
+
+def test_reads_do_not_write_the_index_until_flushed(tmp_path):
+    cache = FigmaCache(str(tmp_path))
+    cache.put("a", "v1", b"aaaa")
+    before = read_index(str(tmp_path))
+
+    cache.get("a")
+    assert read_index(str(tmp_path)) == before
+    cache.flush()
+    assert read_index(str(tmp_path))["a"]["last_access"] > before["a"]["last_access"]
+    assert [name for name in os.listdir(tmp_path) if name.endswith(".tmp")] == []
+
+
+def test_version_change_invalidates(tmp_path, monkeypatch):
+    versions = iter(["v1", "v2"])
+    fetches = []
+    monkeypatch.setattr(figma_cache, "fetch_file_version", lambda file_key: next(versions))
+    monkeypatch.setattr(figma_cache, "fetch_figma_data", lambda file_key, node_id: fetches.append(node_id) or {"v": len(fetches)})
+
+    assert FigmaCache(str(tmp_path)).fetch_figma_data("KEY", "1-2") == {"v": 1}
+    # Same version, from the cache
+    cache = FigmaCache(str(tmp_path))
+    cache._versions["KEY"] = "v1"
+    assert cache.fetch_figma_data("KEY", "1:2") == {"v": 1}
+    # New version, fetched again
+    assert FigmaCache(str(tmp_path)).fetch_figma_data("KEY", "1:2") == {"v": 2}
+    assert fetches == ["1-2", "1:2"]
+
+
+def test_offline_miss_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(figma_cache, "fetch_file_version", lambda file_key: pytest.fail("offline went online"))
+    cache = FigmaCache(str(tmp_path), offline=True)
+
+    with pytest.raises(Exception, match="Offline mode"):
+        cache.fetch_figma_data("KEY", "1:2")
+    cache.put(FigmaCache.make_key("KEY", "1:2", 1, "json"), "v1", b'{"cached": true}')
+    assert cache.fetch_figma_data("KEY", "1-2") == {"cached": True}
+
+
+def test_entries_above_the_cap_are_not_cached(tmp_path):
+    cache = FigmaCache(str(tmp_path), max_bytes=10)
+    cache.put("a", "v1", b"aaaa")
+    cache.put("big", "v1", b"x" * 11)
+
+    assert cache.get("big") is None
+    assert cache.get("a") == b"aaaa"
+    assert sorted(read_index(str(tmp_path))) == ["a"]
+    assert set(os.listdir(tmp_path)) - {figma_cache.LOCK_FILE} == {INDEX_FILE, read_index(str(tmp_path))["a"]["file"]}
+
+
+def test_instances_sharing_a_directory_merge_their_entries(tmp_path):
+    first = FigmaCache(str(tmp_path))
+    second = FigmaCache(str(tmp_path))
+    first.put("a", "v1", b"aaaa")
+    second.put("b", "v1", b"bbbb")
+    assert second.get("a") == b"aaaa"
+    first.put("c", "v1", b"cccc")
+
+    assert first.get("b") == b"bbbb"
+    assert sorted(read_index(str(tmp_path))) == ["a", "b", "c"]
+    # Access times recorded by one instance survive the other's writes
+    second.flush()
+    first.flush()
+    index = read_index(str(tmp_path))
+    assert index["b"]["last_access"] > index["c"]["last_access"]
+
@@ -0,0 +1,135 @@
+import time
+import threading
+import pytest
+import requests
+import figma_client
+from figma_client import FIGMA_API_BASE_URL, FigmaClient, retry_after_seconds
+
+API_URL = f"{FIGMA_API_BASE_URL}/files/KEY/nodes"
+
+
+class StubResponse:
+    def __init__(self, status_code, headers=None, content=b"{}"):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = content
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class StubSession:
+    """Answers with the queued responses (or raises the queued exceptions) in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = []
+
+    def get(self, url, headers=None, params=None, timeout=None, stream=False):
+        self.calls.append((url, headers))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    delays = []
+    monkeypatch.setattr(figma_client.time, "sleep", delays.append)
+    return delays
+
+
+def stub_client(token, *responses, **options):
+    client = FigmaClient(token, **options)
+    client.session = StubSession(*responses)
+    return client
+
+
+def test_retries_429_honouring_retry_after(sleeps):
+    client = stub_client("retry-after", StubResponse(429, {"Retry-After": "2"}), StubResponse(200))
+
+    assert client.get(API_URL).status_code == 200
+    assert sleeps == [2.0]
+    assert client.metrics()["GET /v1/files/:key/nodes"]["retries"] == 1
+
+
+def test_retries_5xx_with_exponential_backoff(sleeps, monkeypatch):
+    # Full jitter draws up to the backoff cap, take the cap
+    monkeypatch.setattr(figma_client.random, "uniform", lambda low, high: high)
+    client = stub_client("backoff", StubResponse(503), StubResponse(502), StubResponse(500), max_retries=2)
+
+    response = client.get(API_URL)
+    assert response.status_code == 500
+    assert sleeps == [figma_client.BACKOFF_BASE, figma_client.BACKOFF_BASE * 2]
+    assert client.metrics()["GET /v1/files/:key/nodes"]["errors"] == 3
+
+
+def test_does_not_retry_client_errors(sleeps):
+    client = stub_client("client-error", StubResponse(404))
+
+    assert client.get(API_URL).status_code == 404
+    assert sleeps == []
+
+
+def test_connection_errors_are_retried_then_raised(sleeps):
+    client = stub_client("connection", requests.ConnectionError("reset"), requests.ConnectionError("reset"), max_retries=1)
+
+    with pytest.raises(requests.ConnectionError):
+        client.get(API_URL)
+    assert len(sleeps) == 1
+
+
+def test_token_only_sent_to_figma_api():
+    client = stub_client("secret", StubResponse(200), StubResponse(200))
+    client.get(API_URL)
+    client.get("https://s3-alpha.figma.com/img/abc")
+
+    assert client.session.calls[0][1] == {"X-FIGMA-TOKEN": "secret"}
+    assert client.session.calls[1][1] == {}
+
+
+def test_concurrent_api_calls_are_limited_per_token():
+    in_flight = []
+    peak = []
+    lock = threading.Lock()
+
+    class SlowSession:
+        def get(self, url, **kwargs):
+            with lock:
+                in_flight.append(url)
+                peak.append(len(in_flight))
+            time.sleep(0.02)
+            with lock:
+                in_flight.remove(url)
+            return StubResponse(200)
+
+    clients = [FigmaClient("limited", max_concurrency=2) for _ in range(2)]
+    for client in clients:
+        client.session = SlowSession()
+    threads = [threading.Thread(target=clients[index % 2].get, args=(API_URL,)) for index in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) == 2
+
+
+
+def test_concurrency_limit_mismatch_raises():
+    FigmaClient("mismatch", max_concurrency=2)
+    FigmaClient("mismatch", max_concurrency=2)
+    with pytest.raises(ValueError, match="already limited to 2"):
+        FigmaClient("mismatch", max_concurrency=3)
+
+    client = figma_client.get_figma_client("shared-mismatch", max_concurrency=2)
+    assert figma_client.get_figma_client("shared-mismatch", max_concurrency=2) is client
+    with pytest.raises(ValueError, match="limited to 2"):
+        figma_client.get_figma_client("shared-mismatch")
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(StubResponse(429, {"Retry-After": "1.5"})) == 1.5
+    assert retry_after_seconds(StubResponse(429, {"Retry-After": "Wed, 21 Oct 2015 07:28:00 GMT"})) == 0.0
+    assert retry_after_seconds(StubResponse(429)) is None
@@ -0,0 +1,110 @@
+import copy
+import figma_tree
+from figma_tree import LazyFigmaTree
+
+
+def frame(node_id, *children):
+    return {"id": node_id, "type": "FRAME", "name": node_id, "children": list(children)}
+
+
+def text(node_id):
+    return {"id": node_id, "type": "TEXT", "name": node_id}
+
+
+def full_document():
+    return {"id": "0:0", "type": "DOCUMENT", "children": [
+        {"id": "0:1", "type": "CANVAS", "children": [
+            frame("1:1", frame("1:2", frame("1:3", text("1:4"))), frame("1:5", frame("1:6", text("1:7")))),
+            frame("2:1", frame("2:2", frame("2:3", text("2:4")))),
+        ]},
+    ]}
+
+
+class FakeFigma:
+    """Serves a document like the Figma API, cutting it off below depth levels."""
+
+    def __init__(self):
+        self.document = full_document()
+        self.requests = []
+
+    @staticmethod
+    def cut(node, depth):
+        node = copy.deepcopy(node)
+        stack = [(node, 0)]
+        while stack:
+            current, level = stack.pop()
+            if depth is not None and level >= depth:
+                current.pop("children", None)
+            stack.extend((child, level + 1) for child in current.get("children", []))
+        return node
+
+    def find(self, node_id):
+        stack = [self.document]
+        while stack:
+            node = stack.pop()
+            if node["id"] == node_id:
+                return node
+            stack.extend(node.get("children", []))
+
+    def fetch_figma_data(self, file_key, node_id=None, depth=None):
+        self.requests.append((node_id, depth))
+        if not node_id:
+            return {"document": self.cut(self.document, depth)}
+        return {"nodes": {node_id: {"document": self.cut(self.find(node_id), depth)}
+                          for node_id in node_id.replace("-", ":").split(",")}}
+
+
+def fake_figma(monkeypatch):
+    figma = FakeFigma()
+    monkeypatch.setattr(figma_tree, "fetch_figma_data", figma.fetch_figma_data)
+    return figma
+
+
+def test_children_load_pending_nodes_once(monkeypatch):
+    figma = fake_figma(monkeypatch)
+    tree = LazyFigmaTree("KEY", "1-1", depth=1)
+
+    assert figma.requests == [("1-1", 1)]
+    child = tree.root["children"][0]
+    assert tree.pending_count() == 2
+    assert [node["id"] for node in tree.children(child)] == ["1:3"]
+    tree.children(child)
+    # Fetched with the depth of the tree, the grandchild is pending in turn
+    assert figma.requests == [("1-1", 1), ("1:2", 1)]
+    assert tree.pending_count() == 2
+    assert [node["id"] for node in tree.children(child["children"][0])] == ["1:4"]
+
+
+def test_load_all_batches_pending_nodes(monkeypatch):
+    figma = fake_figma(monkeypatch)
+    monkeypatch.setattr(figma_tree, "NODES_BATCH_SIZE", 1)
+    tree = LazyFigmaTree("KEY", "1:1", depth=1)
+
+    assert tree.load_all() is tree.response()
+    assert figma.requests == [("1:1", 1), ("1:2", None), ("1:5", None)]
+    assert tree.response()["nodes"]["1:1"]["document"] == figma.find("1:1")
+    assert tree.pending_count() == 0
+
+
+def test_whole_file_without_node_id(monkeypatch):
+    figma = fake_figma(monkeypatch)
+    tree = LazyFigmaTree("KEY", None, depth=2)
+
+    assert figma.requests == [(None, 2)]
+    assert tree.root is tree.response()["document"]
+    assert tree.pending_count() == 2
+    assert tree.load_all()["document"] == figma.document
+
+
+def test_expand_stops_when_the_tree_no_longer_fits(monkeypatch):
+    figma = fake_figma(monkeypatch)
+    tree = LazyFigmaTree("KEY", None, depth=2)
+
+    sizes = []
+    rounds = tree.expand(lambda data: sizes.append(len(str(data))) or len(sizes) < 2)
+    assert rounds == 1
+    assert figma.requests == [(None, 2), ("1:1,2:1", 2)]
+    assert tree.pending_count() == 3
+
+    assert tree.expand(lambda data: True) == 1
+    assert tree.response()["document"] == figma.document
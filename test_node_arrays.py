@@ -0,0 +1,40 @@
+import json
+import numpy as np
+from node_arrays import build_node_arrays
+from spacing_evaluator import extract_nodes
+
+
+def test_node_arrays_match_extract_nodes():
+    with open("test/data.json", "r") as f:
+        document = list(json.load(f)["nodes"].values())[0]["document"]
+    arrays = build_node_arrays(document)
+    nodes = extract_nodes(document)
+    sized = np.flatnonzero(arrays.has_size)
+    sized_parent = arrays.sized_parent()
+
+    assert len(sized) == len(nodes)
+    for position, node in zip(sized, nodes):
+        assert (arrays.x[position], arrays.y[position], arrays.w[position], arrays.h[position]) == \
+               (node["x"], node["y"], node["width"], node["height"])
+        parent = sized_parent[position]
+        assert (parent == -1) == (node["parent"] is None)
+        if node["parent"] is not None:
+            assert (arrays.x[parent], arrays.y[parent]) == (node["parent"]["x"], node["parent"]["y"])
+    # A few dozen bytes per node
+    assert arrays.nbytes <= 40 * len(arrays)
+
+
+def test_node_arrays_lookup():
+    data = {"id": "1:1", "type": "FRAME", "size": {"x": 0, "y": 0, "width": 100, "height": 100}, "paddingLeft": 8, "children": [
+        {"id": "1:2", "characters": "Hi", "size": {"x": 10, "y": 10, "width": 20, "height": 10}},
+        {"id": "1:3", "children": [{"id": "1:4", "fillColor": "#FFFFFF", "size": {"x": 50, "y": 50, "width": 10, "height": 10}}]},
+    ]}
+    arrays = build_node_arrays(data)
+
+    assert arrays.types().tolist() == ["FRAME", "TEXT", "GROUP", "RECTANGLE"]
+    assert arrays.parent.tolist() == [-1, 0, 0, 2]
+    assert arrays.sized_parent().tolist() == [-1, 0, 0, 0]
+    assert arrays.children(arrays.position("1:1")).tolist() == [1, 2]
+    assert arrays.children(arrays.position("1:4")).tolist() == []
+    assert arrays.padding[0, 0] == 8 and np.isnan(arrays.padding[0, 1])
+    assert arrays.hit_test(55, 55).tolist() == [0, 3]
@@ -0,0 +1,66 @@
+import copy
+import sys
+import json
+from node_index import NodeIndex
+from clean_json import remove_children_by_ids
+
+
+def figma_nodes_response():
+    return {
+        "name": "File",
+        "nodes": {
+            "1:1": {"document": {"id": "1:1", "name": "Page", "children": [
+                {"id": "1:2", "name": "Card", "children": [{"id": "1:3", "name": "Title"}, {"id": "1:4", "name": "Icon", "children": [{"id": "1:5"}]}]},
+                {"id": "1:6", "name": "Footer"},
+            ]}}
+        },
+    }
+
+
+def test_node_index_entries():
+    data = figma_nodes_response()
+    index = NodeIndex(data)
+
+    assert list(index) == ["", "1:1", "1:2", "1:3", "1:4", "1:5", "1:6"]
+    assert index.get("1:4")["name"] == "Icon"
+    assert index["1:4"].parent_id == "1:2" and index["1:4"].depth == 3
+    assert index["1:4"].path == ("nodes", "1:1", "document", "children", 0, "children", 1)
+    assert index.parent("1:3")["name"] == "Card"
+    assert list(index.descendants("1:2")) == ["1:3", "1:4", "1:5"]
+    assert index.get("9:9") is None
+
+    # Cleaned trees have no ids, their nodes are keyed by path
+    cleaned = {"name": "Page", "children": [{"name": "Card", "children": [{"name": "Title"}]}]}
+    index = NodeIndex(cleaned)
+    assert list(index) == ["", "/children/0", "/children/0/children/0"]
+    assert index.key_of(cleaned["children"][0]) == "/children/0"
+
+
+def test_node_index_deep_tree():
+    # Deeper than the recursion limit
+    root = node = {"id": "0"}
+    for depth in range(1, sys.getrecursionlimit() + 100):
+        child = {"id": str(depth)}
+        node["children"] = [child]
+        node = child
+    index = NodeIndex(root)
+    assert index[str(depth)].depth == depth
+    index.remove_children(["1"])
+    assert len(index) == 2 and "children" not in root["children"][0]
+
+
+def test_remove_children_by_ids():
+    data = figma_nodes_response()
+    original = copy.deepcopy(data)
+    result = remove_children_by_ids(data, ["1:4", "1:6", "9:9"])
+
+    # A pruned copy, the input is untouched
+    assert data == original
+    card = result["nodes"]["1:1"]["document"]["children"][0]
+    assert card["children"][1] == {"id": "1:4", "name": "Icon"}
+    assert card["children"][0] == {"id": "1:3", "name": "Title"}
+    assert json.dumps(result).count('"id"') == 5
+
+    # Pruned in place on request
+    assert remove_children_by_ids(data, ["1:4", "1:6", "9:9"], in_place=True) is data
+    assert data == result
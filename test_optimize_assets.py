@@ -0,0 +1,38 @@
+import os
+import json
+from PIL import Image
+from optimize_assets import OPTIMIZED_DIR, ASSETS_MAP_FILE, load_assets_map, optimize_assets, optimize_image
+
+
+def write_png(path, size, mode="RGBA"):
+    Image.new(mode, size, (255, 0, 0, 128) if mode == "RGBA" else 7).save(path)
+
+
+def test_optimize_image_writes_1x_and_2x_webp(tmp_path):
+    write_png(tmp_path / "Photo.png", (200, 100))
+    out_dir = tmp_path / OPTIMIZED_DIR
+    out_dir.mkdir()
+
+    result = optimize_image(str(tmp_path / "Photo.png"), str(out_dir))
+
+    assert (result["width"], result["height"]) == (100, 50)
+    assert [(variant["file"], variant["scale"]) for variant in result["variants"]] == [
+        ("optimized/Photo.png", 2), ("optimized/Photo@1x.webp", 1), ("optimized/Photo@2x.webp", 2)]
+    with Image.open(out_dir / "Photo@1x.webp") as image:
+        assert image.format == "WEBP" and image.size == (100, 50)
+    with Image.open(out_dir / "Photo@2x.webp") as image:
+        assert image.size == (200, 100)
+
+
+def test_optimize_assets_writes_assets_map(tmp_path):
+    write_png(tmp_path / "Photo.png", (40, 20))
+    write_png(tmp_path / "Palette.png", (10, 10), mode="P")
+    (tmp_path / "icon.svg").write_text("<svg/>")
+
+    assets_map = optimize_assets(str(tmp_path), max_workers=2)
+
+    assert sorted(assets_map) == ["Palette.png", "Photo.png"]
+    with open(os.path.join(tmp_path, OPTIMIZED_DIR, ASSETS_MAP_FILE)) as f:
+        assert json.load(f) == assets_map == load_assets_map(str(tmp_path))
+    assert assets_map["Photo.png"]["variants"][1] == {
+        "file": "optimized/Photo@1x.webp", "format": "webp", "scale": 1, "width": 20, "height": 10}
@@ -0,0 +1,71 @@
+import json
+from clean_json import process_json
+from config_initial import config
+from dedupe_json import dedupe_subtrees
+from design_tokens import extract_design_tokens
+from prompt_serializer import (serialize_style_info, format_style_info, estimate_tokens, requested_details,
+                               level_of_detail)
+
+
+def load_data():
+    with open("test/data.json", "r") as f:
+        return json.load(f)
+
+
+def test_serialize_style_info_fits_budget():
+    data = load_data()
+    full = format_style_info(data)
+
+    # Designs within the budget are formatted in full
+    assert serialize_style_info(data, token_budget=estimate_tokens(full)) == (full, 0)
+
+    previous = len(full)
+    for budget in (1000, 600, 400):
+        text, summarized = serialize_style_info(data, token_budget=budget)
+        assert estimate_tokens(text) <= budget and summarized > 0
+        assert len(text) <= previous
+        previous = len(text)
+
+
+def test_level_of_detail_levels_and_details():
+    data = load_data()
+    reduced, summarized = level_of_detail(data, token_budget=10 ** 6, max_levels=1)
+    document = reduced["nodes"]["44:16200"]["document"]
+    # The first level is in full, the second summarized
+    assert document["children"][0]["name"] == "Total Review" and "size" in document["children"][0]
+    summary = document["children"][0]["children"][0]
+    assert summary["detail"] == "/nodes/44:16200/document/children/0/children/0"
+    assert summary["styles"]["fontSize"] == 20 and "childCount" not in summary
+    assert summarized == sum(len(child.get("children", [])) for child in document["children"])
+
+    # A summary can be asked for in full
+    details = requested_details(data, f"The title is wrong, detail: {summary['detail']}}}")
+    assert list(details) == [summary["detail"]]
+    assert details[summary["detail"]].startswith("name: Reviews ")
+    assert requested_details(data, "detail: /nowhere") == {}
+
+
+def test_level_of_detail_counts_definitions_and_tokens():
+    tree, tokens = extract_design_tokens(process_json(load_data(), config))
+    tree, definitions = dedupe_subtrees({"designTokens": tokens, **tree})
+    data = {"definitions": definitions, **tree}
+    full = format_style_info(data)
+
+    for budget in (1000, 1500):
+        assert estimate_tokens(full) > budget
+        reduced, summarized = level_of_detail(data, token_budget=budget)
+        assert estimate_tokens(format_style_info(reduced)) <= budget and summarized > 0
+
+        # Only the entries the shown nodes use are kept, and all of them are there
+        shown = json.dumps({key: value for key, value in reduced.items() if key not in ("definitions", "designTokens")})
+        kept = reduced["definitions"]
+        assert set(kept) < set(definitions)
+        for name in definitions:
+            referenced = f'"$ref": {json.dumps(name)}' in shown or any(
+                f'"$ref": {json.dumps(name)}' in json.dumps(definition) for definition in kept.values())
+            assert (name in kept) == referenced
+        colors = reduced["designTokens"]["colors"]
+        assert set(colors) <= set(tokens["colors"])
+        assert all((f'"{name}"' in shown or any(f'"{name}"' in json.dumps(item) for item in kept.values())) == (name in colors)
+                   for name in tokens["colors"])
+
@@ -0,0 +1,55 @@
+import json
+import copy
+import numpy as np
+from node_arrays import NodeArrays
+from spacing_arrays import compute_spacing, spacing_arrays, sized_geometry
+from spacing_evaluator import analyze_spacing
+
+
+def box(name, x, y, width, height, children=None):
+    node = {"name": name, "size": {"x": x, "y": y, "width": width, "height": height}}
+    if children is not None:
+        node["children"] = children
+    return node
+
+
+def page_document():
+    return box("Page", 0, 0, 400, 400, [
+        box("Card", 10, 10, 200, 100, [box("Title", 20, 15, 50, 20), box("Body", 80, 45, 50, 20)]),
+        {"name": "Group", "children": [box("Card", 220, 200, 150, 100, [box("Title", 240, 215, 50, 20)])]},
+    ])
+
+
+def test_compute_spacing_arrays():
+    spacing = compute_spacing(x=[0, 10, 60], y=[0, 10, 10], w=[100, 40, 20], h=[50, 20, 30], parent=[-1, 0, 0])
+
+    assert spacing.padding.tolist() == [[10, 10, 20, 10], [0, 0, 0, 0], [0, 0, 0, 0]]
+    assert np.isnan(spacing.margin[0]).all()
+    assert spacing.margin[1:].tolist() == [[0, 0, 30, 10], [50, 0, 0, 0]]
+    assert spacing.horizontal_pairs.tolist() == [[1, 2]] and spacing.horizontal_gaps.tolist() == [10]
+    assert spacing.vertical_pairs.tolist() == [[1, 2]] and spacing.vertical_gaps.tolist() == [0]
+    assert spacing.parents().tolist() == [0]
+
+
+def test_sized_geometry_skips_nodes_without_size():
+    sized, x, y, w, h, parent = sized_geometry(NodeArrays.from_tree(page_document()))
+
+    # The Group without a size (index 4) is left out, its Card attached to the Page
+    assert sized.tolist() == [0, 1, 2, 3, 5, 6]
+    assert parent.tolist() == [-1, 0, 1, 1, 0, 4]
+    assert x.tolist() == [0, 10, 20, 80, 220, 240]
+
+
+def test_to_results_matches_analyze_spacing():
+    document = page_document()
+
+    for default_padding in (0, 20):
+        expected = analyze_spacing(copy.deepcopy(document), default_padding)
+        assert spacing_arrays(document, default_padding).to_results() == expected
+
+
+def test_to_results_matches_analyze_spacing_on_test_data():
+    with open("test/data.json", "r") as f:
+        document = list(json.load(f)["nodes"].values())[0]["document"]
+
+    assert spacing_arrays(document, 20).to_results() == analyze_spacing(copy.deepcopy(document), 20)
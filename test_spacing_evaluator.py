@@ -0,0 +1,146 @@
+import json
+from spacing_evaluator import (analyze_spacing, calculate_sibling_spacing, evaluate_files, find_frames, find_overlaps,
+                               infer_layout, iter_spacing_records, print_tree, process_json_file)
+
+
+def box(name, x, y, width, height, children=None, **properties):
+    node = {"name": name, "size": {"x": x, "y": y, "width": width, "height": height}, **properties}
+    if children is not None:
+        node["children"] = children
+    return node
+
+
+def cards_document():
+    # Two cards share a name, the second one sits inside a group without a size
+    return box("Page", 0, 0, 400, 400, [
+        box("Card", 0, 0, 200, 100, [box("Title", 10, 10, 50, 20), box("Body", 70, 40, 50, 20)]),
+        {"name": "Group", "children": [
+            box("Card", 200, 200, 200, 100, [box("Title", 220, 215, 50, 20)]),
+        ]},
+    ])
+
+
+def test_analyze_spacing_keeps_same_name_parents_apart():
+    results = analyze_spacing(cards_document())
+
+    assert [result["parent_name"] for result in results] == ["Page", "Card", "Card"]
+    page, first_card, second_card = results
+    assert [child["child_name"] for child in page["children"]] == ["Card", "Card"]
+    assert first_card["parent_padding"] == {"paddingLeft": 10, "paddingTop": 10, "paddingRight": 80, "paddingBottom": 40}
+    assert [child["child_name"] for child in first_card["children"]] == ["Title", "Body"]
+    assert first_card["children"][1]["auto_layout_based"]["margin"] == {"left": 60, "top": 30, "right": 0, "bottom": 0}
+    assert first_card["sibling_margins"] == {("Title", "Body"): {"horizontal_gap": 10, "vertical_gap": 10}}
+    assert second_card["parent_padding"] == {"paddingLeft": 20, "paddingTop": 15, "paddingRight": 130, "paddingBottom": 65}
+    assert [child["child_name"] for child in second_card["children"]] == ["Title"]
+
+
+def test_process_json_file(tmp_path):
+    path = tmp_path / "figma.json"
+    path.write_text(json.dumps({"nodes": {"1:1": {"document": cards_document()}}}))
+
+    assert [result["parent_name"] for result in process_json_file(path, default_padding=20)] == ["Page", "Card", "Card"]
+
+
+def layout_box(name, x, y, width, height):
+    return {"name": name, "x": x, "y": y, "width": width, "height": height}
+
+
+def test_calculate_sibling_spacing_when_x_and_y_orders_differ():
+    children = [layout_box("Avatar", 0, 20, 10, 10), layout_box("Name", 20, 0, 50, 10)]
+
+    assert calculate_sibling_spacing(children) == {
+        ("Avatar", "Name"): {"horizontal_gap": 10},
+        ("Name", "Avatar"): {"vertical_gap": 10},
+    }
+
+
+def test_infer_layout_rows_columns_and_grids():
+    row = [layout_box("A", 0, 0, 10, 10), layout_box("B", 20, 0, 10, 10), layout_box("C", 40, 0, 10, 10)]
+    column = [layout_box("A", 0, 0, 10, 10), layout_box("B", 5, 15, 10, 10), layout_box("C", 0, 35, 20, 10)]
+    grid = [layout_box(f"{column}{row}", column * 30, row * 20, 20, 10) for row in range(2) for column in range(3)]
+
+    assert infer_layout(row) == {"layout": "flex-row", "gap": 10, "align": "start"}
+    assert infer_layout(column) == {"layout": "flex-col", "gaps": [5, 10]}
+    assert infer_layout(grid) == {"layout": "grid", "rows": 2, "columns": 3, "row_gap": {"gap": 10}, "column_gap": {"gap": 10}}
+    assert infer_layout(row[:1]) == {}
+
+
+def test_infer_layout_groups_and_overlaps():
+    header_and_row = [layout_box("Header", 0, 0, 100, 10), layout_box("Left", 0, 20, 40, 10), layout_box("Right", 50, 20, 50, 10)]
+    overlapping = [layout_box("Background", 0, 0, 100, 100), layout_box("Badge", 90, 90, 20, 20), layout_box("Label", 120, 0, 20, 10)]
+
+    assert infer_layout(header_and_row) == {"layout": "flex-col", "gap": 10, "groups": [
+        {"children": ["Header"]},
+        {"children": ["Left", "Right"], "layout": "flex-row", "gap": 10, "align": "start"},
+    ]}
+    assert find_overlaps(overlapping) == [("Background", "Badge")]
+    assert infer_layout(overlapping)["overlaps"] == [("Background", "Badge")]
+
+
+def test_process_json_file_test_data():
+    results = process_json_file("test/data.json", default_padding=20)
+
+    assert results[0]["parent_name"] == "Reviews"
+    assert results[0]["layout"] == {"layout": "flex-col", "gaps": [32, 24, 24]}
+
+
+def test_iter_spacing_records_yields_subtrees_first():
+    records = iter_spacing_records(cards_document())
+
+    first = next(records)
+    assert first["name"] == "Card" and first["depth"] == 1
+    assert first["padding"] == {"paddingLeft": 10, "paddingTop": 10, "paddingRight": 80, "paddingBottom": 40}
+    assert [child["name"] for child in first["children"]] == ["Title", "Body"]
+    assert first["children"][1]["margin"] == {"left": 60, "top": 30, "right": 0, "bottom": 0}
+    assert [(record["name"], record["depth"]) for record in records] == [("Card", 2), ("Page", 0)]
+
+
+def test_spacing_records_are_json_lines():
+    overlapping = box("Badge", 0, 0, 100, 100, [box("Background", 0, 0, 100, 100), box("Dot", 90, 90, 20, 20)])
+    record, = iter_spacing_records(overlapping)
+
+    assert json.loads(json.dumps(record)) == record
+    assert record["layout"]["overlaps"] == [["Background", "Dot"]]
+
+
+def test_print_tree(capsys):
+    print_tree(cards_document(), default_padding=20)
+    lines = capsys.readouterr().out.splitlines()
+
+    assert lines[:3] == [
+        "Node: Page",
+        "  Padding: {'paddingLeft': 0, 'paddingTop': 0, 'paddingRight': 0, 'paddingBottom': 100}",
+        "  Layout: {'layout': 'flex-col', 'gap': 100}",
+    ]
+    assert [line.strip() for line in lines if line.strip().startswith("Node:")] == [
+        "Node: Page", "Node: Card", "Node: Title", "Node: Body", "Node: Card", "Node: Title"]
+
+
+def figma_file_response():
+    return {"name": "File", "document": {"id": "0:0", "name": "Document", "children": [
+        {"id": "0:1", "name": "Desktop", "children": [cards_document(), box("Footer", 0, 500, 400, 50, [box("Link", 10, 510, 40, 20)])]},
+        {"id": "0:2", "name": "Mobile", "children": [box("Page", 0, 0, 200, 400, [box("Title", 20, 20, 100, 20)])]},
+    ]}}
+
+
+def test_find_frames():
+    frames = find_frames(figma_file_response())
+
+    assert [(key, frame["name"]) for key, frame in frames] == [
+        ("/document/children/0/children/0", "Page"),
+        ("/document/children/0/children/1", "Footer"),
+        ("/document/children/1/children/0", "Page"),
+    ]
+
+
+def test_evaluate_files_in_parallel(tmp_path):
+    paths = [tmp_path / "file.json", tmp_path / "nodes.json"]
+    paths[0].write_text(json.dumps(figma_file_response()))
+    paths[1].write_text(json.dumps({"nodes": {"1:1": {"document": cards_document()}}}))
+
+    reports = evaluate_files(paths, default_padding=20, max_workers=2)
+
+    assert [(report["file"], report["name"]) for report in reports] == [
+        (str(paths[0]), "Page"), (str(paths[0]), "Footer"), (str(paths[0]), "Page"), (str(paths[1]), "Page")]
+    assert reports[0]["records"] == list(iter_spacing_records(cards_document(), 20)) == reports[3]["records"]
+    assert [record["name"] for record in reports[1]["records"]] == ["Footer"]
@@ -0,0 +1,93 @@
+import os
+import json
+import figma_apis
+import xml.etree.ElementTree as ET
+from svg_assets import (ICONS_FILE, SPRITE_FILE, build_react_icons, build_sprite, element_to_jsx, jsx_style,
+                        minify_svg, process_svg_assets, svg_asset_hint)
+
+ICON = ('<svg xmlns="http://www.w3.org/2000/svg" xmlns:figma="http://www.figma.com/figma/ns" width="24" height="24" '
+        'viewBox="0 0 24.000 24.000" fill="none" figma:type="FRAME"><title>Arrow</title><!-- exported -->'
+        '<mask id="a" style="mask-type:alpha" maskUnits="userSpaceOnUse" x="0" y="0" width="24" height="24">'
+        '<path d="M 1.23456 , 2.5 L 10.000 -0.50" fill="#000"/></mask>'
+        '<g mask="url(#a)"><rect width="24" height="24" fill="#111"/></g></svg>')
+
+
+def test_minify_svg():
+    minified = minify_svg(ICON)
+
+    assert "<title>" not in minified and "exported" not in minified and "figma" not in minified
+    assert 'viewBox="0 0 24 24"' in minified
+    assert 'd="M1.23 2.5L10-.5"' in minified
+
+
+def test_build_sprite_prefixes_ids():
+    sprite = build_sprite({"1:2": ICON, "1:3": ICON})
+
+    assert sprite.count("<symbol") == 2
+    assert 'id="icon-1-2"' in sprite and 'id="icon-1-3"' in sprite
+    assert 'id="icon-1-2-a"' in sprite and 'mask="url(#icon-1-2-a)"' in sprite
+    assert 'id="icon-1-3-a"' in sprite and 'mask="url(#icon-1-3-a)"' in sprite
+    assert 'viewBox="0 0 24 24"' in sprite
+
+
+def test_jsx_style():
+    assert jsx_style("mask-type:alpha") == '{{maskType: "alpha"}}'
+    assert jsx_style("-webkit-mask: none; --brand: #fff;") == '{{WebkitMask: "none", "--brand": "#fff"}}'
+
+
+def test_build_react_icons():
+    module = build_react_icons({"1:2": ICON, "1:3": ICON}, {"1:2": "Arrow", "1:3": "Arrow"})
+
+    assert "export const Arrow = (props) => (" in module and "export const Arrow2 = (props) => (" in module
+    assert 'style={{maskType: "alpha"}}' in module and 'style="' not in module
+    assert 'maskUnits="userSpaceOnUse"' in module and 'id="icon-1-2-a"' in module
+    assert '<svg width="24" height="24" viewBox="0 0 24 24" fill="none" {...props}>' in module
+    assert 'export const icons = {\n  "1:2": Arrow,\n  "1:3": Arrow2,\n};' in module
+
+
+def test_element_to_jsx_escapes_text_and_values():
+    root = ET.fromstring('<svg xmlns="http://www.w3.org/2000/svg"><style>.a{fill:red}</style>'
+                         '<text data-label="say &quot;hi&quot;">a &lt; b<tspan>{c}</tspan> d</text>\n</svg>')
+    jsx = element_to_jsx(root)
+
+    assert '<style>{".a{fill:red}"}</style>' in jsx
+    assert 'data-label={"say \\"hi\\""}' in jsx
+    assert '<text data-label={"say \\"hi\\""}>{"a < b"}<tspan>{"{c}"}</tspan>{" d"}</text></svg>' in jsx
+
+
+def write_icons(basedir):
+    assets = {}
+    for node_id, file in (("1:2", "Vector.svg"), ("1:3", "Vector-1-3.svg"), ("1:4", "Vector.svg")):
+        with open(os.path.join(basedir, file), "w") as f:
+            f.write(ICON.replace("#111", "#" + node_id[-1] * 3))
+        assets[node_id] = {"name": "Vector", "file": file, "format": "svg", "content_hash": file, "imageRef": None}
+    figma_apis.save_asset_manifest(basedir, {"version": "1", "assets": assets})
+
+
+def test_svg_asset_hint_keeps_same_name_icons(tmp_path):
+    write_icons(str(tmp_path))
+
+    process_svg_assets(str(tmp_path), "sprite")
+    assert os.path.exists(tmp_path / SPRITE_FILE)
+    hint = svg_asset_hint(str(tmp_path))
+    assert json.dumps({"icon-1-2": "Vector", "icon-1-3": "Vector"}) in hint
+
+    process_svg_assets(str(tmp_path), "react")
+    with open(tmp_path / ICONS_FILE) as f:
+        assert '"1:4": Vector,' in f.read()
+    assert json.dumps({"1:2": "Vector", "1:3": "Vector", "1:4": "Vector"}) in svg_asset_hint(str(tmp_path))
+
+
+def test_missing_or_malformed_manifest_counts_as_empty(tmp_path):
+    assert process_svg_assets(str(tmp_path), "react") == {}
+    assert svg_asset_hint(str(tmp_path)) == ""
+
+    with open(tmp_path / figma_apis.ASSET_MANIFEST_FILE, "w") as f:
+        f.write('["not", "a manifest"]')
+    assert process_svg_assets(str(tmp_path), "sprite") == {}
+
+    # Entries whose file is gone are skipped, not raised
+    figma_apis.save_asset_manifest(str(tmp_path), {"version": "1", "assets": {
+        "1:2": {"name": "Gone", "file": "Gone.svg"}, "1:3": {"name": "Broken"}}})
+    assert process_svg_assets(str(tmp_path)) == {"1:2": "Gone.svg"}
+
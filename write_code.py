@@ -2,8 +2,12 @@
 from utils import encode_image 
 from openai import OpenAI
 client = OpenAI()
-import os
+import os, json
 from file_parser import parse_chatgpt_output
+from optimize_assets import load_assets_map
+from svg_assets import svg_asset_hint, SPRITE_FILE
+from design_tokens import design_token_hint, TAILWIND_TOKENS_FILE
+from prompt_serializer import serialize_style_info, requested_details
 
 framework = 'Next.js'
 style_framework = 'Tailwinds Css'
@@ -80,19 +84,40 @@ def create_prompt(feedback, figma_data, route):
           empty_string += f"{file}\n```\n"
           empty_string += f.read()
           empty_string += "\n```\n"
+    # Summarized subtrees asked for in the feedback are added in full
+    for key, detail in requested_details(figma_data, feedback).items():
+      empty_string += f"Style Info of {key}: {detail}\n"
     return f"{incorporate_feedback}\n{rules}\n{empty_string}\n\n{feedback}"
   else:   
+    icon_hint = svg_asset_hint(route)
     files = os.listdir(route)
     for file in files:
       if file.startswith("."):
           continue
       if os.path.isdir(f"{route}/{file}"):
           continue
+      # Merged icons are described by the hint instead of file by file
+      if icon_hint and file.endswith(".svg") and file != SPRITE_FILE:
+          continue
+      # The token theme is described with the design tokens
+      if file == TAILWIND_TOKENS_FILE:
+          continue
       empty_string += f"./{file} "
-    formatted_str = ", ".join(f"{key}: {value}" if isinstance(value, int) else f"{key}: {value}" for key, value in figma_data.items())
-    cleaned_figma_string = formatted_str.replace(",", "").replace("'", "")
+    # Deep subtrees are summarized when the whole design does not fit the token budget
+    cleaned_figma_string, summarized = serialize_style_info(figma_data)
+    if summarized:
+      cleaned_figma_string += f"\n{summarized} subtrees are summarized by their size, child count and dominant styles. Their full detail can be requested in the feedback as detail: <detail value>."
+    if "designTokens" in figma_data:
+      cleaned_figma_string += "\n" + design_token_hint(figma_data["designTokens"])
+    if "definitions" in figma_data:
+      cleaned_figma_string += "\nNodes with a $ref reuse the definition of that name, positioned at their own size. Positions inside a definition are relative to it. Build each definition once as a reusable component."
     if empty_string == "":
       return f"Style Info: {cleaned_figma_string}\n{rules}\nAssets to use: None\n\n{initial_prompt}"
+    if icon_hint:
+      empty_string += f"\n{icon_hint}"
+    assets_map = load_assets_map(route)
+    if assets_map:
+      empty_string += f"\nOptimized variants of the images (display size in px, prefer webp): {json.dumps(assets_map, separators=(',', ':'))}"
     return f"Style Info: {cleaned_figma_string}\n{rules}\nAssets to use: {empty_string}\n\n{initial_prompt}"
 
 def generate_code(image_path, figma_data, feedback, chat_history, route):